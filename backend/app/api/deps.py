@@ -1,10 +1,15 @@
-from fastapi import Depends, HTTPException, status
+from typing import Literal
+
+from fastapi import Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.core.database import get_db
+from app.core.rate_limit import get_client_ip, get_rate_limiter
 from app.core.security import verify_token
 from app.models.user import User
+from app.services.principal_cache import Principal, get_principal_cache
+from app.services.token_versions import get_token_versions
 
 
 async def get_current_user(
@@ -26,6 +31,63 @@ async def get_current_user(
     return user
 
 
+async def get_current_principal(
+    db: AsyncSession = Depends(get_db), token_data=Depends(verify_token)
+) -> Principal:
+    """Như get_current_user nhưng đọc từ principal cache, thường không tốn query DB"""
+    if token_data.sub is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload"
+        )
+
+    principal = await get_principal_cache().get(db, int(token_data.sub))
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
+        )
+
+    return principal
+
+
+async def get_current_active_principal(
+    principal: Principal = Depends(get_current_principal),
+) -> Principal:
+    if not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user"
+        )
+    return principal
+
+
+async def get_token_principal(
+    db: AsyncSession = Depends(get_db), token_data=Depends(verify_token)
+) -> Principal:
+    """
+    Phân quyền chỉ từ claims của JWT đã kiểm tra chữ ký (opt-in cho endpoint đọc nhiều).
+
+    Không đọc bảng users: chỉ so claim "ver" với token_version đã cache của user.
+    Khóa tài khoản/đổi rank làm tăng token_version nên token cũ bị từ chối.
+    """
+    if token_data.sub is None or token_data.rank is None or token_data.email is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload"
+        )
+
+    version = await get_token_versions().get(db, int(token_data.sub))
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
+        )
+    if (token_data.ver or 0) != version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return Principal(int(token_data.sub), token_data.email, token_data.rank, True)
+
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
@@ -46,10 +108,13 @@ async def get_current_superuser(
     return current_user
 
 
-def require_min_rank(min_rank: int):
+def require_min_rank(min_rank: int, claims_only: bool = False):
+    """claims_only=True: phân quyền theo rank trong token (get_token_principal)"""
+    principal_dependency = get_token_principal if claims_only else get_current_active_principal
+
     async def rank_checker(
-        current_user: User = Depends(get_current_active_user),
-    ) -> User:
+        current_user: Principal = Depends(principal_dependency),
+    ) -> Principal:
         if current_user.rank < min_rank:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -58,3 +123,24 @@ def require_min_rank(min_rank: int):
         return current_user
 
     return rank_checker
+
+
+def rate_limit(scope: str, limit: str, per: Literal["ip", "user"] = "ip"):
+    """
+    Dependency giới hạn tần suất, vd. Depends(rate_limit("login", RATE_LIMIT_LOGIN)).
+
+    per="ip": theo IP client (qua proxy tin cậy, xem get_client_ip); per="user": theo user id của principal đã xác thực
+    (principal được FastAPI cache trong request nên không tốn thêm lần xác thực nào).
+    """
+    if per == "user":
+        async def user_limiter(
+            principal: Principal = Depends(get_current_active_principal),
+        ) -> None:
+            get_rate_limiter().hit(scope, f"user:{principal.id}", limit)
+
+        return user_limiter
+
+    async def ip_limiter(request: Request) -> None:
+        get_rate_limiter().hit(scope, f"ip:{get_client_ip(request)}", limit)
+
+    return ip_limiter
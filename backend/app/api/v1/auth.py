@@ -1,12 +1,18 @@
 # type: ignore
 from datetime import timedelta
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app.api.deps import rate_limit
+from app.core.constants import RATE_LIMIT_LOGIN, RATE_LIMIT_REFRESH, RATE_LIMIT_REGISTER
 from app.core.database import get_db
-from app.core.security import create_access_token, verify_password, get_password_hash
+from app.core.password_hasher import get_password_hasher
+from app.core.security import create_access_token
 from app.models.user import User
+from app.schemas.token import RefreshTokenRequest, Token
+from app.services.refresh_tokens import get_refresh_tokens
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -18,6 +24,7 @@ class LoginRequest(BaseModel):
 
 class LoginResponse(BaseModel):
     access_token: str
+    refresh_token: str
     token_type: str = "bearer"
 
 class RegisterRequest(BaseModel):
@@ -28,7 +35,22 @@ class RegisterRequest(BaseModel):
 class MessageResponse(BaseModel):
     message: str
 
-@router.post("/login", response_model=LoginResponse)
+
+def _create_user_access_token(user: User) -> str:
+    return create_access_token(
+        data={
+            "sub": str(user.id), 
+            "email": getattr(user, 'email'), 
+            "rank": getattr(user, 'rank'),
+            "ver": getattr(user, 'token_version')
+        }
+    )
+
+@router.post(
+    "/login",
+    response_model=LoginResponse,
+    dependencies=[Depends(rate_limit("login", RATE_LIMIT_LOGIN))],
+)
 async def login(
     credentials: LoginRequest, 
     db: AsyncSession = Depends(get_db)
@@ -52,7 +74,10 @@ async def login(
     stored_password = getattr(user, 'hashed_password')
     is_active = getattr(user, 'is_active') 
     
-    if not verify_password(credentials.password, stored_password):
+    verified, new_hash = await get_password_hasher().verify_and_update(
+        credentials.password, stored_password
+    )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -65,18 +90,47 @@ async def login(
             detail="Account is deactivated"
         )
     
-    # Create access token
-    access_token = create_access_token(
-        data={
-            "sub": str(user.id), 
-            "email": getattr(user, 'email'), 
-            "rank": getattr(user, 'rank')
-        }
-    )
+    # Rehash transparently when the stored hash uses outdated cost parameters
+    if new_hash:
+        user.hashed_password = new_hash
+
+    # Create access token + refresh token
+    access_token = _create_user_access_token(user)
+    refresh_token = await get_refresh_tokens().issue(db, user.id)
+    await db.commit()
     
-    return LoginResponse(access_token=access_token)
+    return LoginResponse(access_token=access_token, refresh_token=refresh_token)
+
+
+@router.post(
+    "/refresh",
+    response_model=Token,
+    dependencies=[Depends(rate_limit("refresh", RATE_LIMIT_REFRESH))],
+)
+async def refresh(
+    body: RefreshTokenRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Rotate refresh token - the old token is revoked, reusing it revokes all sessions"""
+    user_id, refresh_token = await get_refresh_tokens().rotate(db, body.refresh_token)
+
+    user = await db.get(User, user_id)
+    if not user or not getattr(user, 'is_active'):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token"
+        )
+
+    access_token = _create_user_access_token(user)
+    await db.commit()
 
-@router.post("/register", response_model=MessageResponse)
+    return Token(access_token=access_token, refresh_token=refresh_token)
+
+@router.post(
+    "/register",
+    response_model=MessageResponse,
+    dependencies=[Depends(rate_limit("register", RATE_LIMIT_REGISTER))],
+)
 async def register(
     user_data: RegisterRequest,
     db: AsyncSession = Depends(get_db)
@@ -96,10 +150,11 @@ async def register(
         )
     
     # Create new user
+    hashed_password = await get_password_hasher().hash(user_data.password)
     new_user = User(
         email=user_data.email.lower(),
         username=user_data.username,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=hashed_password,
         is_active=True,
         rank=1  # Regular user
     )
@@ -110,6 +165,12 @@ async def register(
     return MessageResponse(message="Registration successful")
 
 @router.post("/logout", response_model=MessageResponse)
-async def logout():
-    """Simple logout - just return success (client handles token removal)"""
-    return MessageResponse(message="Logout successful")
\ No newline at end of file
+async def logout(
+    body: Optional[RefreshTokenRequest] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Logout - revokes the refresh token if provided (client handles access token removal)"""
+    if body is not None:
+        await get_refresh_tokens().revoke(db, body.refresh_token)
+        await db.commit()
+    return MessageResponse(message="Logout successful")
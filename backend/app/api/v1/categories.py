@@ -18,7 +18,7 @@ from app.core.constants import (
     MAX_PAGE_SIZE,
     CACHE_POST_LIST_SECONDS,
 )
-from app.models.user import User
+from app.services.principal_cache import Principal
 from app.models.category import Category
 from app.schemas.category import CategoryCreate, CategoryUpdate, CategoryResponse
 from app.crud import (
@@ -108,7 +108,7 @@ async def reorder_categories_endpoint(
     request: Request,
     reorder_data: ReorderRequest,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """Reorder categories by display_order (admin only)."""
@@ -129,7 +129,7 @@ async def create_category_endpoint(
     request: Request,
     category_in: CategoryCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -155,7 +155,7 @@ async def update_category_endpoint(
     category_id: int,
     category_in: CategoryUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -179,7 +179,7 @@ async def delete_category_endpoint(
     request: Request,
     category_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
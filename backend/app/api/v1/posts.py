@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, Response
+from fastapi.responses import FileResponse
 from fastapi_pagination import Page, paginate
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -6,8 +7,8 @@ from sqlalchemy.orm import selectinload
 from fastapi_cache import FastAPICache
 from fastapi_cache.decorator import cache
 
-from app.core.database import get_db
-from app.api.deps import get_current_active_user, require_min_rank
+from app.core.database import get_db, run_after_commit
+from app.api.deps import get_current_active_principal, get_token_principal, require_min_rank
 from app.core.security import validate_csrf
 from app.core.constants import (
     ADMIN_RANK,
@@ -19,7 +20,7 @@ from app.core.constants import (
     CACHE_POST_DETAIL_SECONDS,
     PostStatus,
 )
-from app.models.user import User
+from app.services.principal_cache import Principal
 from app.models.post import Post
 from app.schemas.post import PostCreate, PostUpdate, PostQuery, PostResponse, PostBulkAction, PostListWithStats
 from app.crud import (
@@ -37,11 +38,71 @@ from app.crud import (
     update_metadata,
     delete_metadata,
 )
-from app.services.post_storage import PostStorageService
+from app.core.storage_io import get_storage_io
+from app.services.post_storage import get_post_storage
+from app.services.content_tiering import restore_post_content
 from loguru import logger
 
 router = APIRouter()
 
+# Chỉ dùng bản gzip nén sẵn cho nội dung đủ lớn
+RAW_GZIP_MIN_BYTES = 1024
+
+
+async def _sync_post_storage(db: AsyncSession, post: Post) -> None:
+    """Ghi nội dung bài viết sang PostStorageService (bản sao phục vụ RAG/export) sau khi commit.
+
+    Đọc ưu tiên bản trong storage, nên chỉ ghi khi posts.content đã commit; ghi lỗi thì
+    xóa con trỏ index để các lần đọc fallback về posts.content thay vì trả nội dung cũ.
+    """
+    post_id, slug = int(post.id), str(post.slug)  # type: ignore[arg-type]
+    content = str(await post.awaitable_attrs.content)
+
+    async def write() -> None:
+        storage = get_post_storage()
+        try:
+            await storage.save_post_content(post_id, slug, content)
+        except Exception as e:
+            logger.error(f"Failed to sync storage content for post {post_id}: {e}")
+            try:
+                await storage.delete_post_content(post_id, slug)
+            except Exception as e:
+                logger.error(f"Failed to drop stale storage content for post {post_id}: {e}")
+
+    run_after_commit(db, write)
+
+
+async def _restore_unarchived_content(db: AsyncSession, post: Post, post_in: PostUpdate) -> None:
+    """Bài viết cold tier không còn archived sau khi cập nhật: đưa nội dung về lại posts.content."""
+    if "content" in post_in.model_fields_set:
+        # Nội dung mới thay thế bản cold, update_post tự đưa bài viết về hot tier
+        return
+    new_status = post_in.status if post_in.status is not None else post.status
+    if new_status != PostStatus.ARCHIVED.value:
+        await restore_post_content(db, post)
+
+
+def _delete_post_storage(db: AsyncSession, post_id: int, slug: str) -> None:
+    """Xóa con trỏ nội dung trong PostStorageService sau khi commit (blob không còn tham chiếu do GC dọn)."""
+    async def delete() -> None:
+        try:
+            await get_post_storage().delete_post_content(post_id, slug)
+        except Exception as e:
+            logger.error(f"Failed to delete storage content for post {post_id}: {e}")
+
+    run_after_commit(db, delete)
+
+
+async def _read_post_content(post: Post) -> str | None:
+    """Đọc nội dung qua PostStorageService (LRU cache dùng chung), fallback về posts.content."""
+    content = await get_post_storage().read_post_content(
+        int(post.id), str(post.slug)  # type: ignore[arg-type]
+    )
+    if content is None:
+        # posts.content có thể là cột deferred (chế độ nén), tải khi cần
+        content = await post.awaitable_attrs.content
+    return content
+
 
 # ==================== PUBLIC ENDPOINTS ====================
 
@@ -110,7 +171,7 @@ async def create_post_endpoint(
     request: Request,
     post_in: PostCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(MEMBER_RANK)),
+    current_user: Principal = Depends(require_min_rank(MEMBER_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -134,6 +195,8 @@ async def create_post_endpoint(
     )
     post = result.scalar_one_or_none()
 
+    await _sync_post_storage(db, post)
+
     logger.info(f"User {current_user.email} created post: {post.title}")
     return post
 
@@ -145,7 +208,7 @@ async def list_my_posts(
     page: int = Query(1, ge=1, description="Page number (starts from 1)"),
     size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_token_principal),
 ):
     """
     List current user's posts with pagination.
@@ -174,7 +237,7 @@ async def list_my_posts(
 async def get_my_post(
     post_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_token_principal),
 ):
     """
     Get one of current user's posts by ID.
@@ -205,7 +268,7 @@ async def update_my_post(
     post_id: int,
     post_in: PostUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_principal),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -229,6 +292,8 @@ async def update_my_post(
             detail="Not enough permissions to update this post"
         )
 
+    await _restore_unarchived_content(db, post, post_in)
+
     # Update post
     updated_post = await update_post(
         db=db,
@@ -236,6 +301,9 @@ async def update_my_post(
         obj_in=post_in
     )
 
+    if "content" in post_in.model_fields_set:
+        await _sync_post_storage(db, updated_post)
+
     logger.info(f"User {current_user.email} updated post {post_id}: {updated_post.title}")
     return updated_post
 
@@ -245,7 +313,7 @@ async def delete_my_post(
     request: Request,
     post_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_principal),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -281,6 +349,8 @@ async def delete_my_post(
             detail="Post not found"
         )
 
+    _delete_post_storage(db, post_id, str(post.slug))
+
     logger.info(f"User {current_user.email} deleted post {post_id}: {post.title}")
     return {"message": "Post deleted successfully"}
 
@@ -291,7 +361,7 @@ async def change_post_status(
     post_id: int,
     new_status: str = Query(..., description="New status: draft, published, or archived"),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_principal),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -323,6 +393,10 @@ async def change_post_status(
             detail="Invalid status. Must be one of: draft, published, archived"
         )
 
+    # Bài viết rời trạng thái archived: đưa nội dung từ cold tier về lại
+    if new_status != "archived":
+        await restore_post_content(db, post)
+
     # Update status
     post.status = new_status 
     if new_status == "published" and post.published_at is None:
@@ -351,7 +425,7 @@ async def list_all_posts_admin(
     page: int = Query(1, ge=1, description="Page number (starts from 1)"),
     size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(MODERATOR_RANK)),
+    current_user: Principal = Depends(require_min_rank(MODERATOR_RANK)),
 ):
     """
     List all posts with any status (admin/moderator only).
@@ -395,7 +469,7 @@ async def update_any_post(
     post_id: int,
     post_in: PostUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(MODERATOR_RANK)),
+    current_user: Principal = Depends(require_min_rank(MODERATOR_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -432,12 +506,17 @@ async def update_any_post(
                 detail=f"Moderators can only update post status. Attempted to update: {', '.join(updating_fields)}"
             )
 
+    await _restore_unarchived_content(db, post, post_in)
+
     updated_post = await update_post(
         db=db,
         db_obj=post,
         obj_in=post_in
     )
 
+    if "content" in post_in.model_fields_set:
+        await _sync_post_storage(db, updated_post)
+
     logger.info(f"Admin/Mod {current_user.email} updated post {post_id}: {updated_post.title}")
     return updated_post
 
@@ -447,7 +526,7 @@ async def delete_any_post(
     request: Request,
     post_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -476,6 +555,8 @@ async def delete_any_post(
             detail="Post not found"
         )
 
+    _delete_post_storage(db, post_id, str(post.slug))
+
     logger.info(f"Admin {current_user.email} deleted post {post_id}: {post.title}")
     return {"message": "Post deleted successfully"}
 
@@ -485,7 +566,7 @@ async def bulk_publish_posts(
     request: Request,
     action: PostBulkAction,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(MODERATOR_RANK)),
+    current_user: Principal = Depends(require_min_rank(MODERATOR_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -506,6 +587,7 @@ async def bulk_publish_posts(
     for post_id in action.post_ids:
         post = await get_post_by_id(db, post_id)
         if post:
+            await restore_post_content(db, post)
             post.status = "published" 
             if post.published_at is None:
                 post.published_at = datetime.now(timezone.utc) 
@@ -527,7 +609,7 @@ async def bulk_archive_posts(
     request: Request,
     action: PostBulkAction,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(MODERATOR_RANK)),
+    current_user: Principal = Depends(require_min_rank(MODERATOR_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -565,7 +647,7 @@ async def bulk_delete_posts(
     request: Request,
     action: PostBulkAction,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -581,11 +663,16 @@ async def bulk_delete_posts(
 
     deleted_posts = []
     for post_id in action.post_ids:
+        post = await get_post_by_id(db, post_id)
+        if not post:
+            continue
+        slug = str(post.slug)
         success = await delete_post(
             db=db,
             post_id=post_id
         )
         if success:
+            _delete_post_storage(db, post_id, slug)
             deleted_posts.append(post_id)
 
     await FastAPICache.clear(namespace="post")
@@ -605,7 +692,7 @@ async def bulk_delete_posts(
 async def get_post_metadata(
     post_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_principal),
 ):
     """
     Get all metadata for a post.
@@ -643,7 +730,7 @@ async def update_post_metadata(
     post_id: int,
     metadata: dict[str, str],  # Key-value pairs
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_principal),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -710,7 +797,7 @@ async def delete_post_metadata_key(
     post_id: int,
     key: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_principal),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -762,7 +849,7 @@ async def export_posts_for_rag(
     chunk_size: int = Query(500, description="Character count per chunk (for JSON format)"),
     chunk_overlap: int = Query(50, description="Character count overlap (for JSON format)"),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
 ):
     """
     Export posts for RAG pipeline.
@@ -793,10 +880,12 @@ async def export_posts_for_rag(
             
         # Get content from storage
         try:
-            content = await PostStorageService.read_post_content(post_id, str(post.slug))  # type: ignore[arg-type]
+            content = await _read_post_content(post)
         except Exception as e:
             logger.error(f"Failed to read content for post {post_id}: {e}")
             continue
+        if not content:
+            continue
         
         # Get metadata
         metadata_list = await get_all_metadata(db, int(post_id))  # type: ignore[arg-type]
@@ -931,14 +1020,18 @@ async def get_post_by_slug_endpoint(
 
 @router.get("/{slug}/raw")
 async def get_post_raw_content(
+    request: Request,
     slug: str,
+    format: str = Query("json", enum=["json", "markdown"], description="Response format"),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Get raw markdown content of a post.
 
-    Returns markdown file content as plain text.
-    Useful for preview or download.
+    - format=json (default): {"content", "post_id", "slug"}
+    - format=markdown (or Accept: text/markdown): the storage file is streamed
+      as text/markdown without loading it into memory. Supports Range requests,
+      ETag / If-None-Match and a precompressed gzip variant.
     """
     # Get post
     post = await get_post_by_slug(db, slug)
@@ -949,8 +1042,15 @@ async def get_post_raw_content(
             detail="Post not found"
         )
 
+    if format == "markdown" or request.headers.get("accept", "").startswith("text/markdown"):
+        return await _markdown_file_response(request, post)
+
     # Read markdown content
-    content = post.content
+    try:
+        content = await _read_post_content(post)
+    except Exception as e:
+        logger.error(f"Failed to read content for post {slug}: {e}")
+        content = await post.awaitable_attrs.content
 
     if not content:
         raise HTTPException(
@@ -960,6 +1060,62 @@ async def get_post_raw_content(
 
     return {"content": content, "post_id": post.id, "slug": post.slug}
 
+
+async def _markdown_file_response(request: Request, post: Post) -> Response:
+    """Trả file markdown trực tiếp từ storage (FileResponse stream từ đĩa)."""
+    media_type = "text/markdown; charset=utf-8"
+    storage = get_post_storage()
+    content_file = await storage.get_content_file(int(post.id), str(post.slug))  # type: ignore[arg-type]
+
+    if content_file is None:
+        # Chưa có trong storage: trả nội dung từ DB
+        content = await post.awaitable_attrs.content
+        if not content:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Post content not found"
+            )
+        return Response(content=str(content), media_type=media_type)
+
+    file_path, etag = content_file.path, content_file.etag
+    accepts_gzip = (
+        "range" not in request.headers
+        and "gzip" in request.headers.get("accept-encoding", "")
+    )
+    use_gzip = accepts_gzip and (
+        content_file.gzipped
+        or (
+            content_file.immutable
+            and (await get_storage_io().run("stat", file_path.stat)).st_size >= RAW_GZIP_MIN_BYTES
+        )
+    )
+    if use_gzip:
+        etag = f"{etag}.gz"
+
+    headers = {
+        "ETag": f'"{etag}"',
+        "Vary": "Accept-Encoding",
+        "Cache-Control": f"public, max-age={CACHE_POST_DETAIL_SECONDS}",
+    }
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if f'"{etag}"' in if_none_match or if_none_match.strip() == "*":
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if content_file.gzipped and not use_gzip:
+        # Bài lưu trữ ở tầng cold: giải nén cho client không nhận gzip / yêu cầu Range
+        content = await storage.read_post_content(int(post.id), str(post.slug))  # type: ignore[arg-type]
+        return Response(content=content or "", media_type=media_type, headers=headers)
+
+    if use_gzip:
+        if not content_file.gzipped:
+            file_path = await storage.get_gzip_variant(file_path)
+        headers["Content-Encoding"] = "gzip"
+
+    # FileResponse tự xử lý Range (206) và If-Range dựa trên ETag ở trên
+    return FileResponse(path=file_path, media_type=media_type, headers=headers)
+
+
 @router.get("/{slug}/rag-ready")
 @cache(expire=CACHE_POST_DETAIL_SECONDS, namespace="posts")
 async def get_post_for_rag(
@@ -980,7 +1136,7 @@ async def get_post_for_rag(
     
     # Get content from storage
     try:
-        content = await PostStorageService.read_post_content(int(post.id), str(post.slug))  # type: ignore[arg-type]
+        content = await _read_post_content(post)
     except Exception as e:
         logger.error(f"Failed to read content for post {slug}: {e}")
         raise HTTPException(
@@ -6,7 +6,7 @@ from app.core.database import get_db
 from app.core.security import validate_csrf
 from app.api.deps import require_min_rank
 from app.core.constants import ADMIN_RANK, MODERATOR_RANK, CACHE_SETTINGS_SECONDS
-from app.models.user import User
+from app.services.principal_cache import Principal
 from app.schemas.settings_dashboard import SettingsResponse, SettingsUpdate, PublicSettingsResponse
 from app.crud.crud_settings import get_all_settings, update_settings
 from loguru import logger
@@ -19,7 +19,7 @@ router = APIRouter()
 async def get_settings(
     request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(MODERATOR_RANK)),
+    current_user: Principal = Depends(require_min_rank(MODERATOR_RANK)),
 ):
     """
     Lấy tất cả settings.
@@ -35,7 +35,7 @@ async def update_system_settings(
     request: Request,
     settings_in: SettingsUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
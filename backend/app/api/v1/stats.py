@@ -1,5 +1,6 @@
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Request, Depends
+from typing import List
+from fastapi import APIRouter, Request, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_
 from sqlalchemy.orm import selectinload
@@ -7,14 +8,17 @@ from fastapi_cache.decorator import cache
 
 from app.core.database import get_db
 from app.api.deps import require_min_rank
-from app.core.constants import MODERATOR_RANK, CACHE_SETTINGS_SECONDS
+from app.core.constants import MODERATOR_RANK, ADMIN_RANK, CACHE_SETTINGS_SECONDS
 from app.schemas.settings_dashboard import StatsOverview
+from app.schemas.attachment import StorageUsageEntry
 from app.schemas.dashboard_stats import DashboardStatsResponse
 from app.schemas.stats_details import StatsDetailsResponse
 from app.models.user import User
+from app.services.principal_cache import Principal
 from app.models.post import Post
 from app.models.category import Category
 from app.crud.crud_user import get_by_id
+from app.crud import crud_storage_usage
 
 router = APIRouter()
 
@@ -24,7 +28,7 @@ router = APIRouter()
 async def get_stats_overview(
     request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(MODERATOR_RANK)),
+    current_user: Principal = Depends(require_min_rank(MODERATOR_RANK)),
 ):
     """
     Thống kê tổng quan hệ thống.
@@ -67,7 +71,7 @@ async def get_stats_overview(
 async def get_dashboard_stats(
     request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(MODERATOR_RANK)),
+    current_user: Principal = Depends(require_min_rank(MODERATOR_RANK)),
 ):
     """
     Thống kê dashboard cho Moderator+.
@@ -173,7 +177,7 @@ async def get_stats_details(
     request: Request,
     range: str = "30d",
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(MODERATOR_RANK)),
+    current_user: Principal = Depends(require_min_rank(MODERATOR_RANK)),
 ):
     """
     Chi tiết thống kê cho trang /dashboard/stats.
@@ -298,3 +302,28 @@ async def get_stats_details(
         top_categories=top_categories,
         top_authors=top_authors,
     )
+
+
+@router.get("/storage", response_model=List[StorageUsageEntry])
+async def get_storage_leaderboard(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
+):
+    """
+    Bảng xếp hạng dung lượng lưu trữ theo user.
+    Đọc từ bộ đếm user_storage_usage (index theo used_bytes), không quét bảng attachments.
+    Admin mới có thể xem.
+    """
+    rows = await crud_storage_usage.get_top_users(db, limit)
+    return [
+        StorageUsageEntry(
+            user_id=int(user.id),  # type: ignore[arg-type]
+            username=str(user.username),
+            email=str(user.email),
+            used_bytes=int(usage.used_bytes),  # type: ignore[arg-type]
+            file_count=int(usage.file_count),  # type: ignore[arg-type]
+        )
+        for usage, user in rows
+    ]
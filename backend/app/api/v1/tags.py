@@ -15,7 +15,7 @@ from app.core.constants import (
     MAX_PAGE_SIZE,
     CACHE_POST_LIST_SECONDS,
 )
-from app.models.user import User
+from app.services.principal_cache import Principal
 from app.schemas.tag import TagCreate, TagUpdate, TagResponse
 from app.crud import (
     get_tag_by_id,
@@ -76,7 +76,7 @@ async def get_trending_tags_endpoint(
 async def get_unused_tags_endpoint(
     request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
 ):
     """
     Get all unused tags (admin only).
@@ -121,7 +121,7 @@ async def merge_tags_endpoint(
     request: Request,
     merge_data: MergeRequest,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """Merge source tag into target tag (admin only)."""
@@ -148,7 +148,7 @@ async def create_tag_endpoint(
     request: Request,
     tag_in: TagCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -165,7 +165,7 @@ async def update_tag_endpoint(
     tag_id: int,
     tag_in: TagUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -189,7 +189,7 @@ async def delete_tag_endpoint(
     request: Request,
     tag_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     """
@@ -1,24 +1,45 @@
+import asyncio
+import hashlib
 import os
 import uuid
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, NamedTuple, Optional
+from urllib.parse import quote
 
 import aiofiles
 import magic
-from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Header, HTTPException, Request, Response, UploadFile, status, Query
 from fastapi.responses import FileResponse
 from loguru import logger
 from slugify import slugify
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import update
 
-from app.api.deps import get_current_active_user, get_db
+from app.api.deps import get_current_active_principal, get_db
 from app.core.config import get_settings
-from app.core.constants import MODERATOR_RANK, ADMIN_RANK
+from app.core.constants import MODERATOR_RANK, ADMIN_RANK, UPLOAD_MIME_TYPES
+from app.core.database import AsyncSessionLocal, run_after_commit
+from app.core.exceptions import UploadOffsetMismatch, UploadSessionNotFound
 from app.core.security import validate_csrf, verify_token
-from app.crud import crud_attachment, crud_settings
-from app.models.user import User
-from app.schemas.attachment import AttachmentCreate, AttachmentResponse
+from app.core.signed_urls import get_url_signer
+from app.core.storage_io import get_storage_io
+from app.crud import crud_attachment, crud_file_blob, crud_settings, crud_storage_usage
+from app.models.attachment import Attachment
+from app.schemas.attachment import (
+    AttachmentCreate,
+    AttachmentResponse,
+    BulkUploadItem,
+    BulkUploadResponse,
+    StorageUsageResponse,
+    UploadByHashRequest,
+    UploadSessionCreate,
+    UploadSessionResponse,
+)
+from app.services.attachment_cache import get_attachment_cache
+from app.services.image_derivatives import get_image_derivatives
+from app.services.multipart_upload import MultipartFileReader
+from app.services.principal_cache import Principal, get_principal_cache
+from app.services.upload_sessions import UploadSession, get_upload_sessions
 
 router = APIRouter()
 settings = get_settings()
@@ -29,6 +50,10 @@ mime_inspector = magic.Magic(mime=True)
 # Chunk size for streaming (1MB)
 CHUNK_SIZE = 1024 * 1024
 
+# Nội dung file của một attachment không bao giờ thay đổi sau khi upload
+PUBLIC_FILE_CACHE_CONTROL = "public, max-age=2592000, immutable"
+PRIVATE_FILE_CACHE_CONTROL = "private, max-age=3600"
+
 
 def safe_resolve_path(base_path: str, user_path: str) -> str:
     """
@@ -67,9 +92,9 @@ async def get_user_from_token_or_query(
     request: Request,
     db: AsyncSession = Depends(get_db),
     token: Optional[str] = Query(None),
-) -> User:
+) -> Principal:
     """
-    Lấy user từ Header Authorization hoặc Query Parameter 'token'.
+    Lấy user (principal) từ Header Authorization hoặc Query Parameter 'token'.
     Hỗ trợ cho thẻ <img> không gửi được header.
     """
     # 1. Thử lấy từ Header (nếu có)
@@ -95,31 +120,26 @@ async def get_user_from_token_or_query(
         if token_data.sub is None:
             raise HTTPException(status_code=401, detail="Invalid token")
             
-        result = await db.execute(select(User).where(User.id == token_data.sub))
-        user = result.scalar_one_or_none()
-        
-        if user is None or not user.is_active:
+        principal = await get_principal_cache().get(db, int(token_data.sub))
+        if principal is None or not principal.is_active:
             raise HTTPException(status_code=401, detail="User not found or inactive")
-            
-        return user
+
+        return principal
     except Exception:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
 
 
-@router.post("/", response_model=AttachmentResponse)
-async def upload_file(
-    request: Request,
-    file: UploadFile = File(...),
-    is_public: bool = Query(True),  # Mặc định Public để tối ưu SEO
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
-    csrf_token: str = Depends(validate_csrf),
-):
-    """
-    Tải file lên hệ thống (Streaming).
-    Kiểm tra Magic Bytes, Sanitize tên file và tối ưu RAM.
-    """
-    # 1. Lấy cấu hình từ DB hoặc dùng mặc định
+class UploadPolicy(NamedTuple):
+    allowed_extensions: list[str]
+    allowed_ext_str: str
+    max_size_mb: int
+    max_size_bytes: int
+    # Hạn mức tổng dung lượng mỗi user, 0 = không giới hạn
+    quota_bytes: int
+
+
+async def get_upload_policy(db: AsyncSession) -> UploadPolicy:
+    """Lấy cấu hình upload từ DB hoặc dùng mặc định"""
     allowed_ext_str = await crud_settings.get_setting(
         db, "upload_allowed_extensions", settings.ALLOWED_EXTENSIONS
     )
@@ -127,89 +147,227 @@ async def upload_file(
         db, "upload_max_size_mb", str(settings.MAX_UPLOAD_SIZE // (1024 * 1024))
     )
     max_size_mb = int(max_size_mb_str)
-    max_size_bytes = max_size_mb * 1024 * 1024
+    quota_mb_str = await crud_settings.get_setting(
+        db, "upload_quota_mb", str(settings.UPLOAD_QUOTA_MB)
+    )
+    return UploadPolicy(
+        allowed_extensions=[ext.strip().lower() for ext in allowed_ext_str.split(",")],
+        allowed_ext_str=allowed_ext_str,
+        max_size_mb=max_size_mb,
+        max_size_bytes=max_size_mb * 1024 * 1024,
+        quota_bytes=int(quota_mb_str or 0) * 1024 * 1024,
+    )
 
-    # 2. Kiểm tra định dạng file (extension) sơ bộ
-    if not file.filename:
+
+def check_upload_filename(filename: Optional[str], policy: UploadPolicy) -> str:
+    """Kiểm tra tên file và extension, trả về extension (không có dấu chấm)"""
+    if not filename:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Filename is required",
         )
-    file_ext = os.path.splitext(file.filename)[1].replace(".", "").lower()
-    allowed_extensions = [ext.strip().lower() for ext in allowed_ext_str.split(",")]
-    if file_ext not in allowed_extensions:
+    file_ext = os.path.splitext(filename)[1].replace(".", "").lower()
+    if file_ext not in policy.allowed_extensions:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Định dạng file .{file_ext} không được phép. Cho phép: {allowed_ext_str}",
+            detail=f"Định dạng file .{file_ext} không được phép. Cho phép: {policy.allowed_ext_str}",
         )
+    return file_ext
+
 
-    # 3. Kiểm tra dung lượng file từ Header (nếu có)
-    if file.size and file.size > max_size_bytes:
+def check_upload_size(size: Optional[int], policy: UploadPolicy) -> None:
+    """Kiểm tra dung lượng file khai báo trước khi nhận dữ liệu"""
+    if size and size > policy.max_size_bytes:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File quá lớn ({file.size / (1024*1024):.2f}MB). Tối đa: {max_size_mb}MB",
+            detail=f"File quá lớn ({size / (1024*1024):.2f}MB). Tối đa: {policy.max_size_mb}MB",
         )
 
-    # 4. Chuẩn bị đường dẫn lưu trữ theo thời gian
+
+def _quota_exceeded(remaining: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Vượt quá hạn mức lưu trữ. Dung lượng còn lại: {max(remaining, 0) / (1024*1024):.2f}MB",
+    )
+
+
+async def check_upload_quota(
+    db: AsyncSession, user_id: int, size: Optional[int], policy: UploadPolicy
+) -> Optional[int]:
+    """Kiểm tra hạn mức lưu trữ của user trước khi nhận dữ liệu (đọc bộ đếm, không SUM attachments)
+
+    Returns:
+        Optional[int]: Số byte user còn được dùng, None nếu không giới hạn
+    """
+    if not policy.quota_bytes:
+        return None
+    remaining = policy.quota_bytes - await crud_storage_usage.get_used_bytes(db, user_id)
+    if remaining <= 0 or (size and size > remaining):
+        raise _quota_exceeded(remaining)
+    return remaining
+
+
+async def sniff_mime(buffer: bytes) -> str:
+    """Nhận diện MIME từ magic bytes của dữ liệu đã có trong bộ nhớ (libmagic chạy ngoài event loop)"""
+    return await get_storage_io().run("magic", mime_inspector.from_buffer, buffer[:CHUNK_SIZE])
+
+
+async def sniffed_stream(chunks: AsyncIterator[bytes], file_ext: str) -> AsyncIterator[bytes]:
+    """Bọc stream upload: gom tối đa CHUNK_SIZE đầu tiên, kiểm tra MIME rồi mới cho ghi"""
+    head = b""
+    async for chunk in chunks:
+        head += chunk
+        if len(head) >= CHUNK_SIZE:
+            break
+    if head:
+        check_upload_mime(file_ext, await sniff_mime(head))
+        yield head
+    async for chunk in chunks:
+        yield chunk
+
+
+def _read_head(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(CHUNK_SIZE)
+
+
+def check_upload_mime(file_ext: str, detected_mime: str) -> None:
+    """Kiểm tra MIME thực tế (magic bytes) có khớp với extension hay không"""
+    allowed = UPLOAD_MIME_TYPES.get(file_ext)
+    if allowed is None:
+        return
+    if not any(
+        detected_mime.startswith(mime) if mime.endswith("/") else detected_mime == mime
+        for mime in allowed
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Nội dung file ({detected_mime}) không khớp với định dạng .{file_ext}",
+        )
+
+
+async def new_upload_path(filename: str) -> tuple[str, str]:
+    """Tạo đường dẫn lưu trữ theo thời gian với tên file duy nhất
+
+    Returns:
+        tuple[str, str]: (đường dẫn tuyệt đối, đường dẫn tương đối lưu trong DB)
+    """
     now = datetime.now()
     date_path = os.path.join(str(now.year), f"{now.month:02d}", f"{now.day:02d}")
     upload_dir = os.path.join(os.getcwd(), settings.UPLOAD_DIR, date_path)
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir, exist_ok=True)
+    storage_io = get_storage_io()
+    if not await storage_io.exists(upload_dir):
+        await storage_io.makedirs(upload_dir)
+
+    # Sanitize và tạo tên file duy nhất
+    unique_filename = f"{uuid.uuid4()}_{sanitize_filename(filename)}"
+    return (
+        os.path.join(upload_dir, unique_filename),
+        os.path.join(settings.UPLOAD_DIR, date_path, unique_filename),
+    )
+
+
+class StoredUpload(NamedTuple):
+    full_path: str
+    relative_path: str
+    size: int
+    sha256: str
+    content_type: str
 
-    # 5. Sanitize và tạo tên file duy nhất
-    safe_name = sanitize_filename(file.filename)
-    unique_filename = f"{uuid.uuid4()}_{safe_name}"
-    file_full_path = os.path.join(upload_dir, unique_filename)
 
-    # 6. Ghi file theo chunk (Streaming) để tối ưu RAM
-    actual_size = 0
+async def iter_upload_file(file: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await file.read(CHUNK_SIZE):
+        yield chunk
+
+
+async def write_upload(
+    chunks: AsyncIterator[bytes],
+    filename: str,
+    file_ext: str,
+    policy: UploadPolicy,
+    quota_remaining: Optional[int] = None,
+) -> StoredUpload:
+    """Ghi dữ liệu upload vào đường dẫn lưu trữ theo ngày
+
+    MIME được nhận diện trên CHUNK_SIZE đầu tiên trước khi mở file đích,
+    giới hạn dung lượng (và hạn mức còn lại của user) được kiểm tra khi dữ liệu tới,
+    sha256 tính đồng thời.
+    """
+    chunks = chunks.__aiter__()
+    head = b""
+    async for chunk in chunks:
+        head += chunk
+        if len(head) >= CHUNK_SIZE:
+            break
+
+    detected_mime = await sniff_mime(head)
+    check_upload_mime(file_ext, detected_mime)
+
+    full_path, relative_path = await new_upload_path(filename)
+    size = 0
+    hasher = hashlib.sha256()
+    chunk = head
     try:
-        async with aiofiles.open(file_full_path, "wb") as f:
-            while chunk := await file.read(CHUNK_SIZE):
-                actual_size += len(chunk)
-                if actual_size > max_size_bytes:
-                    # Nếu file thực tế lớn hơn giới hạn, xóa file và báo lỗi
-                    await f.close()
-                    if os.path.exists(file_full_path):
-                        os.remove(file_full_path)
+        async with aiofiles.open(full_path, "wb") as f:
+            while True:
+                size += len(chunk)
+                if size > policy.max_size_bytes:
                     raise HTTPException(
                         status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"File thực tế vượt quá giới hạn {max_size_mb}MB",
+                        detail=f"File thực tế vượt quá giới hạn {policy.max_size_mb}MB",
                     )
+                if quota_remaining is not None and size > quota_remaining:
+                    raise _quota_exceeded(quota_remaining)
+                hasher.update(chunk)
                 await f.write(chunk)
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
     except HTTPException:
+        # Nếu file thực tế lớn hơn giới hạn, xóa file và báo lỗi
+        await get_storage_io().remove(full_path, missing_ok=True)
         raise
     except Exception as e:
         logger.error(f"Lỗi khi ghi file: {e}")
-        if os.path.exists(file_full_path):
-            os.remove(file_full_path)
+        await get_storage_io().remove(full_path, missing_ok=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Không thể lưu file vào máy chủ",
         )
 
-    # 7. Kiểm tra Magic Bytes (Nội dung thực sự của file)
-    detected_mime = mime_inspector.from_file(file_full_path)
+    return StoredUpload(full_path, relative_path, size, hasher.hexdigest(), detected_mime)
 
-    # 8. Lưu thông tin vào Database
-    relative_path = os.path.join(settings.UPLOAD_DIR, date_path, unique_filename)
-    attachment_in = AttachmentCreate(
-        filename=file.filename,  # type: ignore[arg-type]
-        file_path=relative_path,
-        content_type=detected_mime or file.content_type,  # type: ignore[arg-type]
-        file_size=actual_size,
-        is_public=is_public,
-        user_id=int(current_user.id),  # type: ignore[arg-type]
-    )
 
-    db_obj = await crud_attachment.create(db, attachment_in)
-    # Refresh để đảm bảo lấy đúng dữ liệu từ DB (bao gồm is_public)
-    await db.refresh(db_obj)
+async def file_response(full_path: str, media_type: str, filename: str, cache_control: str) -> Response:
+    """Trả nội dung file cho client
 
-    # 9. Trả về kết quả
+    Khi bật UPLOAD_ACCEL_REDIRECT_PREFIX, backend chỉ trả header X-Accel-Redirect,
+    nginx tự đọc file từ location internal (không stream qua worker Python).
+    """
+    headers = {"Cache-Control": cache_control}
+    prefix = settings.UPLOAD_ACCEL_REDIRECT_PREFIX
+    if not prefix:
+        if not await get_storage_io().exists(full_path):
+            raise HTTPException(status_code=404, detail="Tệp tin vật lý đã bị xóa")
+        # Sử dụng FileResponse để FastAPI tự động handle streaming và headers (Etag, v.v.)
+        return FileResponse(path=full_path, media_type=media_type, filename=filename, headers=headers)
+
+    # Đường dẫn đã qua safe_resolve_path nên luôn nằm trong thư mục làm việc
+    relative_path = os.path.relpath(full_path, os.getcwd()).replace(os.sep, "/")
+    headers["X-Accel-Redirect"] = quote(f"{prefix.rstrip('/')}/{relative_path}")
+    quoted_filename = quote(filename)
+    if quoted_filename != filename:
+        headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quoted_filename}"
+    else:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return Response(media_type=media_type, headers=headers)
+
+
+def build_attachment_response(db_obj: Attachment) -> AttachmentResponse:
+    """Chuyển Attachment sang response kèm URL truy cập"""
     response_obj = AttachmentResponse.model_validate(db_obj)
-    
+
     if db_obj.is_public:
         # Trả về URL SEO đẹp qua prefix /media/ (sẽ cấu hình ở Nginx)
         filename = str(db_obj.filename)
@@ -217,77 +375,610 @@ async def upload_file(
         ext = os.path.splitext(filename)[1]
         response_obj.url = f"/media/{db_obj.id}/{name_slug}{ext}"
     else:
-        # File private giữ nguyên proxy URL yêu cầu token
-        response_obj.url = f"/backend/api/v1/uploads/file/{db_obj.id}"
+        # File private: URL ký HMAC có thời hạn, tải file không cần token
+        response_obj.url = get_url_signer().sign_url(
+            f"/backend/api/v1/uploads/file/{db_obj.id}", int(db_obj.id)  # type: ignore[arg-type]
+        )
 
     return response_obj
 
 
+def hash_file(path: str) -> str:
+    """Tính sha256 của file đã có trên đĩa (chạy trong thread)"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+async def deduplicate_upload(
+    db: AsyncSession,
+    sha256: str,
+    full_path: str,
+    relative_path: str,
+    file_size: int,
+) -> tuple[str, str, int]:
+    """Gắn file vừa ghi vào blob theo sha256
+
+    Nếu nội dung đã tồn tại, file vừa ghi bị xóa và attachment dùng lại file cũ.
+
+    Returns:
+        tuple[str, str, int]: (đường dẫn tuyệt đối, đường dẫn tương đối, blob_id)
+    """
+    blob, created = await crud_file_blob.acquire(db, sha256, relative_path, file_size)
+    if created:
+        return full_path, relative_path, int(blob.id)  # type: ignore[arg-type]
+
+    storage_io = get_storage_io()
+    blob_full_path = safe_resolve_path(os.getcwd(), str(blob.file_path))
+    if not await storage_io.exists(blob_full_path):
+        # File của blob bị mất: dùng file vừa upload thay thế
+        logger.warning(f"File của blob {blob.id} không tồn tại, thay bằng file mới upload")
+        blob.file_path = relative_path  # type: ignore[assignment]
+        await db.flush()
+        return full_path, relative_path, int(blob.id)  # type: ignore[arg-type]
+
+    await storage_io.remove(full_path)
+    return blob_full_path, str(blob.file_path), int(blob.id)  # type: ignore[arg-type]
+
+
+async def generate_image_variants(attachment_id: int, full_path: str, content_type: str) -> None:
+    """Background task: tạo biến thể ảnh và lưu kích thước gốc vào attachment"""
+    info = await get_image_derivatives().generate(attachment_id, full_path, content_type)
+    if info is None:
+        return
+
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(Attachment)
+            .where(Attachment.id == attachment_id)
+            .values(width=info.width, height=info.height)
+        )
+        await session.commit()
+    get_attachment_cache().invalidate(attachment_id)
+
+
+async def save_attachment(
+    db: AsyncSession,
+    background_tasks: BackgroundTasks,
+    attachment_in: AttachmentCreate,
+    full_path: str,
+) -> Attachment:
+    """Lưu thông tin file đã ghi xuống đĩa vào Database"""
+    db_obj = await crud_attachment.create(db, attachment_in)
+    # Refresh để đảm bảo lấy đúng dữ liệu từ DB (bao gồm is_public)
+    await db.refresh(db_obj)
+    schedule_image_variants(background_tasks, db_obj, full_path)
+    return db_obj
+
+
+def schedule_image_variants(background_tasks: BackgroundTasks, db_obj: Attachment, full_path: str) -> None:
+    """Ảnh: tạo biến thể (thumb/card/full) trong process pool sau khi trả response"""
+    if get_image_derivatives().is_supported(str(db_obj.content_type)):
+        background_tasks.add_task(
+            generate_image_variants, int(db_obj.id), full_path, str(db_obj.content_type)  # type: ignore[arg-type]
+        )
+
+
+@router.post("/", response_model=AttachmentResponse)
+async def upload_file(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    is_public: bool = Query(True),  # Mặc định Public để tối ưu SEO
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_principal),
+    csrf_token: str = Depends(validate_csrf),
+):
+    """
+    Tải file lên hệ thống (Streaming).
+    Kiểm tra Magic Bytes, Sanitize tên file và tối ưu RAM.
+    """
+    # 1. Lấy cấu hình từ DB hoặc dùng mặc định
+    policy = await get_upload_policy(db)
+
+    # 2. Kiểm tra định dạng file (extension) sơ bộ
+    file_ext = check_upload_filename(file.filename, policy)
+
+    # 3. Kiểm tra dung lượng file từ Header (nếu có) và hạn mức lưu trữ của user
+    check_upload_size(file.size, policy)
+    quota_remaining = await check_upload_quota(db, int(current_user.id), file.size, policy)  # type: ignore[arg-type]
+
+    # 4-6. Kiểm tra Magic Bytes trên chunk đầu tiên rồi ghi file theo chunk, tính sha256 đồng thời
+    stored = await write_upload(
+        iter_upload_file(file), file.filename, file_ext, policy, quota_remaining  # type: ignore[arg-type]
+    )
+
+    # 7. Dedup theo sha256: nội dung đã có thì chỉ tạo Attachment trỏ tới file cũ
+    file_full_path, relative_path, blob_id = await deduplicate_upload(
+        db, stored.sha256, stored.full_path, stored.relative_path, stored.size
+    )
+
+    # 8. Lưu thông tin vào Database
+    attachment_in = AttachmentCreate(
+        filename=file.filename,  # type: ignore[arg-type]
+        file_path=relative_path,
+        content_type=stored.content_type or file.content_type,  # type: ignore[arg-type]
+        file_size=stored.size,
+        is_public=is_public,
+        user_id=int(current_user.id),  # type: ignore[arg-type]
+        blob_id=blob_id,
+    )
+    db_obj = await save_attachment(db, background_tasks, attachment_in, file_full_path)
+
+    # 9. Trả về kết quả
+    return build_attachment_response(db_obj)
+
+
+@router.post("/stream", response_model=AttachmentResponse)
+async def upload_file_stream(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    is_public: bool = Query(True),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_principal),
+    csrf_token: str = Depends(validate_csrf),
+):
+    """
+    Tải file lên bằng multipart/form-data (field "file"), ghi thẳng vào vị trí lưu cuối cùng.
+    Không qua file tạm của UploadFile nên mỗi byte chỉ ghi xuống đĩa một lần.
+    """
+    policy = await get_upload_policy(db)
+    quota_remaining = await check_upload_quota(db, int(current_user.id), None, policy)  # type: ignore[arg-type]
+
+    reader = MultipartFileReader(request.headers.get("content-type"), request.stream())
+    await reader.open()
+    filename: str = reader.filename  # type: ignore[assignment]
+    file_ext = check_upload_filename(filename, policy)
+
+    stored = await write_upload(reader.chunks(), filename, file_ext, policy, quota_remaining)
+    file_full_path, relative_path, blob_id = await deduplicate_upload(
+        db, stored.sha256, stored.full_path, stored.relative_path, stored.size
+    )
+
+    attachment_in = AttachmentCreate(
+        filename=filename,
+        file_path=relative_path,
+        content_type=stored.content_type or reader.content_type,  # type: ignore[arg-type]
+        file_size=stored.size,
+        is_public=is_public,
+        user_id=int(current_user.id),  # type: ignore[arg-type]
+        blob_id=blob_id,
+    )
+    db_obj = await save_attachment(db, background_tasks, attachment_in, file_full_path)
+    return build_attachment_response(db_obj)
+
+
+@router.post("/bulk", response_model=BulkUploadResponse)
+async def upload_files_bulk(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    is_public: bool = Query(True),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_principal),
+    csrf_token: str = Depends(validate_csrf),
+):
+    """
+    Tải nhiều file trong một request multipart (field "files" lặp lại).
+    Ghi file, kiểm tra magic bytes và tính sha256 song song (tối đa UPLOAD_BULK_CONCURRENCY file),
+    sau đó dedup và insert toàn bộ Attachment trong cùng một transaction.
+    File lỗi không làm hỏng cả lô: kết quả trả về theo từng file.
+    """
+    if len(files) > settings.UPLOAD_BULK_MAX_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tối đa {settings.UPLOAD_BULK_MAX_FILES} file mỗi lần upload",
+        )
+
+    user_id = int(current_user.id)  # type: ignore[arg-type]
+    policy = await get_upload_policy(db)
+    quota_remaining = await check_upload_quota(db, user_id, None, policy)
+    semaphore = asyncio.Semaphore(settings.UPLOAD_BULK_CONCURRENCY)
+
+    async def store(file: UploadFile) -> StoredUpload:
+        async with semaphore:
+            file_ext = check_upload_filename(file.filename, policy)
+            check_upload_size(file.size, policy)
+            return await write_upload(
+                iter_upload_file(file), file.filename, file_ext, policy, quota_remaining  # type: ignore[arg-type]
+            )
+
+    # 1. Ghi file song song (I/O, sniff MIME, hash), lỗi của từng file được giữ lại
+    outcomes = await asyncio.gather(*(store(file) for file in files), return_exceptions=True)
+    unexpected = next(
+        (o for o in outcomes if isinstance(o, BaseException) and not isinstance(o, HTTPException)), None
+    )
+    if unexpected is not None:
+        for outcome in outcomes:
+            if isinstance(outcome, StoredUpload):
+                await get_storage_io().remove(outcome.full_path, missing_ok=True)
+        raise unexpected
+
+    # 2. Hạn mức, dedup tuần tự trên cùng session DB
+    results: List[Optional[BulkUploadItem]] = [None] * len(files)
+    pending: List[tuple[int, AttachmentCreate, str]] = []
+    used = 0
+    for index, (file, outcome) in enumerate(zip(files, outcomes)):
+        filename = file.filename or ""
+        if isinstance(outcome, HTTPException):
+            results[index] = BulkUploadItem(filename=filename, status_code=outcome.status_code, error=outcome.detail)
+            continue
+        stored: StoredUpload = outcome  # type: ignore[assignment]
+
+        if quota_remaining is not None and used + stored.size > quota_remaining:
+            await get_storage_io().remove(stored.full_path, missing_ok=True)
+            error = _quota_exceeded(quota_remaining - used)
+            results[index] = BulkUploadItem(filename=filename, status_code=error.status_code, error=error.detail)
+            continue
+        used += stored.size
+
+        file_full_path, relative_path, blob_id = await deduplicate_upload(
+            db, stored.sha256, stored.full_path, stored.relative_path, stored.size
+        )
+        pending.append((index, AttachmentCreate(
+            filename=filename,
+            file_path=relative_path,
+            content_type=stored.content_type or file.content_type,  # type: ignore[arg-type]
+            file_size=stored.size,
+            is_public=is_public,
+            user_id=user_id,
+            blob_id=blob_id,
+        ), file_full_path))
+
+    # 3. Insert toàn bộ Attachment trong một lần flush
+    db_objs = await crud_attachment.create_multi(db, [attachment_in for _, attachment_in, _ in pending])
+    for (index, attachment_in, full_path), db_obj in zip(pending, db_objs):
+        schedule_image_variants(background_tasks, db_obj, full_path)
+        results[index] = BulkUploadItem(
+            filename=attachment_in.filename,
+            status_code=status.HTTP_200_OK,
+            attachment=build_attachment_response(db_obj),
+        )
+
+    logger.info(f"User {current_user.email} bulk uploaded {len(db_objs)}/{len(files)} files")
+    return BulkUploadResponse(
+        uploaded=len(db_objs),
+        failed=len(files) - len(db_objs),
+        results=[item for item in results if item is not None],
+    )
+
+
+@router.post("/by-hash", response_model=AttachmentResponse)
+async def upload_by_hash(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    upload_in: UploadByHashRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_principal),
+    csrf_token: str = Depends(validate_csrf),
+):
+    """
+    Pre-flight upload theo sha256: nếu nội dung đã có trên server và user được phép
+    dùng lại thì tạo attachment ngay, client không cần gửi file.
+    Trả 404 "Upload required" nếu client phải upload file như bình thường.
+    """
+    policy = await get_upload_policy(db)
+    file_ext = check_upload_filename(upload_in.filename, policy)
+    check_upload_size(upload_in.size, policy)
+    await check_upload_quota(db, int(current_user.id), upload_in.size, policy)  # type: ignore[arg-type]
+
+    upload_required = HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Upload required",
+    )
+
+    blob = await crud_file_blob.get_by_sha256(db, upload_in.sha256.lower())
+    if blob is None or int(blob.file_size) != upload_in.size:  # type: ignore[arg-type]
+        raise upload_required
+
+    # Chỉ dùng lại nội dung user đã sở hữu hoặc đã public (không lộ file private qua hash)
+    reference = await crud_attachment.get_referencing_blob(
+        db, int(blob.id), int(current_user.id)  # type: ignore[arg-type]
+    )
+    if reference is None:
+        raise upload_required
+
+    content_type = str(reference.content_type)
+    check_upload_mime(file_ext, content_type)
+
+    full_path = safe_resolve_path(os.getcwd(), str(blob.file_path))
+    if not await get_storage_io().exists(full_path) or not await crud_file_blob.add_reference(db, int(blob.id)):  # type: ignore[arg-type]
+        raise upload_required
+
+    attachment_in = AttachmentCreate(
+        filename=upload_in.filename,
+        file_path=str(blob.file_path),
+        content_type=content_type,
+        file_size=upload_in.size,
+        is_public=upload_in.is_public,
+        user_id=int(current_user.id),  # type: ignore[arg-type]
+        blob_id=int(blob.id),  # type: ignore[arg-type]
+    )
+    db_obj = await save_attachment(db, background_tasks, attachment_in, full_path)
+
+    logger.info(f"User {current_user.email} reused blob {blob.id} by hash")
+    return build_attachment_response(db_obj)
+
+
+# ==================== RESUMABLE UPLOAD ====================
+# Giao thức: POST /sessions tạo phiên -> PATCH /sessions/{id} gửi từng chunk kèm
+# header Upload-Offset -> HEAD /sessions/{id} lấy offset đã xác nhận khi mất kết nối
+# -> POST /sessions/{id}/complete kiểm tra dung lượng + magic bytes và tạo attachment.
+
+
+def _session_response(session: UploadSession, offset: int) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        id=session.id,
+        filename=session.filename,
+        size=session.size,
+        offset=offset,
+        is_public=session.is_public,
+        expires_at=datetime.fromtimestamp(session.expires_at, tz=timezone.utc),
+    )
+
+
+@router.get("/usage", response_model=StorageUsageResponse)
+async def get_my_storage_usage(
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_principal),
+):
+    """Dung lượng lưu trữ user hiện tại đang dùng và hạn mức"""
+    policy = await get_upload_policy(db)
+    usage = await crud_storage_usage.get_usage(db, int(current_user.id))  # type: ignore[arg-type]
+    return StorageUsageResponse(
+        used_bytes=int(usage.used_bytes) if usage else 0,  # type: ignore[arg-type]
+        file_count=int(usage.file_count) if usage else 0,  # type: ignore[arg-type]
+        quota_bytes=policy.quota_bytes or None,
+    )
+
+
+@router.post("/sessions", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    session_in: UploadSessionCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_principal),
+    csrf_token: str = Depends(validate_csrf),
+):
+    """Tạo phiên upload resumable cho file lớn"""
+    policy = await get_upload_policy(db)
+    check_upload_filename(session_in.filename, policy)
+    if session_in.size <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File size must be greater than 0",
+        )
+    check_upload_size(session_in.size, policy)
+    await check_upload_quota(db, int(current_user.id), session_in.size, policy)  # type: ignore[arg-type]
+
+    sessions = get_upload_sessions()
+    session = await sessions.create(
+        user_id=int(current_user.id),  # type: ignore[arg-type]
+        filename=session_in.filename,
+        size=session_in.size,
+        is_public=session_in.is_public,
+    )
+    background_tasks.add_task(sessions.purge_expired)
+
+    response.headers["Location"] = f"/backend/api/v1/uploads/sessions/{session.id}"
+    response.headers["Upload-Offset"] = "0"
+    return _session_response(session, 0)
+
+
+@router.head("/sessions/{session_id}")
+async def get_upload_session_offset(
+    session_id: str,
+    current_user: Principal = Depends(get_current_active_principal),
+):
+    """Offset đã nhận của phiên upload (client resume từ đây)"""
+    sessions = get_upload_sessions()
+    session = await sessions.get(session_id, int(current_user.id))  # type: ignore[arg-type]
+    return Response(headers={
+        "Upload-Offset": str(await sessions.offset(session)),
+        "Upload-Length": str(session.size),
+        "Cache-Control": "no-store",
+    })
+
+
+@router.get("/sessions/{session_id}", response_model=UploadSessionResponse)
+async def get_upload_session(
+    session_id: str,
+    current_user: Principal = Depends(get_current_active_principal),
+):
+    """Thông tin phiên upload kèm offset đã nhận"""
+    sessions = get_upload_sessions()
+    session = await sessions.get(session_id, int(current_user.id))  # type: ignore[arg-type]
+    return _session_response(session, await sessions.offset(session))
+
+
+@router.patch("/sessions/{session_id}", response_model=UploadSessionResponse)
+async def upload_session_chunk(
+    request: Request,
+    response: Response,
+    session_id: str,
+    upload_offset: int = Header(..., alias="Upload-Offset", ge=0),
+    current_user: Principal = Depends(get_current_active_principal),
+    csrf_token: str = Depends(validate_csrf),
+):
+    """
+    Ghi nối một chunk (raw body) vào phiên upload.
+    Upload-Offset phải bằng offset server đã nhận, nếu không trả 409 kèm offset đúng.
+    """
+    sessions = get_upload_sessions()
+    session = await sessions.get(session_id, int(current_user.id))  # type: ignore[arg-type]
+
+    chunks = request.stream()
+    if upload_offset == 0:
+        # Chunk đầu tiên: từ chối file sai định dạng trước khi ghi xuống đĩa
+        file_ext = os.path.splitext(session.filename)[1].replace(".", "").lower()
+        chunks = sniffed_stream(chunks, file_ext)
+    offset = await sessions.append(session, upload_offset, chunks)
+
+    response.headers["Upload-Offset"] = str(offset)
+    return _session_response(session, offset)
+
+
+@router.post("/sessions/{session_id}/complete", response_model=AttachmentResponse)
+async def complete_upload_session(
+    request: Request,
+    session_id: str,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_principal),
+    csrf_token: str = Depends(validate_csrf),
+):
+    """Hoàn tất phiên upload: kiểm tra dung lượng, magic bytes rồi tạo attachment"""
+    sessions = get_upload_sessions()
+    session = await sessions.get(session_id, int(current_user.id))  # type: ignore[arg-type]
+
+    offset = await sessions.offset(session)
+    if offset != session.size:
+        raise UploadOffsetMismatch(offset, detail=f"Upload incomplete: {offset}/{session.size} bytes received")
+
+    # Cấu hình có thể đã thay đổi trong lúc upload
+    policy = await get_upload_policy(db)
+    file_ext = check_upload_filename(session.filename, policy)
+    check_upload_size(session.size, policy)
+    await check_upload_quota(db, int(current_user.id), session.size, policy)  # type: ignore[arg-type]
+
+    storage_io = get_storage_io()
+    part_path = sessions.part_path(session)
+    detected_mime = await sniff_mime(await storage_io.run("read_head", _read_head, str(part_path)))
+    try:
+        check_upload_mime(file_ext, detected_mime)
+    except HTTPException:
+        await sessions.discard(session)
+        raise
+
+    # .sessions nằm trong UPLOAD_DIR nên rename là atomic, không copy dữ liệu
+    file_full_path, relative_path = await new_upload_path(session.filename)
+    try:
+        await storage_io.replace(part_path, file_full_path)
+    except FileNotFoundError:
+        raise UploadSessionNotFound()
+    await sessions.discard(session)
+
+    sha256 = await storage_io.run("hash", hash_file, file_full_path)
+    file_full_path, relative_path, blob_id = await deduplicate_upload(
+        db, sha256, file_full_path, relative_path, session.size
+    )
+
+    attachment_in = AttachmentCreate(
+        filename=session.filename,
+        file_path=relative_path,
+        content_type=detected_mime,
+        file_size=session.size,
+        is_public=session.is_public,
+        user_id=int(current_user.id),  # type: ignore[arg-type]
+        blob_id=blob_id,
+    )
+    db_obj = await save_attachment(db, background_tasks, attachment_in, file_full_path)
+
+    logger.info(f"User {current_user.email} completed resumable upload {session.id} ({session.size} bytes)")
+    return build_attachment_response(db_obj)
+
+
+@router.delete("/sessions/{session_id}")
+async def abort_upload_session(
+    session_id: str,
+    current_user: Principal = Depends(get_current_active_principal),
+    csrf_token: str = Depends(validate_csrf),
+):
+    """Hủy phiên upload và xóa dữ liệu đã nhận"""
+    sessions = get_upload_sessions()
+    session = await sessions.get(session_id, int(current_user.id))  # type: ignore[arg-type]
+    await sessions.discard(session)
+    return {"message": "Đã hủy phiên upload"}
+
+
 @router.get("/p/{id}/{slug}")
 @router.head("/p/{id}/{slug}")
 async def get_public_file(
     id: int,
     slug: str,
+    w: Optional[int] = Query(None, ge=1, le=4096, description="Chiều rộng mong muốn (px), trả biến thể ảnh đã resize"),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Truy cập file công khai (SEO Friendly).
     Không yêu cầu authentication.
+    Với ảnh, tham số ?w= trả biến thể nhỏ nhất đủ rộng (thumb/card/full) từ cache trên đĩa.
     """
-    db_obj = await crud_attachment.get(db, id)
-    if not db_obj:
+    cache = get_attachment_cache()
+    meta = await cache.get(db, id)
+    if not meta:
         raise HTTPException(status_code=404, detail="File không tồn tại")
 
-    if not db_obj.is_public:
+    if not meta.is_public:
         raise HTTPException(status_code=403, detail="Tệp tin này không được phép truy cập công khai")
 
-    full_path = safe_resolve_path(os.getcwd(), str(db_obj.file_path))  # type: ignore[arg-type]
-    if not os.path.exists(full_path):
-        raise HTTPException(status_code=404, detail="Tệp tin vật lý đã bị xóa")
+    full_path = safe_resolve_path(os.getcwd(), meta.file_path)
+    derivatives = get_image_derivatives()
+    if w is not None and derivatives.is_supported(meta.content_type):
+        storage_io = get_storage_io()
+        variant_path = derivatives.get_variant_path(id, derivatives.variant_for_width(w), meta.content_type)
+        if not await storage_io.exists(variant_path):
+            # Biến thể chưa có (đang xử lý hoặc ảnh upload trước khi có pipeline): tạo ngay
+            info = await derivatives.generate(id, full_path, meta.content_type)
+            if info is not None and meta.width is None:
+                await db.execute(
+                    update(Attachment)
+                    .where(Attachment.id == id)
+                    .values(width=info.width, height=info.height)
+                )
+                cache.invalidate(id)
+        if await storage_io.exists(variant_path):
+            return await file_response(str(variant_path), meta.content_type, meta.filename, PUBLIC_FILE_CACHE_CONTROL)
 
-    return FileResponse(
-        path=full_path,
-        media_type=str(db_obj.content_type),  # type: ignore[arg-type]
-        filename=str(db_obj.filename)  # type: ignore[arg-type]
-    )
+    return await file_response(full_path, meta.content_type, meta.filename, PUBLIC_FILE_CACHE_CONTROL)
 
 
 @router.get("/file/{id}")
 @router.head("/file/{id}")
 async def get_file_content(
     id: int,
+    request: Request,
+    exp: Optional[int] = Query(None),
+    kid: Optional[str] = Query(None),
+    sig: Optional[str] = Query(None),
+    token: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_user_from_token_or_query),
 ):
     """
     Proxy Download: Kiểm tra quyền và stream file trả về.
     Hỗ trợ cả GET và HEAD.
+    URL ký (exp/kid/sig) do get_attachment_info cấp được kiểm tra bằng HMAC,
+    không cần giải mã JWT hay query user; nếu không có chữ ký thì dùng token như cũ.
     """
-    db_obj = await crud_attachment.get(db, id)
-    if not db_obj:
-        raise HTTPException(status_code=404, detail="File không tồn tại")
+    if sig is not None:
+        if not get_url_signer().verify(id, exp, kid, sig):
+            raise HTTPException(status_code=403, detail="Liên kết tải file không hợp lệ hoặc đã hết hạn")
+        meta = await get_attachment_cache().get(db, id)
+        if not meta:
+            raise HTTPException(status_code=404, detail="File không tồn tại")
+    else:
+        current_user = await get_user_from_token_or_query(request, db, token)
+        meta = await get_attachment_cache().get(db, id)
+        if not meta:
+            raise HTTPException(status_code=404, detail="File không tồn tại")
 
-    # Phân quyền: Chủ sở hữu hoặc Rank >= MODERATOR_RANK mới được xem
-    if int(db_obj.user_id) != int(current_user.id) and int(current_user.rank) < MODERATOR_RANK:  # type: ignore[arg-type]
-        raise HTTPException(status_code=403, detail="Không có quyền truy cập file này")
+        # Phân quyền: Chủ sở hữu hoặc Rank >= MODERATOR_RANK mới được xem
+        if meta.user_id != int(current_user.id) and int(current_user.rank) < MODERATOR_RANK:  # type: ignore[arg-type]
+            raise HTTPException(status_code=403, detail="Không có quyền truy cập file này")
 
-    full_path = safe_resolve_path(os.getcwd(), str(db_obj.file_path))  # type: ignore[arg-type]
-    if not os.path.exists(full_path):
-        raise HTTPException(status_code=404, detail="Tệp tin vật lý đã bị xóa")
-
-    # Sử dụng FileResponse để FastAPI tự động handle streaming và headers (Etag, v.v.)
-    return FileResponse(
-        path=full_path,
-        media_type=str(db_obj.content_type),  # type: ignore[arg-type]
-        filename=str(db_obj.filename)  # type: ignore[arg-type]
-    )
+    full_path = safe_resolve_path(os.getcwd(), meta.file_path)
+    return await file_response(full_path, meta.content_type, meta.filename, PRIVATE_FILE_CACHE_CONTROL)
 
 
 @router.get("/{id}", response_model=AttachmentResponse)
 async def get_attachment_info(
     id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_principal),
 ):
     """Lấy metadata của file theo ID"""
     db_obj = await crud_attachment.get(db, id)
@@ -297,26 +988,14 @@ async def get_attachment_info(
     if int(db_obj.user_id) != int(current_user.id) and int(current_user.rank) < MODERATOR_RANK:  # type: ignore[arg-type]
         raise HTTPException(status_code=403, detail="Không có quyền truy cập thông tin này")
 
-    response_obj = AttachmentResponse.model_validate(db_obj)
-
-    if db_obj.is_public:
-        # Trả về URL SEO đẹp qua prefix /media/ cho file public
-        filename = str(db_obj.filename)
-        name_slug = slugify(os.path.splitext(filename)[0])
-        ext = os.path.splitext(filename)[1]
-        response_obj.url = f"/media/{db_obj.id}/{name_slug}{ext}"
-    else:
-        # File private giữ nguyên proxy URL yêu cầu token
-        response_obj.url = f"/backend/api/v1/uploads/file/{db_obj.id}"
-        
-    return response_obj
+    return build_attachment_response(db_obj)
 
 
 @router.delete("/{id}")
 async def delete_attachment(
     id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_principal),
     csrf_token: str = Depends(validate_csrf),
 ):
     """Xóa file khỏi hệ thống"""
@@ -327,15 +1006,30 @@ async def delete_attachment(
     if int(db_obj.user_id) != int(current_user.id) and int(current_user.rank) < ADMIN_RANK:  # type: ignore[arg-type]
         raise HTTPException(status_code=403, detail="Không có quyền xóa file này")
 
-    # Xóa file vật lý
-    full_path_to_delete = safe_resolve_path(os.getcwd(), str(db_obj.file_path))  # type: ignore[arg-type]
-    if os.path.exists(full_path_to_delete):
-        try:
-            os.remove(full_path_to_delete)
-        except Exception as e:
-            logger.error(f"Lỗi khi xóa file vật lý: {e}")
+    file_path_to_delete: Optional[str] = str(db_obj.file_path)
+    blob_id = db_obj.blob_id
 
     # Xóa khỏi DB
     await crud_attachment.remove(db, id)
 
+    # File dùng chung (dedup): chỉ xóa file vật lý khi attachment cuối cùng bị xóa
+    if blob_id is not None:
+        file_path_to_delete = await crud_file_blob.release(db, int(blob_id))  # type: ignore[arg-type]
+
+    async def cleanup() -> None:
+        # Chỉ dọn file/cache khi DB đã commit: commit lỗi thì attachment vẫn trỏ tới file còn nguyên
+        get_attachment_cache().invalidate(id)
+        if file_path_to_delete:
+            full_path_to_delete = safe_resolve_path(os.getcwd(), file_path_to_delete)
+            try:
+                await get_storage_io().remove(full_path_to_delete, missing_ok=True)
+            except Exception as e:
+                logger.error(f"Lỗi khi xóa file vật lý: {e}")
+        try:
+            await get_image_derivatives().delete_variants(id)
+        except Exception as e:
+            logger.error(f"Lỗi khi xóa ảnh phái sinh của file {id}: {e}")
+
+    run_after_commit(db, cleanup)
+
     return {"message": "Xóa file thành công"}
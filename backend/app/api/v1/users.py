@@ -5,17 +5,20 @@ from fastapi_cache import FastAPICache
 from fastapi_cache.decorator import cache
 
 from app.core.database import get_db
-from app.api.deps import get_current_active_user, require_min_rank
-from app.core.security import verify_password, validate_csrf
+from app.api.deps import get_current_active_user, get_current_active_principal, require_min_rank, rate_limit
+from app.core.password_hasher import get_password_hasher
+from app.core.security import validate_csrf
 from app.core.constants import (
     ADMIN_RANK,
     MODERATOR_RANK,
     DEFAULT_PAGE_SIZE,
     MAX_PAGE_SIZE,
     CACHE_USER_LIST_SECONDS,
+    RATE_LIMIT_PASSWORD_RESET,
 )
 from app.core.exceptions import UserNotFound, NotEnoughPermissions
 from app.models.user import User
+from app.services.principal_cache import Principal
 from app.schemas.user import UserResponse, UserUpdate, UserUpdateMe, ChangePassword
 from app.crud import get_by_id, update, update_password, get_all_users, delete
 from loguru import logger
@@ -48,7 +51,10 @@ async def update_current_user(
     return updated_user
 
 
-@router.patch("/me/password")
+@router.patch(
+    "/me/password",
+    dependencies=[Depends(rate_limit("change_password", RATE_LIMIT_PASSWORD_RESET, per="user"))],
+)
 async def change_current_user_password(
     request: Request,
     password_data: ChangePassword,
@@ -56,7 +62,7 @@ async def change_current_user_password(
     current_user: User = Depends(get_current_active_user),
     csrf_token: str = Depends(validate_csrf),
 ):
-    if not verify_password(password_data.old_password, str(current_user.hashed_password)):  # type: ignore[arg-type]
+    if not await get_password_hasher().verify(password_data.old_password, str(current_user.hashed_password)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect old password"
         )
@@ -73,7 +79,7 @@ async def list_users(
     page: int = Query(1, ge=1),
     size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
 ):
     """
     List users with pagination.
@@ -97,7 +103,7 @@ async def list_users(
 async def get_user(
     user_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_principal),
 ):
     if current_user.rank >= MODERATOR_RANK or current_user.id == user_id:
         user = await get_by_id(db, user_id)
@@ -114,7 +120,7 @@ async def update_user_by_id(
     user_id: int,
     user_in: UserUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(MODERATOR_RANK)),
+    current_user: Principal = Depends(require_min_rank(MODERATOR_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     user = await get_by_id(db, user_id)
@@ -161,7 +167,7 @@ async def delete_user(
     request: Request,
     user_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(require_min_rank(ADMIN_RANK)),
+    current_user: Principal = Depends(require_min_rank(ADMIN_RANK)),
     csrf_token: str = Depends(validate_csrf),
 ):
     if user_id == current_user.id:
@@ -40,7 +40,23 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Refresh token đã thu hồi được giữ lại để phát hiện dùng lại (token bị đánh cắp) rồi mới dọn
+    REFRESH_TOKEN_REVOKED_RETENTION_HOURS: int = 24
+    # Bloom filter các refresh token đã thu hồi trong mỗi worker, rebuild định kỳ từ DB
+    REFRESH_TOKEN_FILTER_CAPACITY: int = 100000
+    REFRESH_TOKEN_FILTER_ERROR_RATE: float = 0.01
+    REFRESH_TOKEN_FILTER_REBUILD_SECONDS: int = 300
+    # Token vừa bị rotate vẫn được đổi lấy token mới trong khoảng này (nhiều tab refresh cùng lúc)
+    # thay vì bị coi là dùng lại và thu hồi mọi phiên của user
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS: int = 10
     INSTALL_SECRET: str = "change-me-in-production"
+    # Pool thread cho bcrypt (hash/verify mật khẩu) và số yêu cầu được xếp hàng chờ,
+    # vượt quá thì trả 503 thay vì để request login dồn ứ
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+    # Cost factor bcrypt (2^rounds vòng lặp), hiệu chỉnh theo máy bằng scripts/calibrate_password_hash.py.
+    # Hash cũ khác cost hiện tại được hash lại khi user đăng nhập thành công
+    BCRYPT_ROUNDS: int = 12
 
     @field_validator("SECRET_KEY")
     @classmethod
@@ -91,6 +107,25 @@ class Settings(BaseSettings):
 
     # Cấu hình Redis (cho Caching)
     REDIS_URL: str = "redis://localhost:6379/0"
+    # Timeout kết nối/đọc Redis (giây), hết hạn thì các cache fallback về DB
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 0.5
+
+    # Cache principal (id, email, rank, is_active) cho dependency xác thực:
+    # LRU trong mỗi worker (TTL ngắn) + Redis dùng chung giữa các worker
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    PRINCIPAL_CACHE_LOCAL_TTL_SECONDS: int = 5
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    # Cache token_version mỗi user cho chế độ phân quyền chỉ dựa trên claims của JWT
+    TOKEN_VERSION_CACHE_LOCAL_TTL_SECONDS: int = 5
+    TOKEN_VERSION_CACHE_TTL_SECONDS: int = 300
+
+    # Rate limit 2 tầng: token bucket trong mỗi worker, đồng bộ lượt dùng lên Redis
+    # (INCRBY theo lô) mỗi RATE_LIMIT_SYNC_SECONDS giây; Redis lỗi thì chỉ dùng bucket cục bộ
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_SYNC_SECONDS: float = 1.0
+    # Proxy tin cậy (IP/CIDR, phân cách bằng dấu phẩy): chỉ request đến từ các địa chỉ này
+    # mới được lấy IP client từ X-Forwarded-For/X-Real-IP (nginx trong docker-compose)
+    TRUSTED_PROXIES: str = "127.0.0.1,::1"
 
     # Cấu hình Sentry (tùy chọn)
     SENTRY_DSN: str = ""
@@ -106,6 +141,52 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str = "storage/uploads"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB default
     ALLOWED_EXTENSIONS: str = "jpg,jpeg,png,gif,pdf,doc,docx,xls,xlsx,txt"
+    # Hạn mức tổng dung lượng file mỗi user (MB), 0 = không giới hạn (ghi đè bằng setting upload_quota_mb)
+    UPLOAD_QUOTA_MB: int = 0
+    # Thư mục cache biến thể ảnh (thumb/card/full) và số process resize ảnh
+    UPLOAD_VARIANT_DIR: str = "storage/variants"
+    IMAGE_WORKERS: int = 2
+    # Upload hàng loạt: số file tối đa mỗi request và số file xử lý song song
+    UPLOAD_BULK_MAX_FILES: int = 50
+    UPLOAD_BULK_CONCURRENCY: int = 4
+    # Thời gian sống của phiên upload resumable (giờ)
+    UPLOAD_SESSION_TTL_HOURS: int = 24
+    # Offload tải file cho nginx: backend chỉ phân quyền rồi trả X-Accel-Redirect tới
+    # location internal có prefix này (vd: /_protected/), rỗng = backend tự stream file
+    UPLOAD_ACCEL_REDIRECT_PREFIX: str = ""
+    # LRU cache metadata attachment trong mỗi worker (0 = tắt) và thời gian sống (giây)
+    ATTACHMENT_CACHE_MAX_ENTRIES: int = 10000
+    ATTACHMENT_CACHE_TTL_SECONDS: int = 60
+    # URL ký HMAC cho file private: danh sách key "kid:secret,..." (key đầu dùng để ký,
+    # các key sau chỉ để kiểm tra khi xoay vòng), rỗng = dẫn xuất từ SECRET_KEY
+    SIGNED_URL_KEYS: str = ""
+    SIGNED_URL_TTL_SECONDS: int = 3600
+    # Số thread của pool storage I/O (exists/makedirs/remove/libmagic), tách khỏi event loop
+    STORAGE_IO_WORKERS: int = 16
+
+    # Cấu hình Post Storage
+    # Dung lượng tối đa (bytes) của LRU cache nội dung bài viết trong mỗi worker, 0 = tắt cache
+    POST_CONTENT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # Chế độ ghi file nội dung: none | fsync | group (gom fsync của các lần ghi đồng thời)
+    POST_STORAGE_DURABILITY: str = "group"
+    # Cửa sổ gom lô (ms) cho chế độ group. Mỗi lần lưu bài viết ghi blob rồi index
+    # (2 lô nối tiếp) nên độ trễ thêm tối đa 2 x cửa sổ + thời gian fsync; 0 = commit ngay
+    POST_STORAGE_GROUP_COMMIT_MS: int = Field(default=10, ge=0)
+
+    @field_validator("POST_STORAGE_DURABILITY")
+    @classmethod
+    def validate_post_storage_durability(cls, v: str) -> str:
+        # Sai chính tả phải làm ứng dụng dừng khi khởi động, không được âm thầm đổi chế độ
+        mode = v.strip().lower()
+        if mode not in ("none", "fsync", "group"):
+            raise ValueError("POST_STORAGE_DURABILITY must be one of: none, fsync, group")
+        return mode
+    # Nén cột posts.content (opt-in, bật sau bước --schema của scripts/migrate_post_content_compression.py)
+    POST_CONTENT_COMPRESSION: bool = False
+    # Thư mục chứa dictionary zlib đã train trên nội dung bài viết ({id}.zdict).
+    # Phải dùng chung (volume mount) cho mọi instance, nếu không instance khác không giải nén được
+    POST_CONTENT_DICTIONARY_DIR: str = "storage/dictionaries"
+    POST_CONTENT_COMPRESSION_LEVEL: int = 6
 
     class Config:
         env_file = ".env"
@@ -16,6 +16,7 @@ MIN_PASSWORD_LENGTH = 8
 
 RATE_LIMIT_LOGIN = "20/minute"
 RATE_LIMIT_REGISTER = "10/minute"
+RATE_LIMIT_REFRESH = "60/minute"
 RATE_LIMIT_PASSWORD_RESET = "10/minute"
 
 CACHE_INSTALL_STATUS_SECONDS = 60
@@ -38,5 +39,27 @@ class PostStatus(str, PyEnum):
     ARCHIVED = "archived"
 
 
+class ContentTier(str, PyEnum):
+    HOT = "hot"    # Nội dung nằm trong posts.content + blob storage
+    COLD = "cold"  # Nội dung chỉ còn bản nén ở cold tier, posts.content để trống
+
+
 CACHE_POST_LIST_SECONDS = 300
 CACHE_POST_DETAIL_SECONDS = 600
+
+
+# Upload Module Constants
+# MIME (theo magic bytes) được chấp nhận cho từng extension.
+# Giá trị kết thúc bằng "/" là tiền tố (vd: "text/"). Extension không có trong map thì không ràng buộc MIME.
+UPLOAD_MIME_TYPES = {
+    "jpg": ("image/jpeg",),
+    "jpeg": ("image/jpeg",),
+    "png": ("image/png",),
+    "gif": ("image/gif",),
+    "pdf": ("application/pdf",),
+    "doc": ("application/msword", "application/CDFV2", "application/x-ole-storage"),
+    "xls": ("application/vnd.ms-excel", "application/CDFV2", "application/x-ole-storage"),
+    "docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", "application/zip"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "application/zip"),
+    "txt": ("text/", "inode/x-empty", "application/x-empty"),
+}
@@ -0,0 +1,159 @@
+# Nén nội dung bài viết bằng zlib + dictionary train trên chính nội dung của hệ thống
+import re
+import struct
+import threading
+import zlib
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+from loguru import logger
+
+from .config import get_settings
+
+
+# Frame: MAGIC (3 bytes) + dictionary id (uint32 big-endian, 0 = không dùng dictionary) + zlib stream
+FRAME_MAGIC = b"\x00ZC"
+FRAME_HEADER = struct.Struct(">3sI")
+NO_DICTIONARY = 0
+
+# Kích thước dictionary mặc định: zlib chỉ dùng tối đa 32KB cuối của zdict
+DEFAULT_DICTIONARY_SIZE = 32 * 1024
+
+_TOKEN_RE = re.compile(r"[^\s]+\s*")
+
+
+def is_compressed(data: bytes) -> bool:
+    """Kiểm tra data có phải frame đã nén hay không"""
+    return data[:len(FRAME_MAGIC)] == FRAME_MAGIC
+
+
+def train_dictionary(samples: Iterable[str], size: int = DEFAULT_DICTIONARY_SIZE) -> bytes:
+    """Train dictionary zlib từ tập mẫu nội dung
+
+    zlib không có bộ train như zstd, nên dictionary được ghép từ các dòng
+    và cụm từ lặp lại nhiều nhất. Cụm phổ biến nhất đặt ở cuối dictionary
+    vì khoảng cách tham chiếu ngắn hơn thì mã hóa rẻ hơn.
+    """
+    counter: Counter = Counter()
+    for sample in samples:
+        for line in sample.splitlines(keepends=True):
+            if len(line) > 3:
+                counter[line] += 1
+        tokens = _TOKEN_RE.findall(sample)
+        for n in (1, 2, 3):
+            for i in range(len(tokens) - n + 1):
+                phrase = "".join(tokens[i:i + n])
+                if len(phrase) > 3:
+                    counter[phrase] += 1
+
+    # Ưu tiên cụm tiết kiệm nhiều byte nhất (tần suất x độ dài)
+    ranked = sorted(
+        (item for item in counter.items() if item[1] > 1),
+        key=lambda item: item[1] * len(item[0]),
+        reverse=True,
+    )
+
+    chunks: list[bytes] = []
+    total = 0
+    for phrase, _ in ranked:
+        encoded = phrase.encode("utf-8")
+        if total + len(encoded) > size:
+            continue
+        chunks.append(encoded)
+        total += len(encoded)
+
+    return b"".join(reversed(chunks))
+
+
+class ContentCodec:
+    """
+    Nén / giải nén nội dung bài viết.
+
+    Dictionary lưu dạng file {id}.zdict trong dictionary_dir, id lớn nhất
+    dùng để nén dữ liệu mới; các dictionary cũ vẫn được giữ để giải nén
+    những frame đã ghi trước đó.
+
+    dictionary_dir phải là thư mục dùng chung (volume mount) cho mọi instance:
+    gặp frame có dictionary id chưa biết (vừa train ở nơi khác) thì đọc lại
+    thư mục trước khi báo lỗi.
+    """
+
+    def __init__(self, dictionary_dir: Union[str, Path], level: int = 6):
+        self.dictionary_dir = Path(dictionary_dir)
+        self.level = level
+        self._dictionaries: Optional[dict[int, bytes]] = None
+        self._lock = threading.Lock()
+
+    def _load_dictionaries(self, reload: bool = False) -> dict[int, bytes]:
+        if self._dictionaries is None or reload:
+            with self._lock:
+                if self._dictionaries is None or reload:
+                    dictionaries = dict(self._dictionaries or {})
+                    if self.dictionary_dir.exists():
+                        for path in self.dictionary_dir.glob("*.zdict"):
+                            if path.stem.isdigit() and int(path.stem) not in dictionaries:
+                                dictionaries[int(path.stem)] = path.read_bytes()
+                    self._dictionaries = dictionaries
+                    logger.debug(f"Đã tải {len(dictionaries)} dictionary nén nội dung")
+        return self._dictionaries
+
+    def _get_dictionary(self, dictionary_id: int) -> bytes:
+        dictionary = self._load_dictionaries().get(dictionary_id)
+        if dictionary is None:
+            # Dictionary mới được train sau khi process này đã tải danh sách
+            dictionary = self._load_dictionaries(reload=True).get(dictionary_id)
+        if dictionary is None:
+            raise ValueError(f"Content dictionary {dictionary_id} not found")
+        return dictionary
+
+    @property
+    def current_dictionary_id(self) -> int:
+        dictionaries = self._load_dictionaries()
+        return max(dictionaries) if dictionaries else NO_DICTIONARY
+
+    def save_dictionary(self, data: bytes) -> int:
+        """Lưu dictionary mới, trả về id (dùng cho các lần nén tiếp theo)"""
+        self.dictionary_dir.mkdir(parents=True, exist_ok=True)
+        dictionaries = self._load_dictionaries(reload=True)
+        dictionary_id = (max(dictionaries) if dictionaries else NO_DICTIONARY) + 1
+        # "xb": không bao giờ ghi đè dictionary đã có (frame cũ tham chiếu tới nó)
+        with open(self.dictionary_dir / f"{dictionary_id}.zdict", "xb") as f:
+            f.write(data)
+        dictionaries[dictionary_id] = data
+        return dictionary_id
+
+    def compress(self, content: str) -> bytes:
+        dictionary_id = self.current_dictionary_id
+        if dictionary_id == NO_DICTIONARY:
+            compressor = zlib.compressobj(self.level)
+        else:
+            compressor = zlib.compressobj(self.level, zdict=self._get_dictionary(dictionary_id))
+        body = compressor.compress(content.encode("utf-8")) + compressor.flush()
+        return FRAME_HEADER.pack(FRAME_MAGIC, dictionary_id) + body
+
+    def decompress(self, data: Union[bytes, str]) -> str:
+        """Giải nén frame; dữ liệu chưa nén (hàng chưa backfill) được trả nguyên"""
+        if isinstance(data, str):
+            return data
+        if not is_compressed(data):
+            return data.decode("utf-8")
+
+        _, dictionary_id = FRAME_HEADER.unpack_from(data)
+        body = data[FRAME_HEADER.size:]
+        if dictionary_id == NO_DICTIONARY:
+            decompressor = zlib.decompressobj()
+        else:
+            decompressor = zlib.decompressobj(zdict=self._get_dictionary(dictionary_id))
+        return (decompressor.decompress(body) + decompressor.flush()).decode("utf-8")
+
+
+@lru_cache()
+def get_content_codec() -> ContentCodec:
+    """Codec dùng chung cho cột posts.content"""
+    settings = get_settings()
+    return ContentCodec(
+        settings.POST_CONTENT_DICTIONARY_DIR,
+        level=settings.POST_CONTENT_COMPRESSION_LEVEL,
+    )
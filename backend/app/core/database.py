@@ -1,12 +1,15 @@
 # Database connection MySQL với connection pool
-from typing import AsyncGenerator
+import asyncio
+from typing import AsyncGenerator, Awaitable, Callable
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (
+    AsyncAttrs,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import Session, declarative_base
 
 # Import settings từ config module
 from .config import get_settings
@@ -36,7 +39,42 @@ AsyncSessionLocal = async_sessionmaker(
 
 # Base class cho tất cả SQLAlchemy models
 # Các model sẽ inherit từ Base này
-Base = declarative_base()
+# AsyncAttrs cho phép tải cột deferred trong async: await obj.awaitable_attrs.<tên cột>
+Base = declarative_base(cls=AsyncAttrs)
+
+
+# Giữ tham chiếu tới các task after-commit đang chạy (tránh bị GC giữa chừng)
+_after_commit_tasks: set = set()
+
+
+def run_after_commit(db: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """
+    Chạy callback (async) ngay sau khi transaction hiện tại của db commit thành công.
+
+    Dùng để invalidate cache: invalidate trước commit thì request đồng thời có thể
+    đọc lại dòng cũ và cache nó trong khoảng trước khi commit.
+    Transaction bị rollback thì callback bị bỏ.
+    """
+    db.sync_session.info.setdefault("after_commit", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session: Session) -> None:
+    callbacks = session.info.pop("after_commit", None)
+    if not callbacks:
+        return
+    loop = asyncio.get_running_loop()
+    for callback in callbacks:
+        task = loop.create_task(callback())
+        _after_commit_tasks.add(task)
+        task.add_done_callback(_after_commit_tasks.discard)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_after_commit_callbacks(session: Session, transaction) -> None:
+    # Transaction gốc kết thúc mà chưa commit (rollback): bỏ callback; savepoint thì bỏ qua
+    if transaction.parent is None:
+        session.info.pop("after_commit", None)
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
@@ -83,7 +121,9 @@ async def init_db() -> None:
     from app.models.user import User  # noqa: F401
     from app.models.settings import Setting  # noqa: F401
     from app.models.refresh_token import RefreshToken  # noqa: F401
+    from app.models.file_blob import FileBlob  # noqa: F401
     from app.models.attachment import Attachment  # noqa: F401
+    from app.models.storage_usage import UserStorageUsage  # noqa: F401
     from app.models.post import Post  # noqa: F401
     from app.models.post_metadata import PostMetadata  # noqa: F401
     from app.models.category import Category  # noqa: F401
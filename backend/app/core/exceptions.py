@@ -39,3 +39,58 @@ class InvalidToken(HTTPException):
 class ExpiredToken(HTTPException):
     def __init__(self, detail: str = "Token expired"):
         super().__init__(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
+
+
+class UploadSessionNotFound(HTTPException):
+    def __init__(self, detail: str = "Upload session not found or expired"):
+        super().__init__(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
+
+
+class UploadOffsetMismatch(HTTPException):
+    def __init__(self, offset: int, detail: str = "Upload offset mismatch"):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=detail,
+            headers={"Upload-Offset": str(offset)},
+        )
+
+
+class UploadSessionBusy(HTTPException):
+    def __init__(self, detail: str = "Another chunk is being written to this upload session"):
+        super().__init__(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+
+class PasswordHashOverloaded(HTTPException):
+    def __init__(self, retry_after: int = 1, detail: str = "Server is busy, please try again shortly"):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class RateLimited(HTTPException):
+    def __init__(self, retry_after: int = 1, detail: str = "Too many requests. Please try again later."):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class FileBlobContention(HTTPException):
+    def __init__(self, retry_after: int = 1, detail: str = "The same file is being uploaded concurrently, please retry"):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class StorageUsageContention(HTTPException):
+    def __init__(self, retry_after: int = 1, detail: str = "Storage usage is being updated concurrently, please retry"):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)},
+        )
@@ -0,0 +1,98 @@
+# LRU cache trong process - dùng chung cho các cache nóng (nội dung bài viết, ...)
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """
+    LRU cache giới hạn theo số entry và/hoặc tổng dung lượng (bytes).
+
+    - max_entries: số entry tối đa (0 = không giới hạn)
+    - max_bytes: tổng dung lượng tối đa theo hàm sizeof (0 = không giới hạn)
+    - Entry lớn hơn 1/4 max_bytes không được cache để tránh đẩy hết entry khác ra ngoài
+
+    Thread-safe để dùng được cả từ thread pool lẫn event loop.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 0,
+        max_bytes: int = 0,
+        sizeof: Optional[Callable[[V], int]] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or (lambda value: 1)
+        self._data: "OrderedDict[Hashable, tuple[V, int]]" = OrderedDict()
+        self._lock = Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(
+        self, key: Hashable, is_valid: Optional[Callable[[V], bool]] = None
+    ) -> Optional[V]:
+        """Lấy giá trị và đánh dấu là mới dùng gần nhất. Ghi nhận hit/miss.
+
+        is_valid: hàm kiểm tra entry còn hợp lệ không (vd: so sánh mtime),
+        entry không hợp lệ bị loại bỏ và tính là miss.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and is_valid is not None and not is_valid(item[0]):
+                self._pop(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: V) -> bool:
+        """Thêm/cập nhật entry, loại bỏ entry cũ nhất khi vượt giới hạn.
+
+        Returns:
+            bool: False nếu entry quá lớn để cache
+        """
+        size = self._sizeof(value)
+        with self._lock:
+            self._pop(key)
+            if self.max_bytes and size > self.max_bytes // 4:
+                return False
+
+            self._data[key] = (value, size)
+            self.current_bytes += size
+            while self._data and (
+                (self.max_entries and len(self._data) > self.max_entries)
+                or (self.max_bytes and self.current_bytes > self.max_bytes)
+            ):
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self.current_bytes -= evicted_size
+            return True
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def _pop(self, key: Hashable) -> Any:
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.current_bytes -= item[1]
+        return item
@@ -0,0 +1,9 @@
+# Prometheus metrics helpers
+from prometheus_client import REGISTRY
+
+
+# Use REGISTRY to check if collectors are already registered to avoid errors in tests
+def get_metric(metric_class, name, *args, **kwargs):
+    if name in REGISTRY._names_to_collectors:
+        return REGISTRY._names_to_collectors[name]
+    return metric_class(name, *args, **kwargs)
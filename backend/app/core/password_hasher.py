@@ -0,0 +1,118 @@
+# Hash/verify mật khẩu bcrypt trên pool riêng, có giới hạn hàng đợi (admission control)
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Optional, TypeVar
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from .config import get_settings
+from .exceptions import PasswordHashOverloaded
+from .metrics import get_metric
+from .security import get_password_hash, verify_and_update_password, verify_password
+
+
+T = TypeVar("T")
+
+password_hash_duration_seconds = get_metric(
+    Histogram,
+    "password_hash_duration_seconds",
+    "bcrypt hash/verify latency (excluding queue wait)",
+    ["op"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0),
+)
+
+password_hash_wait_seconds = get_metric(
+    Histogram,
+    "password_hash_wait_seconds",
+    "Time password hashing requests spend queued",
+)
+
+password_hash_pending = get_metric(
+    Gauge,
+    "password_hash_pending",
+    "Password hashing requests running or queued",
+)
+
+password_hash_rejected_total = get_metric(
+    Counter,
+    "password_hash_rejected_total",
+    "Password hashing requests shed with 503 because the queue was full",
+    ["op"],
+)
+
+
+class PasswordHasher:
+    """
+    Chạy bcrypt (~250ms CPU mỗi lần) trên thread pool cố định thay vì event loop.
+
+    Thư viện bcrypt nhả GIL khi tính hash nên các thread chạy song song thật.
+    Tối đa max_workers lời gọi chạy cùng lúc, thêm max_queue lời gọi được chờ;
+    vượt quá thì từ chối ngay bằng 503 để một đợt login dồn dập không kéo
+    latency của toàn bộ worker lên theo.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pending = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    def _call(op: str, submitted_at: float, func: Callable[..., T], *args: Any) -> T:
+        started_at = time.perf_counter()
+        password_hash_wait_seconds.observe(started_at - submitted_at)
+        try:
+            return func(*args)
+        finally:
+            password_hash_duration_seconds.labels(op=op).observe(time.perf_counter() - started_at)
+
+    async def _run(self, op: str, func: Callable[..., T], *args: Any) -> T:
+        if self._pending >= self.max_workers + self.max_queue:
+            password_hash_rejected_total.labels(op=op).inc()
+            raise PasswordHashOverloaded()
+
+        self._pending += 1
+        password_hash_pending.inc()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, self._call, op, time.perf_counter(), func, *args
+            )
+        finally:
+            self._pending -= 1
+            password_hash_pending.dec()
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run("verify", verify_password, plain_password, hashed_password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+        """Verify, kèm hash mới nếu hash đang lưu dùng cost cũ (hash lại trong cùng lượt chạy trên pool)"""
+        return await self._run("verify", verify_and_update_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", get_password_hash, password)
+
+
+@lru_cache()
+def get_password_hasher() -> PasswordHasher:
+    """Pool dùng chung trong mỗi worker"""
+    settings = get_settings()
+    return PasswordHasher(
+        max_workers=settings.PASSWORD_HASH_WORKERS,
+        max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    )
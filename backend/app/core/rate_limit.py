@@ -1,6 +1,267 @@
+import asyncio
+import ipaddress
+import math
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from loguru import logger
+from prometheus_client import Counter
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
 from slowapi import Limiter
-from slowapi.util import get_remote_address
+from starlette.requests import Request
+
 from .config import get_settings
+from .exceptions import RateLimited
+from .lru import LRUCache
+from .metrics import get_metric
+from .redis import get_redis
 
 settings = get_settings()
-limiter = Limiter(key_func=get_remote_address, storage_uri=settings.REDIS_URL)
+
+_trusted_proxies = [
+    ipaddress.ip_network(entry.strip(), strict=False)
+    for entry in settings.TRUSTED_PROXIES.split(",")
+    if entry.strip()
+]
+
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_proxies)
+
+
+def get_client_ip(request: Request) -> str:
+    """
+    IP client thật khi backend đứng sau nginx.
+
+    Chỉ tin X-Forwarded-For/X-Real-IP khi kết nối đến từ proxy tin cậy (TRUSTED_PROXIES);
+    X-Forwarded-For được duyệt từ phải sang trái, bỏ qua các hop là proxy tin cậy,
+    nên client không thể giả IP bằng cách tự gửi header.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not _is_trusted_proxy(peer):
+        return peer
+
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if forwarded_for:
+        for hop in reversed([hop.strip() for hop in forwarded_for.split(",") if hop.strip()]):
+            if not _is_trusted_proxy(hop):
+                return hop
+    return request.headers.get("x-real-ip", peer).strip()
+
+
+limiter = Limiter(key_func=get_client_ip, storage_uri=settings.REDIS_URL)
+
+rate_limit_rejected_total = get_metric(
+    Counter,
+    "rate_limit_rejected_total",
+    "Requests rejected with 429 by the hybrid rate limiter",
+    ["scope"],
+)
+
+rate_limit_sync_failures_total = get_metric(
+    Counter,
+    "rate_limit_sync_failures_total",
+    "Failed rate limit reconciliations with Redis (limiter fell back to local buckets)",
+)
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_limit(limit: str) -> tuple[int, int]:
+    """"20/minute" -> (20, 60)"""
+    count, period = limit.split("/")
+    return int(count), _PERIODS[period.strip().rstrip("s")]
+
+
+@dataclass
+class _Bucket:
+    limit: int
+    period: int
+    tokens: float
+    refilled_at: float
+    window: int
+    # Lượt dùng toàn cụm trong window (theo lần đồng bộ gần nhất, đã gồm lượt của worker này)
+    remote_used: int = 0
+    # Lượt dùng của worker này chưa gửi lên Redis
+    pending: int = 0
+
+
+class HybridRateLimiter:
+    """
+    Rate limiter 2 tầng, không tốn round trip Redis trên đường đi của request.
+
+    - Mỗi worker giữ token bucket cục bộ cho từng (scope, key): một worker
+      không bao giờ vượt quá limit
+    - Task nền (start/stop trong lifespan) cứ mỗi sync_interval gom lượt dùng chưa
+      gửi và đẩy lên Redis bằng INCRBY theo fixed window trong một pipeline; kết
+      quả trả về là tổng lượt dùng của cả cụm, dùng để chặn tiếp ở các worker
+    - Key mới gặp lần đầu (hoặc sang window mới): đọc ngay tổng lượt dùng hiện có
+      trên Redis (MGET gom theo lô) thay vì bắt đầu từ 0
+    - Redis chậm/lỗi: bỏ qua lần đồng bộ đó (fail open) và chỉ dựa vào bucket cục bộ
+
+    Giới hạn toàn cụm vì vậy là xấp xỉ: có thể vượt tối đa số lượt mà các worker
+    khác nhận trong một sync_interval (hoặc trong lúc chờ đọc key mới).
+    """
+
+    KEY_PREFIX = "ratelimit:"
+
+    def __init__(
+        self,
+        redis: Optional[aioredis.Redis],
+        max_keys: int,
+        sync_interval: float,
+        sync_timeout: float,
+    ):
+        self.redis = redis
+        self.sync_interval = sync_interval
+        self.sync_timeout = sync_timeout
+        self._buckets: LRUCache[_Bucket] = LRUCache(max_entries=max_keys)
+        self._dirty: dict[str, _Bucket] = {}
+        # Bucket chưa biết lượt dùng toàn cụm của window hiện tại
+        self._unseen: dict[str, _Bucket] = {}
+        self._seed_task: Optional[asyncio.Task] = None
+        self._sync_task: Optional[asyncio.Task] = None
+
+    def _bucket(self, bucket_key: str, limit: int, period: int, now: float, window: int) -> _Bucket:
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None or bucket.limit != limit or bucket.period != period:
+            bucket = _Bucket(limit=limit, period=period, tokens=float(limit), refilled_at=now, window=window)
+            self._buckets.put(bucket_key, bucket)
+            self._unseen[bucket_key] = bucket
+            return bucket
+
+        bucket.tokens = min(float(limit), bucket.tokens + (now - bucket.refilled_at) * limit / period)
+        bucket.refilled_at = now
+        if bucket.window != window:
+            # Sang window mới: lượt dùng của window cũ không còn tính
+            bucket.window = window
+            bucket.remote_used = 0
+            bucket.pending = 0
+            self._unseen[bucket_key] = bucket
+        return bucket
+
+    def hit(self, scope: str, key: str, limit: str) -> None:
+        """Tính một lượt cho (scope, key), raise RateLimited (429) khi vượt limit"""
+        count, period = parse_limit(limit)
+        now = time.monotonic()
+        window = int(time.time() // period)
+        bucket_key = f"{scope}:{key}"
+        bucket = self._bucket(bucket_key, count, period, now, window)
+
+        if bucket.tokens < 1 or bucket.remote_used + bucket.pending >= count:
+            rate_limit_rejected_total.labels(scope=scope).inc()
+            if bucket.tokens < 1:
+                retry_after = (1 - bucket.tokens) * period / count
+            else:
+                retry_after = (window + 1) * period - time.time()
+            raise RateLimited(retry_after=max(1, math.ceil(retry_after)))
+
+        bucket.tokens -= 1
+        bucket.pending += 1
+        self._dirty[bucket_key] = bucket
+        self._maybe_seed()
+
+    def _maybe_seed(self) -> None:
+        if self.redis is None or not self._unseen:
+            return
+        if self._seed_task is not None and not self._seed_task.done():
+            return
+        self._seed_task = asyncio.create_task(self.seed())
+
+    async def seed(self) -> None:
+        """Đọc lượt dùng toàn cụm hiện có của các key mới (MGET theo lô)"""
+        while self.redis is not None and self._unseen:
+            unseen, self._unseen = self._unseen, {}
+            batch = [(bucket_key, bucket, bucket.window) for bucket_key, bucket in unseen.items()]
+            redis_keys = [f"{self.KEY_PREFIX}{bucket_key}:{window}" for bucket_key, _, window in batch]
+            try:
+                results = await asyncio.wait_for(self.redis.mget(redis_keys), timeout=self.sync_timeout)
+            except (RedisError, OSError, asyncio.TimeoutError) as e:
+                # Không đọc được: bucket đi tiếp với lượt dùng cục bộ, lần sync sau sẽ cập nhật
+                rate_limit_sync_failures_total.inc()
+                logger.debug(f"Không đọc được lượt dùng rate limit từ Redis: {e}")
+                return
+
+            for (_, bucket, window), value in zip(batch, results):
+                if bucket.window != window:
+                    continue
+                # Có thể một lần sync đã trả về tổng mới hơn trong lúc chờ MGET
+                bucket.remote_used = max(bucket.remote_used, int(value or 0))
+
+    def start(self) -> None:
+        """Chạy task nền đồng bộ định kỳ (gọi trong lifespan khi khởi động)"""
+        if self.redis is None or (self._sync_task is not None and not self._sync_task.done()):
+            return
+        self._sync_task = asyncio.create_task(self._sync_forever())
+
+    async def stop(self) -> None:
+        """Dừng task nền và đẩy nốt lượt dùng còn lại (gọi trong lifespan khi tắt)"""
+        for task in (self._sync_task, self._seed_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._sync_task = self._seed_task = None
+        await self.sync()
+
+    async def _sync_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Đồng bộ rate limit lỗi: {e}")
+
+    async def sync(self) -> None:
+        """Đẩy lượt dùng chưa gửi lên Redis (1 pipeline) và cập nhật tổng lượt dùng toàn cụm"""
+        if self.redis is None or not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        batch = [
+            (bucket_key, bucket, bucket.window, bucket.pending)
+            for bucket_key, bucket in dirty.items()
+            if bucket.pending
+        ]
+        if not batch:
+            return
+
+        pipe = self.redis.pipeline(transaction=False)
+        for bucket_key, bucket, window, pending in batch:
+            redis_key = f"{self.KEY_PREFIX}{bucket_key}:{window}"
+            pipe.incrby(redis_key, pending)
+            pipe.expire(redis_key, bucket.period * 2)
+        try:
+            results = await asyncio.wait_for(pipe.execute(), timeout=self.sync_timeout)
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            rate_limit_sync_failures_total.inc()
+            logger.debug(f"Không đồng bộ được rate limit với Redis: {e}")
+            # Giữ lại lượt dùng để gửi ở lần sau (nếu vẫn cùng window)
+            for bucket_key, bucket, window, _ in batch:
+                if bucket.window == window:
+                    self._dirty[bucket_key] = bucket
+            return
+
+        for (_, bucket, window, pending), total in zip(batch, results[::2]):
+            if bucket.window != window:
+                continue
+            bucket.pending -= pending
+            bucket.remote_used = int(total)
+
+
+@lru_cache()
+def get_rate_limiter() -> HybridRateLimiter:
+    return HybridRateLimiter(
+        redis=get_redis(),
+        max_keys=settings.RATE_LIMIT_MAX_KEYS,
+        sync_interval=settings.RATE_LIMIT_SYNC_SECONDS,
+        sync_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+    )
@@ -0,0 +1,22 @@
+# Redis client dùng chung trong mỗi worker (cache response, principal cache, ...)
+from functools import lru_cache
+
+from redis import asyncio as aioredis
+
+from .config import get_settings
+
+
+@lru_cache()
+def get_redis() -> aioredis.Redis:
+    """
+    Client Redis dùng chung, kết nối lazy qua connection pool.
+    Timeout ngắn để khi Redis chậm/sập các cache phía trên fallback về DB nhanh.
+    """
+    settings = get_settings()
+    return aioredis.from_url(
+        settings.REDIS_URL,
+        encoding="utf8",
+        decode_responses=True,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+    )
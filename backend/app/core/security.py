@@ -12,7 +12,9 @@ from app.schemas.token import TokenPayload
 
 settings = get_settings()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
@@ -77,6 +79,16 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """
+    Verify a password and, if the stored hash uses outdated parameters
+    (different bcrypt rounds or a deprecated scheme), return a new hash to store.
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -129,6 +141,10 @@ async def verify_token(token: str = Depends(oauth2_scheme)) -> TokenPayload:
         raise expired_exception
     except JWTError:
         raise credentials_exception
+
+    # Refresh token chỉ dùng cho /auth/refresh, không được dùng thay access token
+    if token_data.type == "refresh":
+        raise credentials_exception
     return token_data
 
 
@@ -0,0 +1,171 @@
+# Session cookie chỉ được giải mã/ký lại khi route thực sự dùng request.session
+import json
+import typing
+from base64 import b64decode, b64encode
+from typing import Any, Callable, Optional
+
+from itsdangerous.exc import BadSignature
+from starlette.datastructures import MutableHeaders
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.requests import HTTPConnection
+from starlette.types import Message, Receive, Scope, Send
+
+
+class LazySession(dict):
+    """
+    Session chỉ unsign + decode cookie ở lần truy cập đầu tiên.
+
+    Mọi thao tác đọc/ghi đều gọi _load() trước; request không đụng tới
+    request.session thì cookie không bao giờ được giải mã.
+    Tự theo dõi accessed/modified (không dựa vào lớp Session chỉ có ở Starlette mới).
+    """
+
+    def __init__(self, loader: Callable[[], Optional[dict]]):
+        super().__init__()
+        self._loader: Optional[Callable[[], Optional[dict]]] = loader
+        self.initial_was_empty = True
+        self.accessed = False
+        self.modified = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loader is None
+
+    def _load(self) -> None:
+        self.accessed = True
+        if self._loader is None:
+            return
+        loader, self._loader = self._loader, None
+        data = loader()
+        if data:
+            # Ghi thẳng vào dict, không đánh dấu modified
+            dict.update(self, data)
+            self.initial_was_empty = False
+
+    def _load_for_write(self) -> None:
+        self._load()
+        self.modified = True
+
+    def __getitem__(self, key: str) -> Any:
+        self._load()
+        return super().__getitem__(key)
+
+    def __contains__(self, key: object) -> bool:
+        self._load()
+        return super().__contains__(key)
+
+    def __iter__(self) -> typing.Iterator[str]:
+        self._load()
+        return super().__iter__()
+
+    def __len__(self) -> int:
+        self._load()
+        return super().__len__()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        self._load()
+        return super().get(key, default)
+
+    def keys(self):  # type: ignore[override]
+        self._load()
+        return super().keys()
+
+    def values(self):  # type: ignore[override]
+        self._load()
+        return super().values()
+
+    def items(self):  # type: ignore[override]
+        self._load()
+        return super().items()
+
+    def copy(self) -> dict:  # type: ignore[override]
+        self._load()
+        return dict(super().items())
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._load_for_write()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        self._load_for_write()
+        super().__delitem__(key)
+
+    def clear(self) -> None:
+        self._load_for_write()
+        super().clear()
+
+    def pop(self, key: str, *args: Any) -> Any:
+        self._load_for_write()
+        return super().pop(key, *args)
+
+    def popitem(self) -> tuple[str, Any]:
+        self._load_for_write()
+        return super().popitem()
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        self._load_for_write()
+        return super().setdefault(key, default)
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        self._load_for_write()
+        super().update(*args, **kwargs)
+
+    def __ior__(self, other: Any, /) -> "LazySession":  # type: ignore[override,misc]
+        self._load_for_write()
+        super().__ior__(other)
+        return self
+
+
+class LazySessionMiddleware(SessionMiddleware):
+    """
+    Thay SessionMiddleware: cùng định dạng cookie, cùng tham số.
+
+    Session chỉ dùng cho CSRF (validate_csrf, /csrf-token) nên các route công khai
+    (danh sách bài viết, tải file...) không còn tốn chi phí itsdangerous
+    (verify HMAC + base64 + json) ở mỗi request. Cookie chỉ được ký lại khi
+    session bị thay đổi, và không thêm Vary: Cookie nếu session không được đọc.
+    """
+
+    def _unsign(self, cookie: str) -> Optional[dict]:
+        try:
+            data = self.signer.unsign(cookie.encode("utf-8"), max_age=self.max_age)
+        except BadSignature:
+            return None
+        return json.loads(b64decode(data))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):  # pragma: no cover
+            await self.app(scope, receive, send)
+            return
+
+        cookie = HTTPConnection(scope).cookies.get(self.session_cookie)
+        session = LazySession(lambda: self._unsign(cookie) if cookie else None)
+        scope["session"] = session
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and session.accessed:
+                headers = MutableHeaders(scope=message)
+                headers.add_vary_header("Cookie")
+                # Session chưa bị sửa (kể cả chưa được nạp) thì giữ nguyên cookie
+                if session.modified and session:
+                    headers.append("Set-Cookie", self._cookie_header(session))
+                elif session.modified and not session.initial_was_empty:
+                    headers.append("Set-Cookie", self._clear_cookie_header())
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _cookie_header(self, session: LazySession) -> str:
+        data = b64encode(json.dumps(dict(session.items())).encode("utf-8"))
+        data = self.signer.sign(data)
+        max_age = f"Max-Age={self.max_age}; " if self.max_age is not None else ""
+        return (
+            f"{self.session_cookie}={data.decode('utf-8')}; path={self.path}; "
+            f"{max_age}{self.security_flags}"
+        )
+
+    def _clear_cookie_header(self) -> str:
+        return (
+            f"{self.session_cookie}=null; path={self.path}; "
+            f"expires=Thu, 01 Jan 1970 00:00:00 GMT; {self.security_flags}"
+        )
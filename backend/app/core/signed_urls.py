@@ -0,0 +1,101 @@
+# URL ký HMAC có thời hạn cho file private: tải file không cần giải mã JWT hay query user
+import base64
+import hashlib
+import hmac
+import time
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import urlencode
+
+from .config import get_settings
+
+
+# Key mặc định (khi không cấu hình SIGNED_URL_KEYS) được dẫn xuất từ SECRET_KEY
+DEFAULT_KEY_ID = "default"
+
+# Thời điểm hết hạn được làm tròn lên theo bước này để cùng một file
+# có cùng URL trong một khoảng thời gian (trình duyệt/nginx cache được)
+EXPIRY_STEP_SECONDS = 300
+
+
+def parse_keys(raw: str) -> dict[str, bytes]:
+    """Đọc danh sách key dạng "kid1:secret1,kid2:secret2" (key đầu tiên dùng để ký)"""
+    keys: dict[str, bytes] = {}
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        kid, sep, secret = item.partition(":")
+        if not sep or not kid or not secret:
+            raise ValueError(f"Signing key không hợp lệ: '{kid}' (cần dạng kid:secret)")
+        keys[kid] = secret.encode("utf-8")
+    return keys
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+class UrlSigner:
+    """
+    Ký và kiểm tra URL tải file: HMAC-SHA256 trên "{attachment_id}:{exp}".
+
+    Xoay vòng key: thêm key mới vào đầu SIGNED_URL_KEYS, giữ key cũ phía sau
+    cho tới khi các URL đã phát hành hết hạn rồi mới bỏ đi.
+    """
+
+    def __init__(self, keys: dict[str, bytes], ttl_seconds: int):
+        if not keys:
+            raise ValueError("Cần ít nhất một signing key")
+        self.keys = keys
+        self.active_kid = next(iter(keys))
+        self.ttl_seconds = ttl_seconds
+
+    def _signature(self, key: bytes, attachment_id: int, expires: int) -> str:
+        message = f"{attachment_id}:{expires}".encode("ascii")
+        return _b64encode(hmac.new(key, message, hashlib.sha256).digest())
+
+    def sign(self, attachment_id: int, now: Optional[float] = None) -> dict[str, str]:
+        """Tạo query params (exp, kid, sig) cho attachment"""
+        now = time.time() if now is None else now
+        expires = int(now) + self.ttl_seconds
+        expires += -expires % EXPIRY_STEP_SECONDS
+        return {
+            "exp": str(expires),
+            "kid": self.active_kid,
+            "sig": self._signature(self.keys[self.active_kid], attachment_id, expires),
+        }
+
+    def sign_url(self, path: str, attachment_id: int) -> str:
+        return f"{path}?{urlencode(self.sign(attachment_id))}"
+
+    def verify(
+        self,
+        attachment_id: int,
+        expires: Optional[int],
+        kid: Optional[str],
+        signature: Optional[str],
+        now: Optional[float] = None,
+    ) -> bool:
+        """Kiểm tra chữ ký còn hạn và khớp với một key đang được chấp nhận"""
+        if expires is None or not kid or not signature:
+            return False
+        now = time.time() if now is None else now
+        if expires < now:
+            return False
+        key = self.keys.get(kid)
+        if key is None:
+            return False
+        expected = self._signature(key, attachment_id, expires)
+        return hmac.compare_digest(expected, signature)
+
+
+@lru_cache()
+def get_url_signer() -> UrlSigner:
+    settings = get_settings()
+    keys = parse_keys(settings.SIGNED_URL_KEYS)
+    if not keys:
+        # Tách miền với JWT: không dùng trực tiếp SECRET_KEY làm key HMAC
+        derived = hmac.new(settings.SECRET_KEY.encode("utf-8"), b"signed-file-url", hashlib.sha256)
+        keys = {DEFAULT_KEY_ID: derived.digest()}
+    return UrlSigner(keys, ttl_seconds=settings.SIGNED_URL_TTL_SECONDS)
@@ -0,0 +1,133 @@
+# Thread pool riêng cho thao tác filesystem/libmagic: storage chậm (NFS) không chặn event loop
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Any, Callable, Optional, TypeVar
+
+from prometheus_client import Gauge, Histogram
+
+from .config import get_settings
+from .metrics import get_metric
+
+
+T = TypeVar("T")
+
+storage_io_queue_depth = get_metric(
+    Gauge,
+    "storage_io_queue_depth",
+    "Storage I/O calls waiting for a free worker thread",
+)
+
+storage_io_in_flight = get_metric(
+    Gauge,
+    "storage_io_in_flight",
+    "Storage I/O calls currently running",
+)
+
+storage_io_wait_seconds = get_metric(
+    Histogram,
+    "storage_io_wait_seconds",
+    "Time storage I/O calls spend queued before running",
+)
+
+storage_io_duration_seconds = get_metric(
+    Histogram,
+    "storage_io_duration_seconds",
+    "Storage I/O call latency",
+    ["op"],
+)
+
+
+class StorageIOExecutor:
+    """
+    Chạy các lời gọi filesystem blocking (exists, makedirs, remove, libmagic...)
+    trên thread pool có kích thước cố định, tách khỏi default executor của
+    asyncio để I/O chậm không chiếm hết thread của các tác vụ khác.
+
+    Mỗi lời gọi được gắn nhãn `op` cho metric latency; thời gian chờ trong
+    hàng đợi đo riêng để thấy khi nào pool quá nhỏ so với tải.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="storage-io"
+            )
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    def _dequeue(queued: list) -> None:
+        # list.pop() là atomic (GIL): chỉ một trong hai phía (thread chạy call hoặc
+        # callback khi request bị hủy lúc call còn xếp hàng) giảm queue depth
+        try:
+            queued.pop()
+        except IndexError:
+            return
+        storage_io_queue_depth.dec()
+
+    @classmethod
+    def _call(cls, op: str, queued: list, submitted_at: float, func: Callable[..., T], *args: Any) -> T:
+        started_at = time.perf_counter()
+        cls._dequeue(queued)
+        storage_io_in_flight.inc()
+        storage_io_wait_seconds.observe(started_at - submitted_at)
+        try:
+            return func(*args)
+        finally:
+            storage_io_in_flight.dec()
+            storage_io_duration_seconds.labels(op=op).observe(time.perf_counter() - started_at)
+
+    async def run(self, op: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Chạy func(*args, **kwargs) trên pool storage I/O"""
+        if kwargs:
+            func = partial(func, **kwargs)
+        loop = asyncio.get_running_loop()
+        queued = [True]
+        storage_io_queue_depth.inc()
+        try:
+            future = loop.run_in_executor(
+                self.executor, self._call, op, queued, time.perf_counter(), func, *args
+            )
+        except BaseException:
+            self._dequeue(queued)
+            raise
+        # Bị hủy khi call chưa chạy thì _call không bao giờ được gọi
+        future.add_done_callback(lambda _: self._dequeue(queued))
+        return await future
+
+    async def exists(self, path: "str | os.PathLike[str]") -> bool:
+        return await self.run("exists", os.path.exists, path)
+
+    async def makedirs(self, path: "str | os.PathLike[str]") -> None:
+        await self.run("makedirs", os.makedirs, path, exist_ok=True)
+
+    async def remove(self, path: "str | os.PathLike[str]", missing_ok: bool = False) -> bool:
+        """Xóa file, trả về False nếu file không tồn tại (khi missing_ok)"""
+        try:
+            await self.run("remove", os.remove, path)
+        except FileNotFoundError:
+            if not missing_ok:
+                raise
+            return False
+        return True
+
+    async def replace(self, src: "str | os.PathLike[str]", dst: "str | os.PathLike[str]") -> None:
+        await self.run("replace", os.replace, src, dst)
+
+
+@lru_cache()
+def get_storage_io() -> StorageIOExecutor:
+    """Executor dùng chung trong mỗi worker"""
+    return StorageIOExecutor(max_workers=get_settings().STORAGE_IO_WORKERS)
@@ -1,6 +1,7 @@
 from typing import Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, or_
+from app.crud import crud_storage_usage
 from app.models.attachment import Attachment
 from app.schemas.attachment import AttachmentCreate
 
@@ -13,13 +14,54 @@ async def create(db: AsyncSession, obj_in: AttachmentCreate) -> Attachment:
         file_size=obj_in.file_size,
         is_public=obj_in.is_public,
         user_id=obj_in.user_id,
+        blob_id=obj_in.blob_id,
     )
     db.add(db_obj)
     await db.flush()
+    await crud_storage_usage.add_usage(db, obj_in.user_id, obj_in.file_size, 1)
     await db.refresh(db_obj)
     return db_obj
 
 
+async def create_multi(db: AsyncSession, objs_in: List[AttachmentCreate]) -> List[Attachment]:
+    """Tạo nhiều attachment trong một lần flush (upload hàng loạt)
+
+    Bộ đếm dung lượng được cộng một lần cho mỗi user, các cột server default
+    (created_at) được nạp lại bằng một câu SELECT duy nhất.
+    """
+    if not objs_in:
+        return []
+    db_objs = [
+        Attachment(
+            filename=obj_in.filename,
+            file_path=obj_in.file_path,
+            content_type=obj_in.content_type,
+            file_size=obj_in.file_size,
+            is_public=obj_in.is_public,
+            user_id=obj_in.user_id,
+            blob_id=obj_in.blob_id,
+        )
+        for obj_in in objs_in
+    ]
+    db.add_all(db_objs)
+    await db.flush()
+
+    usage: dict[int, list[int]] = {}
+    for obj_in in objs_in:
+        totals = usage.setdefault(obj_in.user_id, [0, 0])
+        totals[0] += obj_in.file_size
+        totals[1] += 1
+    for user_id, (bytes_delta, files_delta) in usage.items():
+        await crud_storage_usage.add_usage(db, user_id, bytes_delta, files_delta)
+
+    await db.execute(
+        select(Attachment)
+        .where(Attachment.id.in_([db_obj.id for db_obj in db_objs]))
+        .execution_options(populate_existing=True)
+    )
+    return db_objs
+
+
 async def get(db: AsyncSession, id: int) -> Optional[Attachment]:
     result = await db.execute(select(Attachment).where(Attachment.id == id))
     return result.scalar_one_or_none()
@@ -42,4 +84,25 @@ async def remove(db: AsyncSession, id: int) -> Optional[Attachment]:
     if db_obj:
         await db.delete(db_obj)
         await db.flush()
+        await crud_storage_usage.add_usage(db, int(db_obj.user_id), -int(db_obj.file_size), -1)  # type: ignore[arg-type]
     return db_obj
+
+
+async def get_referencing_blob(
+    db: AsyncSession, blob_id: int, user_id: int
+) -> Optional[Attachment]:
+    """Lấy attachment trỏ tới blob mà user được phép tham chiếu lại
+
+    User chỉ được dùng lại nội dung mình đã từng upload hoặc đã công khai,
+    tránh việc biết sha256 là lấy được file private của người khác.
+    """
+    result = await db.execute(
+        select(Attachment)
+        .where(
+            Attachment.blob_id == blob_id,
+            or_(Attachment.user_id == user_id, Attachment.is_public.is_(True)),
+        )
+        .order_by((Attachment.user_id == user_id).desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
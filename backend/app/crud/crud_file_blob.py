@@ -0,0 +1,87 @@
+from typing import Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+from app.core.exceptions import FileBlobContention
+from app.models.file_blob import FileBlob
+
+# Số lần thử lại khi insert blob trùng sha256 với upload đồng thời
+ACQUIRE_MAX_ATTEMPTS = 3
+
+
+async def get_by_sha256(db: AsyncSession, sha256: str) -> Optional[FileBlob]:
+    result = await db.execute(select(FileBlob).where(FileBlob.sha256 == sha256))
+    return result.scalar_one_or_none()
+
+
+async def _get_for_update(db: AsyncSession, sha256: str) -> Optional[FileBlob]:
+    # Locking read: thấy dòng vừa được transaction khác commit,
+    # SELECT thường trong REPEATABLE READ vẫn đọc snapshot cũ
+    result = await db.execute(
+        select(FileBlob).where(FileBlob.sha256 == sha256).with_for_update()
+    )
+    return result.scalar_one_or_none()
+
+
+async def add_reference(db: AsyncSession, blob_id: int) -> bool:
+    """Tăng ref_count (atomic), False nếu blob vừa bị xóa"""
+    result = await db.execute(
+        update(FileBlob)
+        .where(FileBlob.id == blob_id)
+        .values(ref_count=FileBlob.ref_count + 1)
+    )
+    return result.rowcount == 1
+
+
+async def acquire(
+    db: AsyncSession, sha256: str, file_path: str, file_size: int
+) -> Tuple[FileBlob, bool]:
+    """Lấy blob theo sha256 và giữ một tham chiếu, tạo mới nếu chưa có
+
+    Insert chạy trong savepoint: upload đồng thời cùng nội dung sẽ vi phạm
+    unique index và chuyển sang dùng blob đã có (đọc lại bằng SELECT ... FOR UPDATE).
+    Hết ACQUIRE_MAX_ATTEMPTS lần thử thì trả 503 thay vì lặp vô hạn.
+
+    Returns:
+        Tuple[FileBlob, bool]: (blob, True nếu blob mới tạo từ file_path)
+    """
+    for _ in range(ACQUIRE_MAX_ATTEMPTS):
+        blob = await _get_for_update(db, sha256)
+        if blob is not None:
+            if await add_reference(db, int(blob.id)):  # type: ignore[arg-type]
+                await db.refresh(blob)
+                return blob, False
+            # Blob vừa bị xóa bởi lượt release đồng thời: tạo lại
+            db.expunge(blob)
+
+        blob = FileBlob(sha256=sha256, file_path=file_path, file_size=file_size, ref_count=1)
+        try:
+            async with db.begin_nested():
+                db.add(blob)
+        except IntegrityError:
+            continue
+        return blob, True
+
+    raise FileBlobContention()
+
+
+async def release(db: AsyncSession, blob_id: int) -> Optional[str]:
+    """Bỏ một tham chiếu tới blob
+
+    Returns:
+        Optional[str]: file_path cần xóa khỏi đĩa nếu đây là tham chiếu cuối cùng
+    """
+    await db.execute(
+        update(FileBlob)
+        .where(FileBlob.id == blob_id)
+        .values(ref_count=FileBlob.ref_count - 1)
+    )
+    result = await db.execute(
+        select(FileBlob.file_path, FileBlob.ref_count).where(FileBlob.id == blob_id)
+    )
+    row = result.one_or_none()
+    if row is None or row.ref_count > 0:
+        return None
+
+    await db.execute(delete(FileBlob).where(FileBlob.id == blob_id))
+    return row.file_path
@@ -192,6 +192,10 @@ async def update_post(
         if hasattr(db_obj, field):
             setattr(db_obj, field, value)
 
+    # Nội dung mới được ghi lại vào posts.content nên bài viết trở về hot tier
+    if "content" in update_data:
+        db_obj.content_tier = "hot"
+
     await db.flush()
     await db.refresh(db_obj)
 
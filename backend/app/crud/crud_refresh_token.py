@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, or_
+from app.models.refresh_token import RefreshToken
+
+
+def _utcnow() -> datetime:
+    # Cột DateTime không có timezone, lưu theo UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def create(db: AsyncSession, user_id: int, token_hash: str, expires_at: datetime) -> RefreshToken:
+    db_obj = RefreshToken(user_id=user_id, token_hash=token_hash, expires_at=expires_at)
+    db.add(db_obj)
+    await db.flush()
+    return db_obj
+
+
+async def get_by_hash(db: AsyncSession, token_hash: str) -> Optional[RefreshToken]:
+    result = await db.execute(select(RefreshToken).where(RefreshToken.token_hash == token_hash))
+    return result.scalar_one_or_none()
+
+
+async def revoke(db: AsyncSession, token_hash: str, rotated: bool = False) -> bool:
+    """Thu hồi token còn hiệu lực (atomic): False nếu token không tồn tại, đã thu hồi hoặc hết hạn
+
+    Hai request rotate cùng một token thì chỉ một request thắng.
+    rotated=True ghi lại rotated_at để request đến sau được hưởng grace window.
+    """
+    now = _utcnow()
+    result = await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.revoked.is_(False),
+            RefreshToken.expires_at > now,
+        )
+        .values(revoked=True, revoked_at=now, rotated_at=now if rotated else None)
+    )
+    return result.rowcount == 1
+
+
+async def revoke_all_for_user(db: AsyncSession, user_id: int) -> int:
+    result = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked.is_(False))
+        .values(revoked=True, revoked_at=_utcnow())
+    )
+    return result.rowcount
+
+
+async def get_revoked_hashes(db: AsyncSession) -> List[str]:
+    """Hash các token đã thu hồi nhưng chưa hết hạn (dùng để rebuild Bloom filter)"""
+    result = await db.execute(
+        select(RefreshToken.token_hash).where(
+            RefreshToken.revoked.is_(True), RefreshToken.expires_at > _utcnow()
+        )
+    )
+    return list(result.scalars().all())
+
+
+async def purge_batch(db: AsyncSession, revoked_before: datetime, batch_size: int = 1000) -> int:
+    """Xóa một lô token đã hết hạn hoặc đã thu hồi trước revoked_before, trả về số dòng đã xóa"""
+    result = await db.execute(
+        select(RefreshToken.id)
+        .where(
+            or_(
+                RefreshToken.expires_at <= _utcnow(),
+                RefreshToken.revoked_at < revoked_before,
+            )
+        )
+        .limit(batch_size)
+    )
+    ids = list(result.scalars().all())
+    if not ids:
+        return 0
+    await db.execute(delete(RefreshToken).where(RefreshToken.id.in_(ids)))
+    return len(ids)
@@ -0,0 +1,117 @@
+from typing import List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import IntegrityError
+from app.core.exceptions import StorageUsageContention
+from app.models.attachment import Attachment
+from app.models.storage_usage import UserStorageUsage
+from app.models.user import User
+
+# Số lần thử lại khi insert dòng bộ đếm trùng với request đồng thời
+ADD_USAGE_MAX_ATTEMPTS = 3
+
+
+async def get_usage(db: AsyncSession, user_id: int) -> Optional[UserStorageUsage]:
+    result = await db.execute(
+        select(UserStorageUsage).where(UserStorageUsage.user_id == user_id)
+    )
+    return result.scalar_one_or_none()
+
+
+async def get_used_bytes(db: AsyncSession, user_id: int) -> int:
+    result = await db.execute(
+        select(UserStorageUsage.used_bytes).where(UserStorageUsage.user_id == user_id)
+    )
+    return result.scalar_one_or_none() or 0
+
+
+async def add_usage(db: AsyncSession, user_id: int, bytes_delta: int, files_delta: int) -> None:
+    """Cộng dồn dung lượng/số file của user (atomic), tạo dòng mới nếu chưa có
+
+    Gọi trong cùng transaction với thao tác trên attachments để bộ đếm
+    luôn khớp với dữ liệu đã commit.
+    Hết ADD_USAGE_MAX_ATTEMPTS lần thử thì trả 503 thay vì lặp vô hạn.
+    """
+    for _ in range(ADD_USAGE_MAX_ATTEMPTS):
+        result = await db.execute(
+            update(UserStorageUsage)
+            .where(UserStorageUsage.user_id == user_id)
+            .values(
+                used_bytes=UserStorageUsage.used_bytes + bytes_delta,
+                file_count=UserStorageUsage.file_count + files_delta,
+            )
+        )
+        if result.rowcount == 1:
+            return
+
+        # Chưa có dòng (user mới hoặc dữ liệu trước khi có quota): insert trong savepoint,
+        # request đồng thời insert trước thì quay lại update
+        try:
+            async with db.begin_nested():
+                db.add(UserStorageUsage(
+                    user_id=user_id,
+                    used_bytes=max(bytes_delta, 0),
+                    file_count=max(files_delta, 0),
+                ))
+        except IntegrityError:
+            continue
+        return
+
+    raise StorageUsageContention()
+
+
+async def get_top_users(db: AsyncSession, limit: int = 20) -> List[Tuple[UserStorageUsage, User]]:
+    """Các user dùng nhiều dung lượng nhất (đọc theo index used_bytes, không quét attachments)"""
+    result = await db.execute(
+        select(UserStorageUsage, User)
+        .join(User, User.id == UserStorageUsage.user_id)
+        .order_by(UserStorageUsage.used_bytes.desc())
+        .limit(limit)
+    )
+    return [(usage, user) for usage, user in result.all()]
+
+
+async def reconcile(
+    db: AsyncSession, after_user_id: int = 0, batch_size: int = 500
+) -> Tuple[Optional[int], List[Tuple[int, int, int]]]:
+    """Đối chiếu bộ đếm với SUM(file_size) thực tế cho một lô user theo id
+
+    Returns:
+        Tuple[Optional[int], List[Tuple[int, int, int]]]:
+            (user_id cuối của lô hoặc None nếu hết, [(user_id, used_bytes cũ, used_bytes đúng)] đã sửa)
+    """
+    result = await db.execute(
+        select(User.id).where(User.id > after_user_id).order_by(User.id).limit(batch_size)
+    )
+    user_ids = list(result.scalars().all())
+    if not user_ids:
+        return None, []
+
+    result = await db.execute(
+        select(Attachment.user_id, func.sum(Attachment.file_size), func.count())
+        .where(Attachment.user_id.in_(user_ids))
+        .group_by(Attachment.user_id)
+    )
+    actual = {user_id: (int(total or 0), int(count)) for user_id, total, count in result.all()}
+
+    result = await db.execute(
+        select(UserStorageUsage).where(UserStorageUsage.user_id.in_(user_ids))
+    )
+    counters = {usage.user_id: usage for usage in result.scalars().all()}
+
+    corrected = []
+    for user_id in user_ids:
+        used_bytes, file_count = actual.get(user_id, (0, 0))
+        usage = counters.get(user_id)
+        if usage is None:
+            if used_bytes or file_count:
+                db.add(UserStorageUsage(user_id=user_id, used_bytes=used_bytes, file_count=file_count))
+                corrected.append((user_id, 0, used_bytes))
+            continue
+        if usage.used_bytes != used_bytes or usage.file_count != file_count:
+            corrected.append((user_id, int(usage.used_bytes), used_bytes))
+            usage.used_bytes = used_bytes  # type: ignore[assignment]
+            usage.file_count = file_count  # type: ignore[assignment]
+
+    await db.flush()
+    return user_ids[-1], corrected
@@ -6,7 +6,11 @@ from fastapi_cache.decorator import cache
 
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate, UserUpdateMe
-from app.core.security import get_password_hash, verify_password
+from app.core.database import run_after_commit
+from app.core.password_hasher import get_password_hasher
+from app.crud import crud_refresh_token
+from app.services.principal_cache import get_principal_cache
+from app.services.token_versions import get_token_versions
 
 ModelType = TypeVar("ModelType")
 
@@ -32,7 +36,7 @@ async def get_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
 
 
 async def create(db: AsyncSession, obj_in: UserCreate) -> User:
-    hashed_password = get_password_hash(obj_in.password)
+    hashed_password = await get_password_hasher().hash(obj_in.password)
     db_obj = User(
         email=obj_in.email,
         username=obj_in.username,
@@ -56,17 +60,33 @@ async def update(
     else:
         update_data = obj_in.model_dump(exclude_unset=True)
 
+    # Đổi quyền hoặc khóa tài khoản: thu hồi các access token đã cấp (claim "ver")
+    revoke_tokens = any(
+        field in update_data and update_data[field] != getattr(db_obj, field)
+        for field in ("rank", "is_active")
+    )
+
     for field, value in update_data.items():
         setattr(db_obj, field, value)
+    if revoke_tokens:
+        db_obj.token_version = User.token_version + 1  # type: ignore[assignment]
 
     await db.flush()
     await db.refresh(db_obj)
     await FastAPICache.clear(namespace="user")
+    # rank/is_active/email có thể đã đổi. Invalidate sau khi commit: làm trước thì
+    # request đồng thời có thể cache lại dòng cũ (rank/token_version cũ) tới hết TTL
+    user_id = int(db_obj.id)  # type: ignore[arg-type]
+    run_after_commit(db, lambda: get_principal_cache().invalidate(user_id))
+    if revoke_tokens:
+        run_after_commit(db, lambda: get_token_versions().invalidate(user_id))
     return db_obj
 
 
 async def update_password(db: AsyncSession, user: User, new_password: str) -> User:
-    user.hashed_password = get_password_hash(new_password) 
+    user.hashed_password = await get_password_hasher().hash(new_password)  # type: ignore[assignment]
+    # Đổi mật khẩu thì đăng xuất mọi phiên (refresh token) khác
+    await crud_refresh_token.revoke_all_for_user(db, user.id)  # type: ignore[arg-type]
     await db.flush()
     await db.refresh(user)
     await FastAPICache.clear(namespace="user")
@@ -77,8 +97,15 @@ async def authenticate(db: AsyncSession, email: str, password: str) -> Optional[
     user = await get_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):  # type: ignore[arg-type]
+    verified, new_hash = await get_password_hasher().verify_and_update(
+        password, user.hashed_password  # type: ignore[arg-type]
+    )
+    if not verified:
         return None
+    if new_hash:
+        # Hash đang lưu dùng cost cũ: lưu lại theo BCRYPT_ROUNDS hiện tại
+        user.hashed_password = new_hash  # type: ignore[assignment]
+        await db.flush()
     return user
 
 
@@ -104,4 +131,6 @@ async def delete(db: AsyncSession, user_id: int) -> bool:
     await db.delete(user)
     await db.flush()
     await FastAPICache.clear(namespace="user")
+    run_after_commit(db, lambda: get_principal_cache().invalidate(user_id))
+    run_after_commit(db, lambda: get_token_versions().invalidate(user_id))
     return True
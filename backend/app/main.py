@@ -6,26 +6,23 @@ from fastapi.staticfiles import StaticFiles
 from fastapi_pagination import add_pagination
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.redis import RedisBackend
-from redis import asyncio as aioredis
 from slowapi.errors import RateLimitExceeded
 from loguru import logger
-from starlette.middleware.sessions import SessionMiddleware
-from prometheus_client import Counter, Histogram, make_asgi_app, REGISTRY
+from prometheus_client import Counter, Histogram, make_asgi_app
 import sys
 import time
 import os
 from contextlib import asynccontextmanager
 
 # Import rate limiter
-from .core.rate_limit import limiter
+from .core.rate_limit import limiter, get_rate_limiter
 from .core.security import generate_csrf_token
-
-
-# Use REGISTRY to check if collectors are already registered to avoid errors in tests
-def get_metric(metric_class, name, *args, **kwargs):
-    if name in REGISTRY._names_to_collectors:
-        return REGISTRY._names_to_collectors[name]
-    return metric_class(name, *args, **kwargs)
+from .core.session import LazySessionMiddleware
+from .core.metrics import get_metric
+from .core.password_hasher import get_password_hasher
+from .core.redis import get_redis
+from .core.storage_io import get_storage_io
+from .services.image_derivatives import get_image_derivatives
 
 
 http_requests_total = get_metric(
@@ -96,16 +93,20 @@ async def lifespan(app: FastAPI):
 
     # Khởi tạo Redis Cache
     try:
-        redis = aioredis.from_url(
-            settings.REDIS_URL, encoding="utf8", decode_responses=True
-        )
-        FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+        FastAPICache.init(RedisBackend(get_redis()), prefix="fastapi-cache")
         logger.info("Successfully connected to Redis for caching")
     except Exception as e:
         logger.error(f"Failed to connect to Redis: {e}")
 
+    get_rate_limiter().start()
+
     logger.info("Application startup complete")
     yield
+    get_image_derivatives().shutdown()
+    get_storage_io().shutdown()
+    get_password_hasher().shutdown()
+    await get_rate_limiter().stop()
+    await get_redis().close()
     logger.info("Application shutdown")
 
 
@@ -133,8 +134,9 @@ app.add_middleware(
 )
 
 # Add Session Middleware for CSRF tokens
+# Cookie chỉ được giải mã khi route đọc request.session (validate_csrf, /csrf-token)
 app.add_middleware(
-    SessionMiddleware,
+    LazySessionMiddleware,
     secret_key=settings.SECRET_KEY,
     session_cookie="aicmr_session",
     max_age=3600,
@@ -6,12 +6,14 @@ from .base import Base
 from .user import User
 from .settings import Setting
 from .refresh_token import RefreshToken
+from .file_blob import FileBlob
 from .attachment import Attachment
+from .storage_usage import UserStorageUsage
 from .post import Post
 from .category import Category
 from .tag import Tag
 from .post_tag import PostTag
 from .post_metadata import PostMetadata
 
-__all__ = ["Base", "User", "Setting", "RefreshToken", "Attachment", "Post", "Category", "Tag", "PostTag", "PostMetadata"]
+__all__ = ["Base", "User", "Setting", "RefreshToken", "FileBlob", "Attachment", "UserStorageUsage", "Post", "Category", "Tag", "PostTag", "PostMetadata"]
 
@@ -13,6 +13,13 @@ class Attachment(Base):
     content_type = Column(String(100), nullable=False)
     file_size = Column(BigInteger, nullable=False)
     is_public = Column(Boolean, default=False, nullable=False)
+    # Blob vật lý (dedup theo sha256), NULL với file upload trước khi có dedup
+    blob_id = Column(
+        Integer, ForeignKey("file_blobs.id"), nullable=True, index=True
+    )
+    # Kích thước ảnh gốc (px), NULL với file không phải ảnh hoặc chưa xử lý
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
     user_id = Column(
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
@@ -24,3 +31,4 @@ class Attachment(Base):
 
     # Relationships
     user = relationship("User", backref="attachments")
+    blob = relationship("FileBlob")
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+from sqlalchemy.sql import func
+from .base import Base
+
+
+class FileBlob(Base):
+    """File vật lý duy nhất theo sha256, dùng chung cho nhiều Attachment"""
+
+    __tablename__ = "file_blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, nullable=False, index=True)
+    file_path = Column(String(512), nullable=False)
+    file_size = Column(BigInteger, nullable=False)
+    # Số Attachment đang trỏ tới blob, về 0 thì xóa file vật lý
+    ref_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
@@ -1,7 +1,11 @@
 from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
+from app.core.config import get_settings
 from .base import Base
+from .types import CompressedText
+
+settings = get_settings()
 
 
 class Post(Base):
@@ -11,7 +15,13 @@ class Post(Base):
     title = Column(String(255), nullable=False)
     slug = Column(String(255), unique=True, nullable=False, index=True)
     excerpt = Column(Text, nullable=True)
-    content = Column(Text, nullable=False)  # Markdown content
+    if settings.POST_CONTENT_COMPRESSION:
+        # Markdown content nén zlib, chỉ tải + giải nén khi truy cập (await post.awaitable_attrs.content)
+        content = deferred(Column(CompressedText(), nullable=False))
+    else:
+        # Markdown content; đọc được cả hàng đã nén/cột LONGBLOB để migrate nén không cần dừng ứng dụng
+        content = Column(CompressedText(compress=False), nullable=False)
+    content_tier = Column(String(10), default="hot", server_default="hot", nullable=False)  # hot, cold
     status = Column(String(50), default="draft", nullable=False, index=True)  # draft, published, archived
     category_id = Column(Integer, ForeignKey("categories.id", ondelete="SET NULL"), nullable=True)
     author_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -8,12 +8,17 @@ class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(ForeignKey("users.id"), nullable=False)
-    token = Column(String(500), unique=True, nullable=False, index=True)
-    expires_at = Column(DateTime, nullable=False)
+    user_id = Column(ForeignKey("users.id"), nullable=False, index=True)
+    # sha256 (hex) của claim jti, không lưu chuỗi token
+    token_hash = Column(String(64), unique=True, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
     created_at = Column(
         DateTime, default=func.now(), server_default=func.now(), nullable=False
     )
     revoked = Column(Boolean, default=False, nullable=False)
+    # Thời điểm thu hồi (rotate/logout), dòng bị dọn sau thời gian lưu giữ
+    revoked_at = Column(DateTime, nullable=True, index=True)
+    # Thời điểm token bị rotate (NULL nếu thu hồi do logout/phát hiện dùng lại)
+    rotated_at = Column(DateTime, nullable=True)
 
     user = relationship("User", back_populates="refresh_tokens")
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, BigInteger
+from sqlalchemy.sql import func
+from .base import Base
+
+
+class UserStorageUsage(Base):
+    """Dung lượng file mỗi user đang dùng, cập nhật cùng transaction với attachments"""
+
+    __tablename__ = "user_storage_usage"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    # Tổng attachments.file_size của user (tính theo từng attachment, kể cả file dedup)
+    used_bytes = Column(BigInteger, default=0, nullable=False, index=True)
+    file_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
@@ -0,0 +1,43 @@
+# Kiểu cột tùy chỉnh dùng chung cho các models
+from sqlalchemy import LargeBinary, Text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.types import TypeDecorator
+
+from app.core.content_compression import get_content_codec
+
+
+class CompressedText(TypeDecorator):
+    """
+    Cột text lưu dạng frame zlib (có dictionary) trong LONGBLOB.
+
+    Giá trị Python vẫn là str: nén khi ghi, giải nén khi đọc.
+    Hàng chưa được backfill (bytes UTF-8 thô) vẫn đọc được bình thường.
+
+    compress=False (chế độ đọc kép, khi chưa bật nén): ghi text thường nhưng đọc
+    được cả cột TEXT lẫn LONGBLOB, đã nén hay chưa, nên có thể đổi kiểu cột và
+    backfill trong lúc ứng dụng vẫn chạy (rolling deploy).
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, compress: bool = True):
+        super().__init__()
+        self.compress = compress
+
+    def load_dialect_impl(self, dialect):
+        if not self.compress:
+            return dialect.type_descriptor(Text())
+        if dialect.name == "mysql":
+            return dialect.type_descriptor(mysql.LONGBLOB())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not self.compress:
+            return value
+        return get_content_codec().compress(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return get_content_codec().decompress(value)
@@ -14,6 +14,8 @@ class User(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     is_superuser = Column(Boolean, default=False, nullable=False)
     rank = Column(Integer, default=0, index=True, nullable=False)
+    # Tăng khi đổi rank/khóa tài khoản: access token mang claim "ver" cũ bị từ chối
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(
         DateTime(timezone=True),
         default=func.now(),
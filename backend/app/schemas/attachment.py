@@ -1,6 +1,6 @@
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class AttachmentBase(BaseModel):
@@ -13,6 +13,7 @@ class AttachmentBase(BaseModel):
 class AttachmentCreate(AttachmentBase):
     file_path: str
     user_id: int
+    blob_id: Optional[int] = None
 
 
 class AttachmentResponse(AttachmentBase):
@@ -22,9 +23,60 @@ class AttachmentResponse(AttachmentBase):
     file_path: str
     user_id: int
     created_at: datetime
+    width: Optional[int] = None
+    height: Optional[int] = None
     url: Optional[str] = None
 
 
+class BulkUploadItem(BaseModel):
+    filename: str
+    status_code: int
+    attachment: Optional[AttachmentResponse] = None
+    error: Optional[str] = None
+
+
+class BulkUploadResponse(BaseModel):
+    uploaded: int
+    failed: int
+    results: List[BulkUploadItem]
+
+
 class UploadSettings(BaseModel):
     allowed_extensions: str
     max_upload_size_mb: int
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int
+    is_public: bool = True
+
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    filename: str
+    size: int
+    offset: int
+    is_public: bool
+    expires_at: datetime
+
+
+class UploadByHashRequest(BaseModel):
+    sha256: str = Field(..., pattern=r"^[0-9a-fA-F]{64}$")
+    size: int = Field(..., gt=0)
+    filename: str
+    is_public: bool = True
+
+
+class StorageUsageResponse(BaseModel):
+    used_bytes: int
+    file_count: int
+    quota_bytes: Optional[int] = None
+
+
+class StorageUsageEntry(BaseModel):
+    user_id: int
+    username: str
+    email: str
+    used_bytes: int
+    file_count: int
@@ -27,6 +27,7 @@ class SettingsResponse(BaseModel):
     custom_meta: Optional[str] = None
     upload_allowed_extensions: Optional[str] = None
     upload_max_size_mb: Optional[str] = None
+    upload_quota_mb: Optional[str] = None
 
 
 class SettingsUpdate(BaseModel):
@@ -51,6 +52,7 @@ class SettingsUpdate(BaseModel):
     custom_meta: Optional[str] = None
     upload_allowed_extensions: Optional[str] = None
     upload_max_size_mb: Optional[str] = None
+    upload_quota_mb: Optional[str] = None
 
 
 class PublicSettingsResponse(BaseModel):
@@ -16,4 +16,7 @@ class TokenPayload(BaseModel):
     sub: Optional[int] = None
     exp: Optional[int] = None
     rank: Optional[int] = None
+    email: Optional[str] = None
+    ver: Optional[int] = None
+    jti: Optional[str] = None
     type: Optional[str] = None
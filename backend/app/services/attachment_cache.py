@@ -0,0 +1,81 @@
+import time
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.lru import LRUCache
+from app.models.attachment import Attachment
+
+
+class AttachmentMeta(NamedTuple):
+    """Các trường cần để phân quyền và phục vụ file, không giữ ORM object"""
+    id: int
+    filename: str
+    file_path: str
+    content_type: str
+    is_public: bool
+    user_id: int
+    width: Optional[int]
+    cached_at: float
+
+
+class AttachmentMetaCache:
+    """
+    LRU cache metadata attachment theo id trong mỗi worker.
+
+    Lượt tải file lặp lại không cần query MySQL. Entry hết hạn sau ttl_seconds
+    để các worker khác thấy thay đổi (xóa file, đổi quyền) trong thời gian giới hạn;
+    worker thực hiện thay đổi gọi invalidate() ngay.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._cache: Optional[LRUCache[AttachmentMeta]] = (
+            LRUCache(max_entries=max_entries) if max_entries > 0 else None
+        )
+
+    def _is_fresh(self, meta: AttachmentMeta) -> bool:
+        return time.monotonic() - meta.cached_at < self.ttl_seconds
+
+    async def get(self, db: AsyncSession, attachment_id: int) -> Optional[AttachmentMeta]:
+        """Lấy metadata từ cache, query DB khi chưa có hoặc đã hết hạn"""
+        if self._cache is not None:
+            meta = self._cache.get(attachment_id, is_valid=self._is_fresh)
+            if meta is not None:
+                return meta
+
+        result = await db.execute(
+            select(
+                Attachment.id,
+                Attachment.filename,
+                Attachment.file_path,
+                Attachment.content_type,
+                Attachment.is_public,
+                Attachment.user_id,
+                Attachment.width,
+            ).where(Attachment.id == attachment_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+
+        meta = AttachmentMeta(*row, cached_at=time.monotonic())
+        if self._cache is not None:
+            self._cache.put(attachment_id, meta)
+        return meta
+
+    def invalidate(self, attachment_id: int) -> None:
+        if self._cache is not None:
+            self._cache.invalidate(attachment_id)
+
+
+@lru_cache()
+def get_attachment_cache() -> AttachmentMetaCache:
+    settings = get_settings()
+    return AttachmentMetaCache(
+        max_entries=settings.ATTACHMENT_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.ATTACHMENT_CACHE_TTL_SECONDS,
+    )
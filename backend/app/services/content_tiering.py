@@ -0,0 +1,99 @@
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+
+from app.core.constants import ContentTier, PostStatus
+from app.models.post import Post
+from app.services.post_storage import PostStorageService, get_post_storage
+
+
+async def demote_archived_posts(
+    db: AsyncSession,
+    storage: Optional[PostStorageService] = None,
+    batch_size: int = 100,
+    limit: Optional[int] = None,
+) -> int:
+    """Chuyển nội dung các bài viết archived sang cold tier
+
+    Mỗi bài viết: đảm bảo có blob trong storage, nén sang cold tier,
+    sau đó xóa posts.content và đánh dấu content_tier = "cold".
+    Commit theo từng lô; chạy lại an toàn nếu bị dừng giữa chừng.
+
+    Args:
+        db: Database session
+        storage: PostStorageService (mặc định singleton)
+        batch_size: Số bài viết mỗi lô
+        limit: Số bài viết tối đa xử lý trong một lần chạy
+
+    Returns:
+        int: Số bài viết đã chuyển sang cold tier
+    """
+    storage = storage or get_post_storage()
+    demoted = 0
+    last_id = 0
+
+    while limit is None or demoted < limit:
+        result = await db.execute(
+            select(Post)
+            .options(undefer(Post.content))
+            .where(
+                Post.id > last_id,
+                Post.status == PostStatus.ARCHIVED.value,
+                Post.content_tier == ContentTier.HOT.value,
+            )
+            .order_by(Post.id)
+            .limit(batch_size)
+        )
+        posts = result.scalars().all()
+        if not posts:
+            break
+
+        for post in posts:
+            post_id, slug = int(post.id), str(post.slug)  # type: ignore[arg-type]
+            content = await post.awaitable_attrs.content
+            if content and await storage.get_content_path(post_id, slug) is None:
+                await storage.save_post_content(post_id, slug, str(content))
+
+            if not await storage.demote_post_content(post_id, slug):
+                logger.warning(f"Bỏ qua bài viết {post_id}: không có nội dung trong storage")
+                continue
+
+            post.content = ""  # type: ignore[assignment]
+            post.content_tier = ContentTier.COLD.value  # type: ignore[assignment]
+            demoted += 1
+
+        last_id = int(posts[-1].id)  # type: ignore[arg-type]
+        await db.commit()
+
+    logger.info(f"Đã chuyển {demoted} bài viết archived sang cold tier")
+    return demoted
+
+
+async def restore_post_content(
+    db: AsyncSession,
+    post: Post,
+    storage: Optional[PostStorageService] = None,
+) -> bool:
+    """Đưa nội dung bài viết cold trở lại posts.content và hot tier
+
+    Gọi khi bài viết rời trạng thái archived.
+
+    Returns:
+        bool: True nếu đã khôi phục nội dung
+    """
+    if post.content_tier != ContentTier.COLD.value:
+        return False
+
+    storage = storage or get_post_storage()
+    content = await storage.promote_post_content(int(post.id), str(post.slug))  # type: ignore[arg-type]
+    if content is None:
+        logger.error(f"Không tìm thấy nội dung cold của bài viết {post.id}")
+        return False
+
+    post.content = content  # type: ignore[assignment]
+    post.content_tier = ContentTier.HOT.value  # type: ignore[assignment]
+    await db.flush()
+    return True
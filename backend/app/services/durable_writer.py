@@ -0,0 +1,190 @@
+import asyncio
+import os
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from app.core.storage_io import get_storage_io
+
+
+DURABILITY_NONE = "none"
+DURABILITY_FSYNC = "fsync"
+DURABILITY_GROUP = "group"
+DURABILITY_MODES = (DURABILITY_NONE, DURABILITY_FSYNC, DURABILITY_GROUP)
+
+
+def _write_temp(tmp_path: Path, data: bytes, fsync: bool) -> None:
+    tmp_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _fsync_file(path: Path) -> None:
+    fd = os.open(path, os.O_RDWR)
+    try:
+        # fdatasync đủ để dữ liệu (và kích thước) xuống đĩa trước khi rename
+        getattr(os, "fdatasync", os.fsync)(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dir(directory: Path) -> None:
+    # Windows không hỗ trợ fsync thư mục
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class DurableWriter:
+    """
+    Ghi file an toàn khi crash: ghi ra file tạm cùng thư mục rồi os.replace,
+    nên file đích luôn là bản cũ hoặc bản mới đầy đủ, không bao giờ bị cắt cụt.
+
+    Chế độ durability:
+    - none:  chỉ temp file + rename, không fsync (nhanh nhất)
+    - fsync: fsync từng file và thư mục chứa nó trước khi trả về
+    - group: gom các lần ghi đồng thời trong một cửa sổ ngắn (group commit).
+             Thread ghi không fsync; hết cửa sổ, cả lô được fdatasync trong một
+             lượt (các lệnh chạy song song trên pool storage I/O nên journal gộp
+             chúng vào ít lần commit), rename, rồi mỗi thư mục của lô fsync một lần.
+             Chỉ đụng tới file của lô, không flush cả filesystem (syncfs).
+             Kết quả báo riêng cho từng file: một file lỗi không làm hỏng cả lô.
+
+    Cái giá của group: mỗi lần ghi chờ thêm tối đa group_window_ms trước khi rename.
+    """
+
+    def __init__(
+        self,
+        mode: str = DURABILITY_GROUP,
+        group_window_ms: int = 10,
+        max_batch: int = 1024,
+    ):
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"Invalid durability mode: {mode}")
+        self.mode = mode
+        self.group_window = group_window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: list[tuple[Path, Path, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._batch_full: Optional[asyncio.Event] = None
+
+    @staticmethod
+    def _temp_path(path: Path) -> Path:
+        return path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+    async def write_bytes(self, path: Path, data: bytes) -> None:
+        """Ghi data vào path theo chế độ durability đã cấu hình"""
+        tmp_path = self._temp_path(path)
+        storage_io = get_storage_io()
+        fsync = self.mode == DURABILITY_FSYNC
+        try:
+            await storage_io.run("write", _write_temp, tmp_path, data, fsync)
+            if self.mode != DURABILITY_GROUP:
+                await storage_io.run("replace", self._replace, tmp_path, path, fsync)
+                return
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        # Từ đây file tạm thuộc về lô commit, hủy request không được làm hỏng lô
+        await asyncio.shield(self._commit_in_group(tmp_path, path))
+
+    async def write_text(self, path: Path, content: str, encoding: str = "utf-8") -> None:
+        await self.write_bytes(path, content.encode(encoding))
+
+    @staticmethod
+    def _replace(tmp_path: Path, path: Path, fsync: bool) -> None:
+        os.replace(tmp_path, path)
+        if fsync:
+            _fsync_dir(path.parent)
+
+    async def _commit_in_group(self, tmp_path: Path, path: Path) -> None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((tmp_path, path, future))
+
+        if self._flush_task is None or self._flush_task.done():
+            self._batch_full = asyncio.Event()
+            self._flush_task = loop.create_task(self._flush_after_window())
+        elif len(self._pending) >= self.max_batch and self._batch_full is not None:
+            self._batch_full.set()
+
+        await future
+
+    async def _flush_after_window(self) -> None:
+        """Chờ hết cửa sổ group commit (hoặc đủ lô) rồi commit toàn bộ lô"""
+        try:
+            await asyncio.wait_for(self._batch_full.wait(), timeout=self.group_window)  # type: ignore[union-attr]
+        except asyncio.TimeoutError:
+            pass
+
+        batch, self._pending = self._pending, []
+        self._flush_task = None
+        if not batch:
+            return
+
+        try:
+            errors = await self._commit_batch([(tmp, dst) for tmp, dst, _ in batch])
+        except Exception as e:
+            errors = [e] * len(batch)
+
+        failed = 0
+        for (tmp_path, _, future), error in zip(batch, errors):
+            if error is not None:
+                failed += 1
+                await get_storage_io().remove(tmp_path, missing_ok=True)
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+        if failed:
+            logger.error(f"Group commit thất bại cho {failed}/{len(batch)} file: {next(e for e in errors if e)}")
+
+    @staticmethod
+    async def _commit_batch(batch: list[tuple[Path, Path]]) -> list[Optional[BaseException]]:
+        """Commit một lô, trả về lỗi của từng file (None nếu thành công)"""
+        storage_io = get_storage_io()
+
+        # 1. Dữ liệu của mọi file tạm xuống đĩa, trong một lượt song song
+        results = await asyncio.gather(
+            *(storage_io.run("fsync", _fsync_file, tmp_path) for tmp_path, _ in batch),
+            return_exceptions=True,
+        )
+        errors: list[Optional[BaseException]] = [
+            result if isinstance(result, BaseException) else None for result in results
+        ]
+
+        # 2. Công bố file mới (rename là atomic)
+        def replace_all() -> None:
+            for i, (tmp_path, path) in enumerate(batch):
+                if errors[i] is None:
+                    try:
+                        os.replace(tmp_path, path)
+                    except OSError as e:
+                        errors[i] = e
+
+        await storage_io.run("replace", replace_all)
+
+        # 3. Các rename xuống đĩa: mỗi thư mục của lô chỉ fsync một lần
+        directories = list(dict.fromkeys(path.parent for i, (_, path) in enumerate(batch) if errors[i] is None))
+        dir_results = await asyncio.gather(
+            *(storage_io.run("fsync_dir", _fsync_dir, directory) for directory in directories),
+            return_exceptions=True,
+        )
+        for directory, result in zip(directories, dir_results):
+            if isinstance(result, BaseException):
+                for i, (_, path) in enumerate(batch):
+                    if errors[i] is None and path.parent == directory:
+                        errors[i] = result
+        return errors
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional, Union
+
+from loguru import logger
+
+from app.core.config import get_settings
+from app.core.storage_io import get_storage_io
+
+
+# Các biến thể ảnh: tên -> chiều rộng tối đa (px)
+VARIANTS = {
+    "thumb": 320,
+    "card": 800,
+    "full": 1600,
+}
+
+# Chỉ tạo biến thể cho ảnh raster phổ biến, giữ nguyên định dạng gốc (JPEG/PNG)
+IMAGE_FORMATS = {
+    "image/jpeg": ("JPEG", ".jpg"),
+    "image/png": ("PNG", ".png"),
+}
+
+
+# Metadata được giữ lại trên biến thể
+KEEP_INFO_KEYS = ("icc_profile", "transparency")
+
+
+class ImageInfo(NamedTuple):
+    width: int
+    height: int
+
+
+def _save_atomic(image, path: Path, image_format: str) -> None:
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        if image_format == "JPEG":
+            image.save(tmp_path, "JPEG", quality=85, optimize=True, progressive=True)
+        else:
+            image.save(tmp_path, "PNG", optimize=True)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def render_variants(source_path: str, output_dir: str, image_format: str, ext: str) -> tuple[int, int]:
+    """Tạo toàn bộ biến thể cho một ảnh (chạy trong process worker)
+
+    Ảnh được xoay theo EXIF Orientation rồi lưu lại không kèm EXIF/metadata.
+    Biến thể không bao giờ lớn hơn ảnh gốc.
+
+    Returns:
+        tuple[int, int]: Kích thước (width, height) của ảnh gốc sau khi xoay
+    """
+    from PIL import Image, ImageOps
+
+    out = Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        width, height = image.size
+
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        # Chỉ giữ thông tin cần cho hiển thị đúng màu/trong suốt, bỏ EXIF (GPS, thiết bị...) và text chunks
+        image.info = {key: image.info[key] for key in KEEP_INFO_KEYS if key in image.info}
+
+        for name, max_width in VARIANTS.items():
+            variant = image.copy()
+            if width > max_width:
+                variant.thumbnail((max_width, height), Image.Resampling.LANCZOS)
+            _save_atomic(variant, out / f"{name}{ext}", image_format)
+
+    return width, height
+
+
+class ImageDerivativeService:
+    """
+    Tạo và phục vụ biến thể ảnh (thumb/card/full) cho attachment.
+
+    Resize là CPU-bound nên chạy trong ProcessPoolExecutor, không chặn event loop.
+    Biến thể được cache trên đĩa: {variant_dir}/{attachment_id}/{variant}{ext}
+    """
+
+    def __init__(self, variant_dir: Union[str, Path], max_workers: int = 2):
+        self.variant_dir = Path(variant_dir)
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Tránh render trùng khi nhiều request cùng yêu cầu một ảnh chưa có biến thể
+        self._inflight: dict[int, asyncio.Future] = {}
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    def is_supported(content_type: str) -> bool:
+        return content_type in IMAGE_FORMATS
+
+    @staticmethod
+    def variant_for_width(width: int) -> str:
+        """Chọn biến thể nhỏ nhất đủ rộng cho width yêu cầu"""
+        for name, max_width in VARIANTS.items():
+            if width <= max_width:
+                return name
+        return "full"
+
+    def _attachment_dir(self, attachment_id: int) -> Path:
+        return self.variant_dir / str(attachment_id)
+
+    def get_variant_path(self, attachment_id: int, variant: str, content_type: str) -> Path:
+        _, ext = IMAGE_FORMATS[content_type]
+        return self._attachment_dir(attachment_id) / f"{variant}{ext}"
+
+    async def generate(
+        self, attachment_id: int, source_path: str, content_type: str
+    ) -> Optional[ImageInfo]:
+        """Tạo biến thể cho ảnh, trả về kích thước gốc hoặc None nếu không xử lý được"""
+        if not self.is_supported(content_type):
+            return None
+
+        task = self._inflight.get(attachment_id)
+        if task is None:
+            task = asyncio.ensure_future(self._render(attachment_id, source_path, content_type))
+            self._inflight[attachment_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(attachment_id, None))
+        # Request bị hủy không được hủy lượt render đang dùng chung
+        return await asyncio.shield(task)
+
+    async def _render(
+        self, attachment_id: int, source_path: str, content_type: str
+    ) -> Optional[ImageInfo]:
+        image_format, ext = IMAGE_FORMATS[content_type]
+        loop = asyncio.get_running_loop()
+        try:
+            width, height = await loop.run_in_executor(
+                self.executor,
+                render_variants,
+                source_path,
+                str(self._attachment_dir(attachment_id)),
+                image_format,
+                ext,
+            )
+        except Exception as e:
+            logger.error(f"Không thể tạo biến thể cho ảnh {attachment_id}: {e}")
+            return None
+        return ImageInfo(width, height)
+
+    async def delete_variants(self, attachment_id: int) -> None:
+        await get_storage_io().run(
+            "rmtree", shutil.rmtree, self._attachment_dir(attachment_id), ignore_errors=True
+        )
+
+
+@lru_cache()
+def get_image_derivatives() -> ImageDerivativeService:
+    """Service dùng chung trong mỗi worker"""
+    settings = get_settings()
+    return ImageDerivativeService(
+        os.path.join(os.getcwd(), settings.UPLOAD_VARIANT_DIR),
+        max_workers=settings.IMAGE_WORKERS,
+    )
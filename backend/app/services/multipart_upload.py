@@ -0,0 +1,137 @@
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, status
+from multipart.multipart import MultipartParser, parse_options_header
+
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+class MultipartFileReader:
+    """
+    Đọc một file từ body multipart/form-data ngay khi dữ liệu tới.
+
+    Khác với UploadFile (Starlette spool toàn bộ body vào SpooledTemporaryFile trước),
+    dữ liệu của part được trả ra theo từng đoạn để ghi thẳng vào vị trí lưu cuối cùng.
+    Các part khác tên field bị bỏ qua.
+
+        reader = MultipartFileReader(request.headers.get("content-type"), request.stream())
+        await reader.open()            # đọc tới hết header của part file
+        async for chunk in reader.chunks():
+            ...
+    """
+
+    def __init__(
+        self,
+        content_type: Optional[str],
+        stream: AsyncIterator[bytes],
+        field_name: str = "file",
+    ):
+        media_type, params = parse_options_header(content_type or "")
+        boundary = params.get(b"boundary")
+        if media_type != b"multipart/form-data" or not boundary:
+            raise _bad_request("Yêu cầu phải là multipart/form-data")
+
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+
+        self._stream = stream.__aiter__()
+        self._headers: dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_file = False
+        self._file_found = False
+        self._file_done = False
+        self._finished = False
+        self._pending: list[bytes] = []
+
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_end": self._on_end,
+        })
+
+    # Callback của parser (đồng bộ): chỉ ghi nhận trạng thái, không I/O
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        filename = options.get(b"filename")
+        if self._file_found or name != self.field_name or filename is None:
+            return
+
+        self._in_file = True
+        self._file_found = True
+        self.filename = filename.decode("utf-8", errors="replace")
+        content_type = self._headers.get(b"content-type")
+        self.content_type = content_type.decode("latin-1") if content_type else None
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self._pending.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self._file_done = True
+
+    def _on_end(self) -> None:
+        self._finished = True
+
+    async def _feed(self) -> bool:
+        """Đưa chunk tiếp theo của body vào parser, False nếu body đã hết"""
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            return False
+        if chunk:
+            try:
+                self._parser.write(chunk)
+            except Exception:
+                raise _bad_request("Dữ liệu multipart không hợp lệ")
+        return True
+
+    def _take_pending(self) -> bytes:
+        data = b"".join(self._pending)
+        self._pending.clear()
+        return data
+
+    async def open(self) -> None:
+        """Đọc body tới khi gặp header của part file"""
+        while not self._file_found:
+            if self._finished or not await self._feed():
+                raise _bad_request(f"Thiếu file trong field '{self.field_name}'")
+        if not self.filename:
+            raise _bad_request("Tên file không hợp lệ")
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """Dữ liệu của part file theo từng đoạn nhận được từ client"""
+        while True:
+            data = self._take_pending()
+            if data:
+                yield data
+            if self._file_done:
+                return
+            if not await self._feed():
+                raise _bad_request("Body multipart bị ngắt giữa chừng")
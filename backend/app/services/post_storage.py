@@ -1,52 +1,199 @@
+import asyncio
+import gzip
+import hashlib
+import os
+import sys
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
-import aiofiles
+from typing import NamedTuple, Optional
+from prometheus_client import Counter, Gauge
 from app.core.config import get_settings
+from app.core.lru import LRUCache
+from app.core.metrics import get_metric
+from app.core.storage_io import get_storage_io
+from app.services.durable_writer import DurableWriter
 from loguru import logger
 
 
+post_content_cache_requests_total = get_metric(
+    Counter,
+    "post_content_cache_requests_total",
+    "Post content cache lookups",
+    ["result"],
+)
+
+post_content_cache_hit_ratio = get_metric(
+    Gauge,
+    "post_content_cache_hit_ratio",
+    "Post content cache hit ratio since process start",
+)
+
+post_content_cache_bytes = get_metric(
+    Gauge,
+    "post_content_cache_bytes",
+    "Bytes of post content held in the cache",
+)
+
+post_content_cache_entries = get_metric(
+    Gauge,
+    "post_content_cache_entries",
+    "Number of posts held in the content cache",
+)
+
+# Phiên bản của file nội dung: (loại file, mtime_ns, size, inode)
+ContentVersion = tuple[str, int, int, int]
+
+
+class ContentFile(NamedTuple):
+    """File nội dung của bài viết dùng để trả trực tiếp qua HTTP"""
+    path: Path
+    etag: str
+    immutable: bool  # Blob content-addressed (không bao giờ thay đổi)
+    gzipped: bool  # Nội dung nằm ở cold tier, file đã nén gzip
+
+
 class PostStorageService:
-    """Service quản lý file storage cho bài viết"""
+    """Service quản lý file storage cho bài viết
+
+    Layout lưu trữ (content-addressed, chia thư mục theo hash):
+
+        posts/blobs/ab/cd/{sha256}.md   - nội dung markdown, mỗi nội dung chỉ lưu 1 lần
+        posts/index/ef/01/{post_id}     - con trỏ post_id -> sha256 của blob
+        posts/cold/ab/cd/{sha256}.md.gz - cold tier: blob đã nén của bài viết lưu trữ (archived)
+
+    Layout cũ ({post_id}_{slug}.md nằm phẳng trong posts/) vẫn được đọc
+    để hỗ trợ migration online (xem scripts/migrate_post_storage.py).
 
-    def __init__(self):
+    Nội dung đọc được cache trong LRU theo post_id, giới hạn theo tổng bytes.
+    Mỗi lần đọc chỉ stat file con trỏ để kiểm tra cache còn hợp lệ (mtime/size/inode),
+    nên thay đổi từ worker khác vẫn được nhận ra.
+
+    Mọi lần ghi đi qua DurableWriter (file tạm + rename), crash giữa chừng
+    không để lại file markdown bị cắt cụt. Blob luôn được ghi xong trước khi
+    con trỏ index trỏ tới nó.
+    """
+
+    def __init__(
+        self,
+        storage_dir: Optional[Path] = None,
+        cache_max_bytes: Optional[int] = None,
+        writer: Optional[DurableWriter] = None,
+    ):
         self.settings = get_settings()
         # Tạo thư mục storage/posts
-        self.storage_dir = Path(self.settings.UPLOAD_DIR) / "posts"
-        self.storage_dir.mkdir(parents=True, exist_ok=True)
+        self.storage_dir = storage_dir or Path(self.settings.UPLOAD_DIR) / "posts"
+        self.blob_dir = self.storage_dir / "blobs"
+        self.index_dir = self.storage_dir / "index"
+        self.cold_dir = self.storage_dir / "cold"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+
+        self.writer = writer or DurableWriter(
+            mode=self.settings.POST_STORAGE_DURABILITY,
+            group_window_ms=self.settings.POST_STORAGE_GROUP_COMMIT_MS,
+        )
+
+        if cache_max_bytes is None:
+            cache_max_bytes = self.settings.POST_CONTENT_CACHE_MAX_BYTES
+        self._cache: Optional[LRUCache[tuple[ContentVersion, str]]] = (
+            LRUCache(max_bytes=cache_max_bytes, sizeof=lambda item: sys.getsizeof(item[1]))
+            if cache_max_bytes > 0
+            else None
+        )
+
+    @staticmethod
+    def _fan_out(base: Path, key: str) -> Path:
+        """Chia thư mục 2 cấp theo 4 ký tự hex đầu của key (65536 thư mục lá)"""
+        return base / key[0:2] / key[2:4]
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        """Tính sha256 (hex) của nội dung markdown"""
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _get_blob_path(self, digest: str) -> Path:
+        """Đường dẫn blob theo sha256 của nội dung"""
+        return self._fan_out(self.blob_dir, digest) / f"{digest}.md"
+
+    def _get_cold_path(self, digest: str) -> Path:
+        """Đường dẫn bản nén của blob ở cold tier"""
+        return self._fan_out(self.cold_dir, digest) / f"{digest}.md.gz"
+
+    def _get_index_path(self, post_id: int) -> Path:
+        """Đường dẫn con trỏ index của bài viết
 
-    def _get_file_path(self, post_id: int, slug: str) -> Path:
-        """Tạo đường dẫn file cho bài viết
+        Hash post_id để các ID tăng dần được phân bổ đều giữa các thư mục.
+        """
+        key = hashlib.sha256(str(post_id).encode("ascii")).hexdigest()
+        return self._fan_out(self.index_dir, key) / str(post_id)
+
+    def _get_legacy_file_path(self, post_id: int, slug: str) -> Path:
+        """Tạo đường dẫn file cho bài viết theo layout cũ
 
         File naming convention: {post_id}_{slug}.md
         Ví dụ: 1_gioi-thieu-ve-ai-va-machine-learning.md
         """
         return self.storage_dir / f"{post_id}_{slug}.md"
 
+    async def _read_index(self, post_id: int) -> Optional[str]:
+        """Đọc sha256 mà bài viết đang trỏ tới, None nếu chưa có index"""
+        try:
+            digest = await get_storage_io().run(
+                "read", self._get_index_path(post_id).read_text, encoding="ascii"
+            )
+        except FileNotFoundError:
+            return None
+        return digest.strip() or None
+
+    async def _write_blob(self, digest: str, content: str) -> Path:
+        """Ghi blob nếu chưa tồn tại (nội dung trùng nhau chỉ lưu một lần)"""
+        blob_path = self._get_blob_path(digest)
+        try:
+            # Blob được tham chiếu lại: làm mới mtime để storage GC không coi là file cũ mồ côi.
+            # Không dùng touch(): GC xóa blob ngay trước đó thì touch tạo lại file rỗng
+            await get_storage_io().run("utime", os.utime, blob_path)
+            return blob_path
+        except FileNotFoundError:
+            pass
+        await self.writer.write_text(blob_path, content)
+        return blob_path
+
+    async def _write_index(self, post_id: int, digest: str) -> None:
+        """Cập nhật con trỏ post_id -> blob (atomic, file mới nên inode đổi mỗi lần ghi)"""
+        await self.writer.write_text(self._get_index_path(post_id), digest, encoding="ascii")
+
     async def save_post_content(
         self,
         post_id: int,
         slug: str,
         content: str
     ) -> Path:
-        """Lưu nội dung markdown vào file
+        """Lưu nội dung markdown vào blob và cập nhật index
 
         Args:
             post_id: ID của bài viết
-            slug: Slug của bài viết
+            slug: Slug của bài viết (chỉ dùng để dọn file layout cũ)
             content: Nội dung markdown
 
         Returns:
-            Path: Đường dẫn đến file đã lưu
+            Path: Đường dẫn đến blob đã lưu
 
         Raises:
             IOError: Nếu không thể lưu file
         """
         try:
-            file_path = self._get_file_path(post_id, slug)
-            async with aiofiles.open(file_path, mode='w', encoding='utf-8') as f:
-                await f.write(content)
-            logger.info(f"Đã lưu nội dung bài viết: {file_path}")
-            return file_path
+            digest = self.content_hash(content)
+            blob_path = await self._write_blob(digest, content)
+            await self._write_index(post_id, digest)
+
+            # Bài viết đã có index thì file layout cũ không còn cần thiết
+            legacy_path = self._get_legacy_file_path(post_id, slug)
+            await get_storage_io().remove(legacy_path, missing_ok=True)
+
+            await self._cache_put(post_id, slug, content)
+
+            logger.info(f"Đã lưu nội dung bài viết {post_id}: {blob_path}")
+            return blob_path
         except Exception as e:
             logger.error(f"Lỗi khi lưu bài viết {post_id}: {e}")
             raise
@@ -56,28 +203,188 @@ class PostStorageService:
         post_id: int,
         slug: str
     ) -> Optional[str]:
-        """Đọc nội dung markdown từ file
+        """Đọc nội dung markdown từ blob
 
         Args:
             post_id: ID của bài viết
-            slug: Slug của bài viết
+            slug: Slug của bài viết (dùng cho fallback layout cũ)
 
         Returns:
             Optional[str]: Nội dung markdown hoặc None nếu file không tồn tại
         """
         try:
-            file_path = self._get_file_path(post_id, slug)
-            if not file_path.exists():
-                logger.warning(f"File bài viết không tồn tại: {file_path}")
+            version = await self._content_version(post_id, slug)
+            if version is None:
+                logger.warning(f"Nội dung bài viết {post_id} không tồn tại")
                 return None
 
-            async with aiofiles.open(file_path, mode='r', encoding='utf-8') as f:
-                content = await f.read()
+            if self._cache is not None:
+                cached = self._cache.get(post_id, is_valid=lambda item: item[0] == version)
+                self._record_cache_lookup(cached is not None)
+                if cached is not None:
+                    return cached[1]
+
+            file_path = await self.get_content_path(post_id, slug)
+            if file_path is None:
+                logger.warning(f"Nội dung bài viết {post_id} không tồn tại")
+                return None
+
+            content = await self._read_file(file_path)
+
+            if self._cache is not None:
+                self._cache.put(post_id, (version, content))
+                self._update_cache_gauges()
             return content
         except Exception as e:
             logger.error(f"Lỗi khi đọc bài viết {post_id}: {e}")
             raise
 
+    @staticmethod
+    async def _read_file(file_path: Path) -> str:
+        """Đọc file nội dung, tự giải nén nếu file thuộc cold tier (.gz)"""
+        storage_io = get_storage_io()
+        if file_path.suffix == ".gz":
+            data = await storage_io.run("read", file_path.read_bytes)
+            return (await asyncio.to_thread(gzip.decompress, data)).decode("utf-8")
+        return await storage_io.run("read", file_path.read_text, encoding="utf-8")
+
+    @staticmethod
+    def _stat_version(index_path: Path, legacy_path: Path) -> Optional[ContentVersion]:
+        for kind, path in (("index", index_path), ("legacy", legacy_path)):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            return (kind, st.st_mtime_ns, st.st_size, st.st_ino)
+        return None
+
+    async def _content_version(self, post_id: int, slug: str) -> Optional[ContentVersion]:
+        """Phiên bản hiện tại của nội dung bài viết (các lần stat gộp trong 1 tác vụ của pool storage I/O)"""
+        return await get_storage_io().run(
+            "stat",
+            self._stat_version,
+            self._get_index_path(post_id),
+            self._get_legacy_file_path(post_id, slug),
+        )
+
+    async def _cache_put(self, post_id: int, slug: str, content: str) -> None:
+        """Ghi xuyên cache sau khi lưu để lần đọc kế tiếp không phải đọc lại đĩa"""
+        if self._cache is None:
+            return
+        version = await self._content_version(post_id, slug)
+        if version is None:
+            self._cache.invalidate(post_id)
+        else:
+            self._cache.put(post_id, (version, content))
+        self._update_cache_gauges()
+
+    def _record_cache_lookup(self, hit: bool) -> None:
+        post_content_cache_requests_total.labels(  # type: ignore[attr-defined]
+            result="hit" if hit else "miss"
+        ).inc()
+        self._update_cache_gauges()
+
+    def _update_cache_gauges(self) -> None:
+        if self._cache is None:
+            return
+        post_content_cache_hit_ratio.set(self._cache.hit_ratio)  # type: ignore[attr-defined]
+        post_content_cache_bytes.set(self._cache.current_bytes)  # type: ignore[attr-defined]
+        post_content_cache_entries.set(len(self._cache))  # type: ignore[attr-defined]
+
+    async def get_content_path(self, post_id: int, slug: str) -> Optional[Path]:
+        """Tìm file chứa nội dung của bài viết
+
+        Ưu tiên blob theo index (hot rồi cold), sau đó fallback về file layout cũ
+        (bài viết chưa được migrate).
+        """
+        storage_io = get_storage_io()
+        digest = await self._read_index(post_id)
+        if digest:
+            for blob_path in (self._get_blob_path(digest), self._get_cold_path(digest)):
+                if await storage_io.exists(blob_path):
+                    return blob_path
+            logger.warning(f"Index bài viết {post_id} trỏ tới blob không tồn tại: {digest}")
+
+        legacy_path = self._get_legacy_file_path(post_id, slug)
+        if await storage_io.exists(legacy_path):
+            return legacy_path
+        return None
+
+    async def get_content_file(self, post_id: int, slug: str) -> Optional[ContentFile]:
+        """Tìm file nội dung để trả trực tiếp qua HTTP (không đọc vào bộ nhớ)
+
+        Returns:
+            Optional[ContentFile]: thông tin file hoặc None nếu bài viết chưa có nội dung trong storage
+        """
+        file_path = await self.get_content_path(post_id, slug)
+        if file_path is None:
+            return None
+        if file_path.parent != self.storage_dir:
+            # Blob content-addressed: tên file chính là sha256 nên dùng làm ETag mạnh
+            digest = file_path.name.split(".", 1)[0]
+            return ContentFile(file_path, digest, True, file_path.suffix == ".gz")
+        st = await get_storage_io().run("stat", file_path.stat)
+        return ContentFile(file_path, f"{st.st_mtime_ns:x}-{st.st_size:x}", False, False)
+
+    async def get_gzip_variant(self, blob_path: Path) -> Path:
+        """Lấy (tạo lazy nếu chưa có) bản nén gzip của blob: {sha256}.md.gz
+
+        Blob bất biến nên bản nén chỉ cần tạo một lần.
+        """
+        gz_path = blob_path.with_name(f"{blob_path.name}.gz")
+        storage_io = get_storage_io()
+        if not await storage_io.exists(gz_path):
+            data = await storage_io.run("read", blob_path.read_bytes)
+            compressed = await asyncio.to_thread(gzip.compress, data, 9, mtime=0)
+            await self.writer.write_bytes(gz_path, compressed)
+        return gz_path
+
+    async def demote_post_content(self, post_id: int, slug: str) -> bool:
+        """Chuyển nội dung bài viết sang cold tier (gzip), xóa bản hot
+
+        Con trỏ index giữ nguyên nên đọc vẫn trong suốt qua read_post_content.
+
+        Returns:
+            bool: True nếu nội dung đang nằm ở cold tier sau khi gọi
+        """
+        digest = await self._read_index(post_id)
+        if not digest:
+            return False
+
+        storage_io = get_storage_io()
+        blob_path = self._get_blob_path(digest)
+        cold_path = self._get_cold_path(digest)
+        if not await storage_io.exists(cold_path):
+            if not await storage_io.exists(blob_path):
+                logger.warning(f"Không tìm thấy blob để chuyển sang cold tier: {digest}")
+                return False
+            data = await storage_io.run("read", blob_path.read_bytes)
+            compressed = await asyncio.to_thread(gzip.compress, data, 9, mtime=0)
+            await self.writer.write_bytes(cold_path, compressed)
+
+        # Bản hot và bản gzip phục vụ HTTP không còn cần thiết
+        await storage_io.remove(blob_path, missing_ok=True)
+        await storage_io.remove(blob_path.with_name(f"{blob_path.name}.gz"), missing_ok=True)
+        logger.info(f"Đã chuyển nội dung bài viết {post_id} sang cold tier")
+        return True
+
+    async def promote_post_content(self, post_id: int, slug: str) -> Optional[str]:
+        """Đưa nội dung bài viết từ cold tier trở lại hot tier
+
+        Returns:
+            Optional[str]: Nội dung markdown hoặc None nếu không có nội dung
+        """
+        content = await self.read_post_content(post_id, slug)
+        if content is None:
+            return None
+
+        digest = await self._read_index(post_id)
+        if digest:
+            await self._write_blob(digest, content)
+            await get_storage_io().remove(self._get_cold_path(digest), missing_ok=True)
+            logger.info(f"Đã đưa nội dung bài viết {post_id} về hot tier")
+        return content
+
     async def update_post_content(
         self,
         post_id: int,
@@ -92,7 +399,7 @@ class PostStorageService:
             content: Nội dung markdown mới
 
         Returns:
-            Path: Đường dẫn đến file đã cập nhật
+            Path: Đường dẫn đến blob đã cập nhật
         """
         return await self.save_post_content(post_id, slug, content)
 
@@ -101,7 +408,9 @@ class PostStorageService:
         post_id: int,
         slug: str
     ) -> bool:
-        """Xóa file markdown
+        """Xóa con trỏ index (và file layout cũ nếu còn)
+
+        Blob không bị xóa ngay vì có thể đang được bài viết khác tham chiếu.
 
         Args:
             post_id: ID của bài viết
@@ -111,13 +420,86 @@ class PostStorageService:
             bool: True nếu xóa thành công, False nếu file không tồn tại
         """
         try:
-            file_path = self._get_file_path(post_id, slug)
-            if file_path.exists():
-                file_path.unlink()
-                logger.info(f"Đã xóa nội dung bài viết: {file_path}")
-                return True
-            logger.warning(f"File bài viết không tồn tại: {file_path}")
-            return False
+            if self._cache is not None:
+                self._cache.invalidate(post_id)
+                self._update_cache_gauges()
+
+            storage_io = get_storage_io()
+            deleted = False
+            for file_path in (
+                self._get_index_path(post_id),
+                self._get_legacy_file_path(post_id, slug),
+            ):
+                if await storage_io.exists(file_path):
+                    await storage_io.run("unlink", file_path.unlink, missing_ok=True)
+                    deleted = True
+
+            if deleted:
+                logger.info(f"Đã xóa nội dung bài viết {post_id}")
+            else:
+                logger.warning(f"Nội dung bài viết {post_id} không tồn tại")
+            return deleted
         except Exception as e:
             logger.error(f"Lỗi khi xóa bài viết {post_id}: {e}")
             raise
+
+    def iter_legacy_files(self):
+        """Liệt kê các file layout cũ ({post_id}_{slug}.md) còn nằm trong posts/"""
+        for file_path in self.storage_dir.glob("*.md"):
+            post_id, sep, _ = file_path.stem.partition("_")
+            if sep and post_id.isdigit():
+                yield int(post_id), file_path
+
+    def _legacy_files_for(self, post_id: int, slug: Optional[str]) -> list[Path]:
+        """Các file layout cũ của bài viết, file nên dùng đứng đầu (khớp slug, không thì mới nhất)"""
+        files = sorted(
+            self.storage_dir.glob(f"{post_id}_*.md"),
+            key=lambda path: path.stat().st_mtime_ns,
+            reverse=True,
+        )
+        if slug is not None:
+            current = self._get_legacy_file_path(post_id, slug)
+            if current in files:
+                files.remove(current)
+                files.insert(0, current)
+        return files
+
+    async def migrate_legacy_file(self, post_id: int, slug: Optional[str] = None) -> bool:
+        """Chuyển file layout cũ của bài viết sang blob + index
+
+        Một post id có thể còn nhiều file cũ (đổi slug mà file trước không bị xóa):
+        chỉ file khớp slug hiện tại (không biết slug thì file mới nhất) được index,
+        các file còn lại bị xóa.
+
+        An toàn khi chạy song song với ứng dụng: nếu bài viết đã có index
+        (được ghi sau khi migration bắt đầu) thì giữ nguyên index mới
+        và chỉ xóa file cũ.
+
+        Returns:
+            bool: True nếu đã tạo index từ file cũ
+        """
+        storage_io = get_storage_io()
+        legacy_files = await storage_io.run("glob", self._legacy_files_for, post_id, slug)
+        if not legacy_files:
+            return False
+
+        migrated = False
+        if await self._read_index(post_id) is None:
+            content = await storage_io.run("read", legacy_files[0].read_text, encoding="utf-8")
+            digest = self.content_hash(content)
+            await self._write_blob(digest, content)
+            await self._write_index(post_id, digest)
+            migrated = True
+
+        for legacy_path in legacy_files:
+            await storage_io.remove(legacy_path, missing_ok=True)
+        return migrated
+
+
+@lru_cache()
+def get_post_storage() -> PostStorageService:
+    """
+    Lấy PostStorageService dùng chung cho toàn bộ ứng dụng.
+    Khởi tạo lazy để không tạo thư mục storage khi chỉ import module.
+    """
+    return PostStorageService()
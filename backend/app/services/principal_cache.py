@@ -0,0 +1,127 @@
+import json
+import time
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from loguru import logger
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.lru import LRUCache
+from app.core.redis import get_redis
+from app.models.user import User
+
+
+class Principal(NamedTuple):
+    """Danh tính của user đã xác thực, đủ cho các kiểm tra phân quyền"""
+    id: int
+    email: str
+    rank: int
+    is_active: bool
+
+
+class PrincipalCache:
+    """
+    Cache principal theo user id cho dependency xác thực, 2 tầng:
+
+    - LRU trong mỗi worker, TTL rất ngắn (local_ttl_seconds)
+    - Redis dùng chung giữa các worker, TTL ngắn (ttl_seconds)
+
+    Khi user bị cập nhật (đổi rank, khóa tài khoản...) invalidate() xóa cả hai tầng;
+    worker khác thấy thay đổi chậm nhất sau local_ttl_seconds.
+    Redis lỗi thì bỏ qua tầng Redis và đọc thẳng DB.
+    """
+
+    KEY_PREFIX = "principal:"
+
+    def __init__(
+        self,
+        redis: Optional[aioredis.Redis],
+        max_entries: int,
+        local_ttl_seconds: float,
+        ttl_seconds: int,
+    ):
+        self.redis = redis
+        self.local_ttl_seconds = local_ttl_seconds
+        self.ttl_seconds = ttl_seconds
+        self._cache: Optional[LRUCache[tuple[Principal, float]]] = (
+            LRUCache(max_entries=max_entries) if max_entries > 0 else None
+        )
+
+    def _is_fresh(self, entry: tuple[Principal, float]) -> bool:
+        return time.monotonic() - entry[1] < self.local_ttl_seconds
+
+    def _remember(self, principal: Principal) -> None:
+        if self._cache is not None:
+            self._cache.put(principal.id, (principal, time.monotonic()))
+
+    async def _redis_get(self, user_id: int) -> Optional[Principal]:
+        if self.redis is None or not self.ttl_seconds:
+            return None
+        try:
+            raw = await self.redis.get(f"{self.KEY_PREFIX}{user_id}")
+        except (RedisError, OSError) as e:
+            logger.debug(f"Không đọc được principal {user_id} từ Redis: {e}")
+            return None
+        if raw is None:
+            return None
+        return Principal(*json.loads(raw))
+
+    async def _redis_set(self, principal: Principal) -> None:
+        if self.redis is None or not self.ttl_seconds:
+            return
+        try:
+            await self.redis.set(
+                f"{self.KEY_PREFIX}{principal.id}", json.dumps(principal), ex=self.ttl_seconds
+            )
+        except (RedisError, OSError) as e:
+            logger.debug(f"Không ghi được principal {principal.id} vào Redis: {e}")
+
+    async def get(self, db: AsyncSession, user_id: int) -> Optional[Principal]:
+        """Lấy principal từ LRU, rồi Redis, cuối cùng mới query DB"""
+        if self._cache is not None:
+            entry = self._cache.get(user_id, is_valid=self._is_fresh)
+            if entry is not None:
+                return entry[0]
+
+        principal = await self._redis_get(user_id)
+        if principal is not None:
+            self._remember(principal)
+            return principal
+
+        result = await db.execute(
+            select(User.id, User.email, User.rank, User.is_active).where(User.id == user_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+
+        principal = Principal(int(row.id), str(row.email), int(row.rank), bool(row.is_active))
+        self._remember(principal)
+        await self._redis_set(principal)
+        return principal
+
+    async def invalidate(self, user_id: int) -> None:
+        if self._cache is not None:
+            self._cache.invalidate(user_id)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.delete(f"{self.KEY_PREFIX}{user_id}")
+        except (RedisError, OSError) as e:
+            # Entry cũ trong Redis tự hết hạn sau ttl_seconds
+            logger.error(f"Không xóa được principal {user_id} khỏi Redis: {e}")
+
+
+@lru_cache()
+def get_principal_cache() -> PrincipalCache:
+    settings = get_settings()
+    return PrincipalCache(
+        redis=get_redis(),
+        max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+        local_ttl_seconds=settings.PRINCIPAL_CACHE_LOCAL_TTL_SECONDS,
+        ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    )
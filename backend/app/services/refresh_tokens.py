@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import HTTPException, status
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.bloom import BloomFilter
+from app.core.config import get_settings
+from app.core.security import create_refresh_token, verify_refresh_token
+from app.crud import crud_refresh_token
+
+
+def hash_token_id(jti: str) -> str:
+    return hashlib.sha256(jti.encode("utf-8")).hexdigest()
+
+
+class RefreshTokenService:
+    """
+    Cấp, xoay vòng (rotate) và thu hồi refresh token.
+
+    Refresh token là JWT có claim jti ngẫu nhiên; DB chỉ lưu sha256(jti).
+    Mỗi lần refresh, token cũ bị thu hồi bằng một UPDATE có điều kiện và token
+    mới được cấp. Token đã thu hồi mà bị dùng lại (dấu hiệu bị đánh cắp) thì
+    toàn bộ refresh token của user bị thu hồi.
+
+    Bloom filter các token đã thu hồi (rebuild định kỳ từ DB) giúp token hợp lệ
+    đi thẳng vào bước rotate mà không cần đọc trạng thái trước; chỉ token
+    "có thể đã thu hồi" mới bị tra DB để xác nhận.
+
+    Token vừa bị rotate trong reuse_grace_seconds (nhiều tab refresh cùng lúc)
+    vẫn được đổi lấy token mới, không bị coi là dùng lại.
+    """
+
+    def __init__(
+        self,
+        expire_days: int,
+        filter_capacity: int,
+        filter_error_rate: float,
+        filter_rebuild_seconds: float,
+        reuse_grace_seconds: float = 0,
+    ):
+        self.expire_days = expire_days
+        self.reuse_grace_seconds = reuse_grace_seconds
+        self.filter_capacity = filter_capacity
+        self.filter_error_rate = filter_error_rate
+        self.filter_rebuild_seconds = filter_rebuild_seconds
+        self._revoked = BloomFilter(filter_capacity, filter_error_rate)
+        self._built_at: Optional[float] = None
+        self._rebuild_lock = asyncio.Lock()
+
+    @staticmethod
+    def _invalid(detail: str = "Invalid refresh token") -> HTTPException:
+        return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
+
+    async def _refresh_filter(self, db: AsyncSession) -> None:
+        """Nạp lại filter từ DB để thấy các token bị thu hồi ở worker khác"""
+        if self._built_at is not None and time.monotonic() - self._built_at < self.filter_rebuild_seconds:
+            return
+        async with self._rebuild_lock:
+            if self._built_at is not None and time.monotonic() - self._built_at < self.filter_rebuild_seconds:
+                return
+            hashes = await crud_refresh_token.get_revoked_hashes(db)
+            self._revoked = BloomFilter.from_keys(
+                hashes, max(self.filter_capacity, len(hashes) * 2), self.filter_error_rate
+            )
+            self._built_at = time.monotonic()
+
+    def _token_hash(self, token: str) -> tuple[int, str]:
+        payload = verify_refresh_token(token)
+        if payload.sub is None or not payload.jti:
+            raise self._invalid()
+        return int(payload.sub), hash_token_id(payload.jti)
+
+    async def issue(self, db: AsyncSession, user_id: int) -> str:
+        jti = secrets.token_urlsafe(32)
+        expires_delta = timedelta(days=self.expire_days)
+        token = create_refresh_token(data={"sub": str(user_id), "jti": jti}, expires_delta=expires_delta)
+        expires_at = datetime.now(timezone.utc).replace(tzinfo=None) + expires_delta
+        await crud_refresh_token.create(db, user_id, hash_token_id(jti), expires_at)
+        return token
+
+    async def _check_reuse(self, db: AsyncSession, user_id: int, token_hash: str) -> bool:
+        """Xác nhận với DB token "có thể đã thu hồi"
+
+        Returns:
+            bool: False nếu token còn hiệu lực, True nếu token vừa bị rotate trong grace window.
+            Token không tồn tại hoặc đã thu hồi thì raise 401 (thu hồi cả họ token khi bị dùng lại).
+        """
+        record = await crud_refresh_token.get_by_hash(db, token_hash)
+        if record is not None and not record.revoked:
+            return False
+        if record is not None and record.rotated_at is not None and self.reuse_grace_seconds > 0:
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            if record.expires_at > now and now - record.rotated_at <= timedelta(seconds=self.reuse_grace_seconds):
+                return True
+        if record is not None:
+            revoked = await crud_refresh_token.revoke_all_for_user(db, user_id)
+            # Commit ngay: request trả lỗi sẽ bị rollback trong get_db
+            await db.commit()
+            logger.warning(
+                f"Refresh token reuse detected for user {user_id}, revoked {revoked} active tokens"
+            )
+        raise self._invalid("Invalid or expired refresh token")
+
+    async def rotate(self, db: AsyncSession, token: str) -> tuple[int, str]:
+        """Thu hồi token hiện tại và cấp token mới
+
+        Returns:
+            tuple[int, str]: (user_id, refresh token mới)
+        """
+        user_id, token_hash = self._token_hash(token)
+        await self._refresh_filter(db)
+
+        # Có thể đã thu hồi (hoặc false positive của filter): xác nhận với DB
+        if token_hash in self._revoked and await self._check_reuse(db, user_id, token_hash):
+            return user_id, await self.issue(db, user_id)
+
+        if not await crud_refresh_token.revoke(db, token_hash, rotated=True):
+            # Không tồn tại, hết hạn, hoặc vừa bị rotate ở worker khác
+            if await self._check_reuse(db, user_id, token_hash):
+                return user_id, await self.issue(db, user_id)
+            raise self._invalid("Invalid or expired refresh token")
+        self._revoked.add(token_hash)
+
+        return user_id, await self.issue(db, user_id)
+
+    async def revoke(self, db: AsyncSession, token: str) -> bool:
+        """Thu hồi token (logout), token không hợp lệ thì bỏ qua"""
+        try:
+            _, token_hash = self._token_hash(token)
+        except HTTPException:
+            return False
+        revoked = await crud_refresh_token.revoke(db, token_hash)
+        if revoked:
+            self._revoked.add(token_hash)
+        return revoked
+
+
+@lru_cache()
+def get_refresh_tokens() -> RefreshTokenService:
+    settings = get_settings()
+    return RefreshTokenService(
+        expire_days=settings.REFRESH_TOKEN_EXPIRE_DAYS,
+        filter_capacity=settings.REFRESH_TOKEN_FILTER_CAPACITY,
+        filter_error_rate=settings.REFRESH_TOKEN_FILTER_ERROR_RATE,
+        filter_rebuild_seconds=settings.REFRESH_TOKEN_FILTER_REBUILD_SECONDS,
+        reuse_grace_seconds=settings.REFRESH_TOKEN_REUSE_GRACE_SECONDS,
+    )
@@ -0,0 +1,320 @@
+import asyncio
+import json
+import os
+import re
+import shutil
+import stat
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.attachment import Attachment
+from app.models.file_blob import FileBlob
+from app.core.storage_io import get_storage_io
+from app.models.post import Post
+from app.services.post_storage import PostStorageService
+
+
+# Thứ tự các pha trong một lượt GC
+PHASES = ("uploads", "variants", "post_index", "post_blobs")
+
+_HEX2_RE = re.compile(r"^[0-9a-f]{2}$")
+
+# Độ rộng key shard của variants (id attachment) để so sánh chuỗi đúng thứ tự số
+_ID_KEY_WIDTH = 12
+
+
+def _chunks(items: list, size: int) -> Iterator[list]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _sorted_subdirs(base: Path, pattern: re.Pattern) -> list[str]:
+    if not base.is_dir():
+        return []
+    return sorted(entry.name for entry in os.scandir(base) if entry.is_dir() and pattern.match(entry.name))
+
+
+class StorageGC:
+    """
+    Dọn file không còn được tham chiếu trong storage, chạy tăng dần theo shard:
+
+    - uploads:    {upload_dir}/YYYY/MM/DD/*      đối chiếu attachments.file_path / file_blobs.file_path
+    - variants:   {variant_dir}/{attachment_id}/ đối chiếu attachments.id
+    - post_index: posts/index/ab/cd/{post_id}     đối chiếu posts.id
+    - post_blobs: posts/{blobs,cold}/ab/cd/*      đối chiếu sha256 trong các con trỏ index còn lại
+
+    Mỗi shard được kiểm tra tham chiếu theo lô rồi ghi checkpoint, nên job có thể dừng
+    bất cứ lúc nào và chạy tiếp từ shard kế tiếp. Chỉ file cũ hơn min_age_seconds mới
+    được xét (upload đang ghi / chưa commit DB không bị xóa nhầm). File mồ côi được
+    chuyển vào quarantine (nếu cấu hình) thay vì xóa hẳn.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        upload_dir: Path,
+        upload_db_prefix: str,
+        variant_dir: Path,
+        post_storage: PostStorageService,
+        checkpoint_path: Path,
+        quarantine_dir: Optional[Path] = None,
+        min_age_seconds: float = 24 * 3600,
+        max_removals_per_second: float = 50,
+        batch_size: int = 500,
+        dry_run: bool = False,
+    ):
+        self.db = db
+        self.upload_dir = Path(upload_dir)
+        # Tiền tố đường dẫn như lưu trong DB (settings.UPLOAD_DIR)
+        self.upload_db_prefix = upload_db_prefix
+        self.variant_dir = Path(variant_dir)
+        self.post_storage = post_storage
+        self.checkpoint_path = Path(checkpoint_path)
+        self.quarantine_dir = Path(quarantine_dir) if quarantine_dir else None
+        self.min_age_seconds = min_age_seconds
+        self.removal_interval = 1 / max_removals_per_second if max_removals_per_second > 0 else 0
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.stats: Counter = Counter()
+        self._referenced_digests: Optional[set[str]] = None
+
+    # ---------- Checkpoint ----------
+
+    def load_checkpoint(self) -> dict:
+        try:
+            return json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_checkpoint(self, checkpoint: dict) -> None:
+        if self.dry_run:
+            return
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.checkpoint_path.with_name(f".{self.checkpoint_path.name}.tmp")
+        tmp_path.write_text(json.dumps(checkpoint), encoding="utf-8")
+        os.replace(tmp_path, self.checkpoint_path)
+
+    # ---------- Liệt kê shard ----------
+
+    def _upload_shards(self) -> list[str]:
+        shards = []
+        for year in _sorted_subdirs(self.upload_dir, re.compile(r"^\d{4}$")):
+            for month in _sorted_subdirs(self.upload_dir / year, re.compile(r"^\d{2}$")):
+                for day in _sorted_subdirs(self.upload_dir / year / month, re.compile(r"^\d{2}$")):
+                    shards.append(f"{year}/{month}/{day}")
+        return shards
+
+    def _variant_shards(self) -> list[str]:
+        if not self.variant_dir.is_dir():
+            return []
+        ids = sorted(
+            int(entry.name) for entry in os.scandir(self.variant_dir)
+            if entry.is_dir() and entry.name.isdigit()
+        )
+        # Mỗi shard là một lô id, key = id lớn nhất của lô
+        return [f"{batch[-1]:0{_ID_KEY_WIDTH}d}" for batch in _chunks(ids, self.batch_size)]
+
+    @staticmethod
+    def _fan_out_shards(base: Path, prefix: str = "") -> list[str]:
+        return [
+            f"{prefix}{a}/{b}"
+            for a in _sorted_subdirs(base, _HEX2_RE)
+            for b in _sorted_subdirs(base / a, _HEX2_RE)
+        ]
+
+    def _shards(self, phase: str) -> list[str]:
+        if phase == "uploads":
+            return self._upload_shards()
+        if phase == "variants":
+            return self._variant_shards()
+        if phase == "post_index":
+            return self._fan_out_shards(self.post_storage.index_dir)
+        return (
+            self._fan_out_shards(self.post_storage.blob_dir, "blobs/")
+            + self._fan_out_shards(self.post_storage.cold_dir, "cold/")
+        )
+
+    # ---------- Xử lý shard ----------
+
+    def _old_files(self, directory: Path) -> list[Path]:
+        """File (không phải thư mục) cũ hơn min_age trong thư mục"""
+        cutoff = time.time() - self.min_age_seconds
+        files = []
+        for entry in os.scandir(directory):
+            if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                files.append(Path(entry.path))
+        return files
+
+    async def _existing(self, column, values: list) -> set:
+        """Các giá trị của column có trong DB (query theo lô)"""
+        found = set()
+        for batch in _chunks(values, self.batch_size):
+            result = await self.db.execute(select(column).where(column.in_(batch)))
+            found.update(result.scalars().all())
+        return found
+
+    async def _process_uploads(self, shard: str) -> None:
+        files = await get_storage_io().run("scandir", self._old_files, self.upload_dir / shard)
+        by_db_path = {os.path.join(self.upload_db_prefix, *shard.split("/"), f.name): f for f in files}
+        db_paths = list(by_db_path)
+        referenced = await self._existing(Attachment.file_path, db_paths)
+        referenced |= await self._existing(FileBlob.file_path, db_paths)
+        for db_path, path in by_db_path.items():
+            if db_path not in referenced:
+                await self._remove(path, Path("uploads", shard, path.name))
+
+    async def _process_variants(self, shard: str, after: Optional[str]) -> None:
+        low = int(after) if after else 0
+        high = int(shard)
+        ids = await get_storage_io().run(
+            "scandir",
+            lambda: [
+                int(entry.name) for entry in os.scandir(self.variant_dir)
+                if entry.is_dir() and entry.name.isdigit() and low < int(entry.name) <= high
+            ]
+        )
+        existing = await self._existing(Attachment.id, ids)
+        cutoff = time.time() - self.min_age_seconds
+        for attachment_id in sorted(set(ids) - existing):
+            path = self.variant_dir / str(attachment_id)
+            if (await get_storage_io().run("stat", path.stat)).st_mtime < cutoff:
+                await self._remove(path, Path("variants", str(attachment_id)))
+
+    async def _process_post_index(self, shard: str) -> None:
+        files = await get_storage_io().run("scandir", self._old_files, self.post_storage.index_dir / shard)
+        by_id = {int(f.name): f for f in files if f.name.isdigit()}
+        existing = await self._existing(Post.id, list(by_id))
+        for post_id, path in by_id.items():
+            if post_id not in existing:
+                await self._remove(path, Path("posts", "index", shard, path.name))
+
+    def _read_referenced_digests(self) -> set[str]:
+        digests = set()
+        for path in self.post_storage.index_dir.glob("*/*/*"):
+            try:
+                digests.add(path.read_text(encoding="ascii").strip())
+            except (OSError, UnicodeDecodeError):
+                continue
+        return digests
+
+    async def _process_post_blobs(self, shard: str) -> None:
+        if self._referenced_digests is None:
+            # Đọc sau pha post_index để các con trỏ mồ côi đã được dọn
+            self._referenced_digests = await get_storage_io().run("read", self._read_referenced_digests)
+        kind, _, fan_out = shard.partition("/")
+        base = self.post_storage.blob_dir if kind == "blobs" else self.post_storage.cold_dir
+        files = await get_storage_io().run("scandir", self._old_files, base / fan_out)
+        for path in files:
+            # {sha256}.md, {sha256}.md.gz (bản gzip phục vụ HTTP / cold tier), file tạm .*.tmp
+            digest = path.name.split(".", 1)[0]
+            if digest not in self._referenced_digests:
+                await self._remove(path, Path("posts", kind, fan_out, path.name))
+
+    async def _process(self, phase: str, shard: str, after: Optional[str]) -> None:
+        if phase == "uploads":
+            await self._process_uploads(shard)
+        elif phase == "variants":
+            await self._process_variants(shard, after)
+        elif phase == "post_index":
+            await self._process_post_index(shard)
+        else:
+            await self._process_post_blobs(shard)
+
+    async def _remove(self, path: Path, relative: Path) -> None:
+        """Xóa hoặc đưa vào quarantine một file/thư mục mồ côi (có giới hạn tốc độ)"""
+        self.stats["orphans"] += 1
+        storage_io = get_storage_io()
+        try:
+            st = await storage_io.run("stat", path.stat)
+        except FileNotFoundError:
+            return
+        size = st.st_size if stat.S_ISREG(st.st_mode) else 0
+        if self.dry_run:
+            logger.info(f"[dry-run] Orphan: {relative}")
+            return
+
+        try:
+            if self.quarantine_dir is not None:
+                target = self.quarantine_dir / datetime.now().strftime("%Y%m%d") / relative
+                await storage_io.makedirs(target.parent)
+                await storage_io.run("move", shutil.move, str(path), str(target))
+            elif stat.S_ISDIR(st.st_mode):
+                await storage_io.run("rmtree", shutil.rmtree, path)
+            else:
+                await storage_io.remove(path)
+        except FileNotFoundError:
+            return
+        self.stats["removed"] += 1
+        self.stats["bytes"] += size
+        if self.removal_interval:
+            await asyncio.sleep(self.removal_interval)
+
+    # ---------- Chạy ----------
+
+    async def run(self, max_shards: Optional[int] = None, shard_sleep: float = 0) -> bool:
+        """Chạy GC tiếp từ checkpoint
+
+        Args:
+            max_shards: Số shard tối đa xử lý trong lần chạy này (None = tới hết lượt)
+            shard_sleep: Nghỉ giữa các shard (giây) để giảm tải I/O
+
+        Returns:
+            bool: True nếu đã hoàn thành trọn một lượt (checkpoint được đặt lại)
+        """
+        checkpoint = self.load_checkpoint()
+        phase = checkpoint.get("phase", PHASES[0])
+        after = checkpoint.get("after")
+        if phase not in PHASES:
+            phase, after = PHASES[0], None
+        started_at = checkpoint.get("pass_started_at", time.time())
+        processed = 0
+
+        for current in PHASES[PHASES.index(phase):]:
+            shards = await get_storage_io().run("scandir", self._shards, current)
+            for shard in shards:
+                if after is not None and shard <= after:
+                    continue
+                if max_shards is not None and processed >= max_shards:
+                    return False
+
+                await self._process(current, shard, after)
+                # Kết thúc transaction chỉ đọc: shard sau thấy dữ liệu mới nhất
+                await self.db.rollback()
+                self.stats["shards"] += 1
+                processed += 1
+                after = shard
+                self.save_checkpoint({"phase": current, "after": after, "pass_started_at": started_at})
+                if shard_sleep:
+                    await asyncio.sleep(shard_sleep)
+            after = None
+            next_index = PHASES.index(current) + 1
+            if next_index < len(PHASES):
+                self.save_checkpoint({"phase": PHASES[next_index], "after": None, "pass_started_at": started_at})
+
+        self._referenced_digests = None
+        self.save_checkpoint({"last_pass_completed_at": time.time()})
+        logger.info(
+            f"Storage GC hoàn thành một lượt: {self.stats['removed']} file mồ côi "
+            f"({self.stats['bytes']} bytes) trong {self.stats['shards']} shard"
+        )
+        return True
+
+    def purge_quarantine(self, older_than_days: int) -> int:
+        """Xóa hẳn các thư mục quarantine (theo ngày) cũ hơn older_than_days"""
+        if self.quarantine_dir is None or not self.quarantine_dir.is_dir():
+            return 0
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime("%Y%m%d")
+        purged = 0
+        for day in _sorted_subdirs(self.quarantine_dir, re.compile(r"^\d{8}$")):
+            if day < cutoff:
+                if not self.dry_run:
+                    shutil.rmtree(self.quarantine_dir / day, ignore_errors=True)
+                purged += 1
+        return purged
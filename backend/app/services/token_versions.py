@@ -0,0 +1,101 @@
+import time
+from functools import lru_cache
+from typing import Optional
+
+from loguru import logger
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.lru import LRUCache
+from app.core.redis import get_redis
+from app.models.user import User
+
+
+class TokenVersionCache:
+    """
+    Bảng user_id -> token_version dùng để thu hồi access token ở chế độ
+    phân quyền chỉ dựa trên claims (không đọc bảng users mỗi request).
+
+    Cùng cấu trúc 2 tầng với principal cache: LRU trong worker (TTL rất ngắn)
+    và Redis dùng chung. Giá trị chỉ đổi khi user bị đổi rank/khóa/xóa nên
+    gần như mọi lượt kiểm tra đều trúng cache.
+    """
+
+    KEY_PREFIX = "token_ver:"
+
+    def __init__(
+        self,
+        redis: Optional[aioredis.Redis],
+        max_entries: int,
+        local_ttl_seconds: float,
+        ttl_seconds: int,
+    ):
+        self.redis = redis
+        self.local_ttl_seconds = local_ttl_seconds
+        self.ttl_seconds = ttl_seconds
+        self._cache: Optional[LRUCache[tuple[int, float]]] = (
+            LRUCache(max_entries=max_entries) if max_entries > 0 else None
+        )
+
+    def _is_fresh(self, entry: tuple[int, float]) -> bool:
+        return time.monotonic() - entry[1] < self.local_ttl_seconds
+
+    def _remember(self, user_id: int, version: int) -> None:
+        if self._cache is not None:
+            self._cache.put(user_id, (version, time.monotonic()))
+
+    async def get(self, db: AsyncSession, user_id: int) -> Optional[int]:
+        """token_version hiện tại của user, None nếu user không tồn tại"""
+        if self._cache is not None:
+            entry = self._cache.get(user_id, is_valid=self._is_fresh)
+            if entry is not None:
+                return entry[0]
+
+        key = f"{self.KEY_PREFIX}{user_id}"
+        if self.redis is not None and self.ttl_seconds:
+            try:
+                raw = await self.redis.get(key)
+            except (RedisError, OSError) as e:
+                logger.debug(f"Không đọc được token version {user_id} từ Redis: {e}")
+                raw = None
+            if raw is not None:
+                self._remember(user_id, int(raw))
+                return int(raw)
+
+        result = await db.execute(select(User.token_version).where(User.id == user_id))
+        version = result.scalar_one_or_none()
+        if version is None:
+            return None
+
+        self._remember(user_id, int(version))
+        if self.redis is not None and self.ttl_seconds:
+            try:
+                await self.redis.set(key, int(version), ex=self.ttl_seconds)
+            except (RedisError, OSError) as e:
+                logger.debug(f"Không ghi được token version {user_id} vào Redis: {e}")
+        return int(version)
+
+    async def invalidate(self, user_id: int) -> None:
+        if self._cache is not None:
+            self._cache.invalidate(user_id)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.delete(f"{self.KEY_PREFIX}{user_id}")
+        except (RedisError, OSError) as e:
+            # Entry cũ trong Redis tự hết hạn sau ttl_seconds
+            logger.error(f"Không xóa được token version {user_id} khỏi Redis: {e}")
+
+
+@lru_cache()
+def get_token_versions() -> TokenVersionCache:
+    settings = get_settings()
+    return TokenVersionCache(
+        redis=get_redis(),
+        max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+        local_ttl_seconds=settings.TOKEN_VERSION_CACHE_LOCAL_TTL_SECONDS,
+        ttl_seconds=settings.TOKEN_VERSION_CACHE_TTL_SECONDS,
+    )
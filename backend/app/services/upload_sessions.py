@@ -0,0 +1,193 @@
+import json
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import AsyncIterator, NamedTuple, Union
+
+from fastapi import HTTPException, status
+from loguru import logger
+
+from app.core.config import get_settings
+from app.core.exceptions import UploadOffsetMismatch, UploadSessionBusy, UploadSessionNotFound
+from app.core.storage_io import get_storage_io
+
+try:
+    import fcntl
+except ImportError:  # Windows: không khóa được file, chỉ kiểm tra offset
+    fcntl = None  # type: ignore[assignment]
+
+
+_SESSION_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadSession(NamedTuple):
+    id: str
+    user_id: int
+    filename: str
+    size: int
+    is_public: bool
+    created_at: float
+    expires_at: float
+
+
+@contextmanager
+def _exclusive_lock(f):
+    """Khóa file .part trong lúc ghi chunk (không chờ, báo bận nếu đang bị khóa)"""
+    if fcntl is None:
+        yield
+        return
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise UploadSessionBusy()
+    try:
+        yield
+    finally:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class UploadSessionStore:
+    """
+    Lưu trạng thái upload resumable trên đĩa để mọi worker đều thấy:
+
+        {session_dir}/{id}.json - metadata phiên (chủ sở hữu, tên file, dung lượng khai báo)
+        {session_dir}/{id}.part - dữ liệu đã nhận, offset hiện tại = kích thước file
+    """
+
+    def __init__(self, session_dir: Union[str, Path], ttl_seconds: int):
+        self.session_dir = Path(session_dir)
+        self.ttl_seconds = ttl_seconds
+
+    def _meta_path(self, session_id: str) -> Path:
+        return self.session_dir / f"{session_id}.json"
+
+    def part_path(self, session: UploadSession) -> Path:
+        return self.session_dir / f"{session.id}.part"
+
+    async def create(self, user_id: int, filename: str, size: int, is_public: bool) -> UploadSession:
+        """Tạo phiên upload mới với file .part rỗng"""
+        now = time.time()
+        session = UploadSession(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            filename=filename,
+            size=size,
+            is_public=is_public,
+            created_at=now,
+            expires_at=now + self.ttl_seconds,
+        )
+        await get_storage_io().run("write", self._write_session, session)
+        return session
+
+    def _write_session(self, session: UploadSession) -> None:
+        self.session_dir.mkdir(parents=True, exist_ok=True)
+        self.part_path(session).touch()
+        meta_path = self._meta_path(session.id)
+        tmp_path = meta_path.with_name(f".{meta_path.name}.tmp")
+        tmp_path.write_text(json.dumps(session._asdict()), encoding="utf-8")
+        os.replace(tmp_path, meta_path)
+
+    async def get(self, session_id: str, user_id: int) -> UploadSession:
+        """Lấy phiên upload của user, 404 nếu không tồn tại / hết hạn / của người khác"""
+        if not _SESSION_ID_RE.match(session_id):
+            raise UploadSessionNotFound()
+        try:
+            raw = await get_storage_io().run("read", self._meta_path(session_id).read_text, encoding="utf-8")
+        except FileNotFoundError:
+            raise UploadSessionNotFound()
+
+        session = UploadSession(**json.loads(raw))
+        if session.user_id != user_id or session.expires_at < time.time():
+            raise UploadSessionNotFound()
+        return session
+
+    async def offset(self, session: UploadSession) -> int:
+        """Offset đã xác nhận = số byte đã ghi vào file .part"""
+        try:
+            st = await get_storage_io().run("stat", self.part_path(session).stat)
+            return st.st_size
+        except FileNotFoundError:
+            raise UploadSessionNotFound()
+
+    async def append(
+        self, session: UploadSession, offset: int, chunks: AsyncIterator[bytes]
+    ) -> int:
+        """Ghi nối chunk vào file .part bắt đầu từ offset client gửi
+
+        Returns:
+            int: Offset mới sau khi ghi
+        """
+        part_path = self.part_path(session)
+        storage_io = get_storage_io()
+        try:
+            f = await storage_io.run("open", open, part_path, "r+b")
+        except FileNotFoundError:
+            raise UploadSessionNotFound()
+
+        try:
+            with _exclusive_lock(f):
+                current = (await storage_io.run("stat", os.fstat, f.fileno())).st_size
+                if offset != current:
+                    raise UploadOffsetMismatch(current)
+
+                f.seek(current)
+                written = current
+                try:
+                    async for chunk in chunks:
+                        if not chunk:
+                            continue
+                        if written + len(chunk) > session.size:
+                            raise HTTPException(
+                                status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Dữ liệu vượt quá dung lượng đã khai báo của phiên upload",
+                            )
+                        await storage_io.run("write", f.write, chunk)
+                        written += len(chunk)
+                finally:
+                    # Mất kết nối giữa chừng: giữ phần đã ghi, client resume từ offset mới
+                    await storage_io.run("flush", f.flush)
+                return written
+        finally:
+            f.close()
+
+    async def discard(self, session: UploadSession) -> None:
+        """Xóa phiên upload (file .part và metadata)"""
+        storage_io = get_storage_io()
+        await storage_io.remove(self.part_path(session), missing_ok=True)
+        await storage_io.remove(self._meta_path(session.id), missing_ok=True)
+
+    def _purge_expired(self) -> int:
+        if not self.session_dir.exists():
+            return 0
+        now = time.time()
+        purged = 0
+        for meta_path in self.session_dir.glob("*.json"):
+            try:
+                expires_at = json.loads(meta_path.read_text(encoding="utf-8"))["expires_at"]
+            except (OSError, ValueError, KeyError):
+                continue
+            if expires_at < now:
+                (self.session_dir / f"{meta_path.stem}.part").unlink(missing_ok=True)
+                meta_path.unlink(missing_ok=True)
+                purged += 1
+        return purged
+
+    async def purge_expired(self) -> int:
+        """Dọn các phiên upload đã hết hạn"""
+        purged = await get_storage_io().run("purge", self._purge_expired)
+        if purged:
+            logger.info(f"Đã dọn {purged} phiên upload hết hạn")
+        return purged
+
+
+@lru_cache()
+def get_upload_sessions() -> UploadSessionStore:
+    settings = get_settings()
+    return UploadSessionStore(
+        os.path.join(os.getcwd(), settings.UPLOAD_DIR, ".sessions"),
+        ttl_seconds=settings.UPLOAD_SESSION_TTL_HOURS * 3600,
+    )
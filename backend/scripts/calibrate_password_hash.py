@@ -0,0 +1,91 @@
+"""
+Calibrate the bcrypt cost factor for this host.
+
+Benchmarks bcrypt hashing at increasing rounds and recommends the highest
+BCRYPT_ROUNDS whose median latency stays within --target-ms. Also measures
+throughput with PASSWORD_HASH_WORKERS threads, i.e. how many logins per
+second one worker process can verify at that cost.
+
+Set the recommended value as BCRYPT_ROUNDS. Existing hashes are upgraded
+(or downgraded) to the new cost the next time each user logs in.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from passlib.hash import bcrypt
+from app.core.config import get_settings
+
+PASSWORD = "calibration-password-123"
+
+
+def measure(rounds: int, samples: int) -> float:
+    """Median seconds per hash at the given rounds"""
+    handler = bcrypt.using(rounds=rounds)
+    timings = []
+    for _ in range(samples):
+        started_at = time.perf_counter()
+        handler.hash(PASSWORD)
+        timings.append(time.perf_counter() - started_at)
+    return statistics.median(timings)
+
+
+def measure_throughput(rounds: int, workers: int, duration: float) -> float:
+    """Hashes per second with `workers` threads (bcrypt releases the GIL)"""
+    handler = bcrypt.using(rounds=rounds)
+    hashed = handler.hash(PASSWORD)
+    deadline = time.perf_counter() + duration
+
+    def worker() -> int:
+        done = 0
+        while time.perf_counter() < deadline:
+            handler.verify(PASSWORD, hashed)
+            done += 1
+        return done
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        total = sum(executor.map(lambda _: worker(), range(workers)))
+    return total / (time.perf_counter() - started_at)
+
+
+def calibrate(args):
+    """Run calibration"""
+    settings = get_settings()
+    target = args.target_ms / 1000
+    print("Starting bcrypt calibration...")
+    print("=" * 50)
+    print(f"Target latency: {args.target_ms:.0f} ms, current BCRYPT_ROUNDS={settings.BCRYPT_ROUNDS}")
+
+    recommended = args.min_rounds
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        latency = measure(rounds, args.samples)
+        print(f"rounds={rounds:2d}: {latency * 1000:8.1f} ms")
+        if latency > target:
+            break
+        recommended = rounds
+
+    workers = settings.PASSWORD_HASH_WORKERS
+    throughput = measure_throughput(recommended, workers, args.duration)
+
+    print("=" * 50)
+    print(f"Recommended: BCRYPT_ROUNDS={recommended}")
+    print(f"Throughput with {workers} hash workers: {throughput:.1f} logins/s per process")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Calibrate bcrypt rounds to a target hashing latency")
+    parser.add_argument('--target-ms', type=float, default=250, help='Max acceptable latency per hash')
+    parser.add_argument('--samples', type=int, default=5, help='Hashes measured per rounds value')
+    parser.add_argument('--min-rounds', type=int, default=10, help='Lowest rounds considered')
+    parser.add_argument('--max-rounds', type=int, default=16, help='Highest rounds considered')
+    parser.add_argument('--duration', type=float, default=3, help='Seconds spent measuring throughput')
+
+    args = parser.parse_args()
+
+    calibrate(args)
@@ -0,0 +1,136 @@
+"""
+Migration script for content-hash deduplication of attachments.
+
+Run this script to add:
+- Table file_blobs (sha256 unique, file_path, file_size, ref_count)
+- Attachments: blob_id
+
+Use --backfill to hash existing attachment files and link them to blobs.
+With --remove-duplicates, attachments whose content already has a blob are
+pointed at that blob's file and their duplicate file is deleted.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import select, text, update
+from app.core.database import get_db
+from app.crud import crud_file_blob
+from app.models.attachment import Attachment
+from app.api.v1.uploads import hash_file
+import asyncio
+
+async def migrate_tables(db):
+    """Create file_blobs and migrate attachments table"""
+    await db.execute(text(
+        "CREATE TABLE IF NOT EXISTS file_blobs ("
+        " id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+        " sha256 VARCHAR(64) NOT NULL,"
+        " file_path VARCHAR(512) NOT NULL,"
+        " file_size BIGINT NOT NULL,"
+        " ref_count INT NOT NULL DEFAULT 0,"
+        " created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+        " UNIQUE KEY ix_file_blobs_sha256 (sha256)"
+        ")"
+    ))
+    print("Ensured file_blobs table exists.")
+
+    # Check if columns already exist
+    result = await db.execute(text(
+        "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+        "WHERE TABLE_NAME = 'attachments' AND TABLE_SCHEMA = DATABASE()"
+    ))
+    existing_columns = {row[0] for row in result.fetchall()}
+
+    migrations = []
+
+    # Add blob_id column
+    if 'blob_id' not in existing_columns:
+        migrations.append(text("ALTER TABLE attachments ADD COLUMN blob_id INT NULL COMMENT 'Deduplicated physical file'"))
+        migrations.append(text("CREATE INDEX ix_attachments_blob_id ON attachments (blob_id)"))
+        migrations.append(text(
+            "ALTER TABLE attachments ADD CONSTRAINT fk_attachments_blob_id "
+            "FOREIGN KEY (blob_id) REFERENCES file_blobs (id)"
+        ))
+        print("Adding blob_id column to attachments...")
+
+    # Execute migrations
+    for migration in migrations:
+        await db.execute(migration)
+
+    await db.commit()
+    print(f"Attachments table migrated with {len(migrations)} changes.")
+
+async def backfill(db, batch_size: int, remove_duplicates: bool):
+    """Link existing attachments to blobs"""
+    last_id = 0
+    linked = 0
+    removed = 0
+
+    while True:
+        result = await db.execute(
+            select(Attachment.id, Attachment.file_path, Attachment.file_size)
+            .where(Attachment.id > last_id, Attachment.blob_id.is_(None))
+            .order_by(Attachment.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+
+        duplicates = []
+        for attachment_id, file_path, file_size in rows:
+            full_path = os.path.join(os.getcwd(), file_path)
+            if not os.path.exists(full_path):
+                print(f"  Missing file for attachment {attachment_id}, skipped")
+                continue
+
+            sha256 = await asyncio.to_thread(hash_file, full_path)
+            blob, created = await crud_file_blob.acquire(db, sha256, file_path, file_size)
+            values = {"blob_id": blob.id}
+            if not created and blob.file_path != file_path and remove_duplicates:
+                values["file_path"] = blob.file_path
+                duplicates.append(full_path)
+            elif not created and blob.file_path != file_path:
+                # Keep the separate copy: the attachment still reads its own file_path
+                await crud_file_blob.release(db, int(blob.id))
+                continue
+
+            await db.execute(update(Attachment).where(Attachment.id == attachment_id).values(**values))
+            linked += 1
+
+        await db.commit()
+        # Only delete duplicates once nothing references them any more
+        for full_path in duplicates:
+            os.remove(full_path)
+        removed += len(duplicates)
+        last_id = rows[-1][0]
+        print(f"  Processed attachments up to id {last_id}...")
+
+    print(f"Attachments linked to blobs: {linked}, duplicate files removed: {removed}")
+
+async def migrate(run_backfill: bool, batch_size: int, remove_duplicates: bool):
+    """Run all migrations"""
+    print("Starting attachment dedup migration...")
+    print("=" * 50)
+
+    async for db in get_db():
+        await migrate_tables(db)
+        if run_backfill:
+            await backfill(db, batch_size, remove_duplicates)
+
+    print("=" * 50)
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add content-hash deduplication for attachments")
+    parser.add_argument('--backfill', action='store_true', help='Hash existing files and link them to blobs')
+    parser.add_argument('--batch-size', type=int, default=200, help='Attachments processed per transaction')
+    parser.add_argument('--remove-duplicates', action='store_true', help='Delete duplicate files found during backfill')
+
+    args = parser.parse_args()
+
+    asyncio.run(migrate(args.backfill, args.batch_size, args.remove_duplicates))
@@ -0,0 +1,114 @@
+"""
+Migration script for the image derivatives pipeline.
+
+Run this script to add:
+- Attachments: width, height
+
+Use --backfill to render thumb/card/full variants (and record dimensions)
+for images uploaded before the pipeline existed. Variants are otherwise
+created on first request with ?w=.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import select, text, update
+from app.core.database import get_db
+from app.models.attachment import Attachment
+from app.services.image_derivatives import IMAGE_FORMATS, get_image_derivatives
+import asyncio
+
+async def migrate_attachments(db):
+    """Migrate attachments table"""
+    # Check if columns already exist
+    result = await db.execute(text(
+        "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+        "WHERE TABLE_NAME = 'attachments' AND TABLE_SCHEMA = DATABASE()"
+    ))
+    existing_columns = {row[0] for row in result.fetchall()}
+
+    migrations = []
+
+    # Add width column
+    if 'width' not in existing_columns:
+        migrations.append(text("ALTER TABLE attachments ADD COLUMN width INT NULL COMMENT 'Image width (px)'"))
+        print("Adding width column to attachments...")
+
+    # Add height column
+    if 'height' not in existing_columns:
+        migrations.append(text("ALTER TABLE attachments ADD COLUMN height INT NULL COMMENT 'Image height (px)'"))
+        print("Adding height column to attachments...")
+
+    # Execute migrations
+    for migration in migrations:
+        await db.execute(migration)
+
+    await db.commit()
+    print(f"Attachments table migrated with {len(migrations)} changes.")
+
+async def backfill_variants(db, batch_size: int):
+    """Render variants for existing images"""
+    derivatives = get_image_derivatives()
+    last_id = 0
+    rendered = 0
+
+    while True:
+        result = await db.execute(
+            select(Attachment.id, Attachment.file_path, Attachment.content_type)
+            .where(
+                Attachment.id > last_id,
+                Attachment.width.is_(None),
+                Attachment.content_type.in_(list(IMAGE_FORMATS)),
+            )
+            .order_by(Attachment.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+
+        # Cả lô chạy song song trên process pool
+        infos = await asyncio.gather(*(
+            derivatives.generate(attachment_id, os.path.join(os.getcwd(), file_path), content_type)
+            for attachment_id, file_path, content_type in rows
+        ))
+        for (attachment_id, _, _), info in zip(rows, infos):
+            if info is not None:
+                await db.execute(
+                    update(Attachment)
+                    .where(Attachment.id == attachment_id)
+                    .values(width=info.width, height=info.height)
+                )
+                rendered += 1
+
+        await db.commit()
+        last_id = rows[-1][0]
+        print(f"  Processed attachments up to id {last_id}...")
+
+    derivatives.shutdown()
+    print(f"Images with variants rendered: {rendered}")
+
+async def migrate(backfill: bool, batch_size: int):
+    """Run all migrations"""
+    print("Starting attachment image migration...")
+    print("=" * 50)
+
+    async for db in get_db():
+        await migrate_attachments(db)
+        if backfill:
+            await backfill_variants(db, batch_size)
+
+    print("=" * 50)
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add image dimensions and render image variants")
+    parser.add_argument('--backfill', action='store_true', help='Render variants for existing images')
+    parser.add_argument('--batch-size', type=int, default=50, help='Images rendered per batch')
+
+    args = parser.parse_args()
+
+    asyncio.run(migrate(args.backfill, args.batch_size))
@@ -0,0 +1,188 @@
+"""
+Migration script to store posts.content compressed.
+
+The migration is split so it can run during a rolling deploy. Every running
+instance must first be on an app version that reads posts.content as either
+TEXT or LONGBLOB, compressed or not (CompressedText(compress=False), the model
+used while POST_CONTENT_COMPRESSION=false). Older instances read LONGBLOB rows
+as bytes and cannot decode compressed frames: stop them before step 1.
+
+Steps:
+1. --schema: change posts.content from TEXT to LONGBLOB (existing rows keep
+   their UTF-8 bytes). Add --train-dictionary to sample existing posts and save
+   a zlib dictionary into POST_CONTENT_DICTIONARY_DIR (run again later to
+   rotate dictionaries). The directory must be a volume shared by every
+   instance; running workers load new dictionaries on first use. MySQL rebuilds the table for this ALTER and blocks
+   writes to posts while it runs.
+2. Roll out POST_CONTENT_COMPRESSION=true; instances still on the old setting
+   keep reading compressed rows.
+3. --rewrite: compress the remaining rows in batches by id.
+
+Use --rollback to undo: set POST_CONTENT_COMPRESSION=false everywhere first,
+then every row is decompressed and the TEXT column restored.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from app.core.database import get_db
+from app.core.content_compression import FRAME_MAGIC, get_content_codec, is_compressed, train_dictionary
+import asyncio
+
+
+async def get_content_type(db) -> str:
+    """Current data type of posts.content"""
+    result = await db.execute(text(
+        "SELECT DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS "
+        "WHERE TABLE_NAME = 'posts' AND COLUMN_NAME = 'content' AND TABLE_SCHEMA = DATABASE()"
+    ))
+    return result.scalar_one().lower()
+
+
+async def train(db, sample_size: int):
+    """Train and save a dictionary from a sample of posts"""
+    codec = get_content_codec()
+    result = await db.execute(
+        text("SELECT content FROM posts ORDER BY id DESC LIMIT :limit"),
+        {"limit": sample_size}
+    )
+    samples = [codec.decompress(row[0]) for row in result.fetchall() if row[0]]
+    if not samples:
+        print("No posts to train on, skipping dictionary.")
+        return
+
+    dictionary = train_dictionary(samples)
+    dictionary_id = codec.save_dictionary(dictionary)
+    print(f"Saved dictionary {dictionary_id} ({len(dictionary)} bytes) trained on {len(samples)} posts")
+
+
+async def rewrite_rows(db, batch_size: int, sleep: float, compress: bool):
+    """Compress (or decompress) posts.content in batches"""
+    codec = get_content_codec()
+    last_id = 0
+    changed = 0
+
+    while True:
+        result = await db.execute(
+            text("SELECT id, content FROM posts WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": batch_size}
+        )
+        rows = result.fetchall()
+        if not rows:
+            break
+
+        for post_id, content in rows:
+            if isinstance(content, str):
+                content = content.encode("utf-8")
+            if compress == is_compressed(content):
+                continue
+            if compress:
+                value = codec.compress(content.decode("utf-8"))
+            else:
+                value = codec.decompress(content).encode("utf-8")
+            await db.execute(
+                text("UPDATE posts SET content = :content WHERE id = :id"),
+                {"content": value, "id": post_id}
+            )
+            changed += 1
+
+        await db.commit()
+        last_id = rows[-1][0]
+        print(f"  Processed posts up to id {last_id}...")
+        await asyncio.sleep(sleep)
+
+    print(f"Rows {'compressed' if compress else 'decompressed'}: {changed}")
+
+
+async def count_compressed(db) -> int:
+    """Rows of posts.content still stored as compressed frames"""
+    result = await db.execute(
+        text("SELECT COUNT(*) FROM posts WHERE LEFT(content, :size) = :magic"),
+        {"size": len(FRAME_MAGIC), "magic": FRAME_MAGIC}
+    )
+    return result.scalar_one()
+
+
+async def migrate_schema(train_dictionary_flag: bool, sample_size: int):
+    """Step 1: change the column type (running instances must already dual-read)"""
+    print("Migrating posts.content schema...")
+    print("=" * 50)
+
+    async for db in get_db():
+        if train_dictionary_flag:
+            await train(db, sample_size)
+
+        if await get_content_type(db) != "longblob":
+            print("Changing posts.content to LONGBLOB...")
+            await db.execute(text("ALTER TABLE posts MODIFY content LONGBLOB NOT NULL"))
+            await db.commit()
+        else:
+            print("posts.content is already LONGBLOB, skipping.")
+
+    print("=" * 50)
+    print("Schema step completed. Enable POST_CONTENT_COMPRESSION, then run --rewrite.")
+
+
+async def migrate_rows(batch_size: int, sleep: float):
+    """Step 3: compress existing rows"""
+    print("Compressing posts.content rows...")
+    print("=" * 50)
+
+    async for db in get_db():
+        if await get_content_type(db) != "longblob":
+            print("posts.content is not LONGBLOB yet: run --schema first.")
+            sys.exit(1)
+        await rewrite_rows(db, batch_size, sleep, compress=True)
+
+    print("=" * 50)
+    print("Migration completed successfully!")
+
+
+async def rollback(batch_size: int, sleep: float):
+    """Rollback all migrations"""
+    print("Rolling back migrations...")
+    print("=" * 50)
+
+    async for db in get_db():
+        await rewrite_rows(db, batch_size, sleep, compress=False)
+
+        remaining = await count_compressed(db)
+        if remaining:
+            # An instance still writes compressed frames: converting to TEXT now would corrupt them
+            print(f"{remaining} rows were compressed again during the rollback: "
+                  "disable POST_CONTENT_COMPRESSION everywhere and rerun --rollback.")
+            sys.exit(1)
+
+        if await get_content_type(db) == "longblob":
+            print("Changing posts.content back to TEXT...")
+            await db.execute(text(
+                "ALTER TABLE posts MODIFY content TEXT CHARACTER SET utf8mb4 NOT NULL"
+            ))
+            await db.commit()
+
+    print("=" * 50)
+    print("Rollback completed successfully!")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compress posts.content with a trained zlib dictionary")
+    parser.add_argument('--batch-size', type=int, default=500, help='Rows rewritten per transaction')
+    parser.add_argument('--sleep', type=float, default=0.1, help='Pause in seconds between batches')
+    parser.add_argument('--train-dictionary', action='store_true', help='Train a new dictionary (with --schema)')
+    parser.add_argument('--sample-size', type=int, default=2000, help='Posts sampled for dictionary training')
+    step = parser.add_mutually_exclusive_group(required=True)
+    step.add_argument('--schema', action='store_true', help='Step 1: change posts.content to LONGBLOB')
+    step.add_argument('--rewrite', action='store_true', help='Step 3: compress existing rows')
+    step.add_argument('--rollback', action='store_true', help='Rollback migrations')
+
+    args = parser.parse_args()
+
+    if args.rollback:
+        asyncio.run(rollback(args.batch_size, args.sleep))
+    elif args.schema:
+        asyncio.run(migrate_schema(args.train_dictionary, args.sample_size))
+    else:
+        asyncio.run(migrate_rows(args.batch_size, args.sleep))
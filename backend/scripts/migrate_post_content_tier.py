@@ -0,0 +1,51 @@
+"""
+Migration script to add hot/cold content tiering to posts.
+
+Run this script to add:
+- Posts: content_tier ('hot' | 'cold')
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from app.core.database import get_db
+import asyncio
+
+async def migrate_posts(db):
+    """Migrate posts table"""
+    # Check if columns already exist
+    result = await db.execute(text(
+        "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+        "WHERE TABLE_NAME = 'posts' AND TABLE_SCHEMA = DATABASE()"
+    ))
+    existing_columns = {row[0] for row in result.fetchall()}
+
+    migrations = []
+
+    # Add content_tier column
+    if 'content_tier' not in existing_columns:
+        migrations.append(text("ALTER TABLE posts ADD COLUMN content_tier VARCHAR(10) NOT NULL DEFAULT 'hot' COMMENT 'Content storage tier (hot, cold)'"))
+        print("Adding content_tier column to posts...")
+
+    # Execute migrations
+    for migration in migrations:
+        await db.execute(migration)
+
+    await db.commit()
+    print(f"Posts table migrated with {len(migrations)} changes.")
+
+async def migrate():
+    """Run all migrations"""
+    print("Starting post content tier migration...")
+    print("=" * 50)
+
+    async for db in get_db():
+        await migrate_posts(db)
+
+    print("=" * 50)
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,120 @@
+"""
+Migration script to move post content to the sharded, content-addressed layout.
+
+Moves every legacy `posts/{post_id}_{slug}.md` file into
+`posts/blobs/ab/cd/{sha256}.md` and writes the `posts/index/..../{post_id}` pointer.
+
+When a post id has several legacy files (renamed slugs), the file matching
+the post's current slug in the database is used, otherwise the newest one.
+
+Safe to run while the application is serving traffic:
+- Reads fall back to the legacy file until its pointer exists
+- Pointers written by the application after the migration started are kept
+- Work is throttled with --batch-size / --sleep
+
+Use --from-db to also create storage entries for posts that only exist in posts.content.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import select
+from app.core.database import get_db
+from app.services.post_storage import get_post_storage
+import asyncio
+
+
+async def migrate_legacy_files(batch_size: int, sleep: float):
+    """Move legacy flat files into blobs + index"""
+    from app.models.post import Post
+
+    storage = get_post_storage()
+    migrated = 0
+    skipped = 0
+    post_ids = sorted({post_id for post_id, _ in storage.iter_legacy_files()})
+
+    async for db in get_db():
+        for start in range(0, len(post_ids), batch_size):
+            batch = post_ids[start:start + batch_size]
+            result = await db.execute(select(Post.id, Post.slug).where(Post.id.in_(batch)))
+            slugs = dict(result.all())
+
+            for post_id in batch:
+                try:
+                    if await storage.migrate_legacy_file(post_id, slugs.get(post_id)):
+                        migrated += 1
+                    else:
+                        skipped += 1
+                except FileNotFoundError:
+                    # Application rewrote the post in the meantime
+                    skipped += 1
+
+            print(f"  Processed {start + len(batch)} posts...")
+            await asyncio.sleep(sleep)
+
+    print(f"Legacy files migrated: {migrated}, already indexed: {skipped}")
+
+
+async def backfill_from_db(batch_size: int, sleep: float):
+    """Create storage entries for posts that have no stored content yet"""
+    from app.models.post import Post
+
+    storage = get_post_storage()
+    created = 0
+    last_id = 0
+
+    async for db in get_db():
+        while True:
+            result = await db.execute(
+                select(Post.id, Post.slug, Post.content)
+                .where(Post.id > last_id)
+                .order_by(Post.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+
+            # Save the batch concurrently so group commit can share fsyncs across it
+            missing = [
+                (post_id, slug, content)
+                for post_id, slug, content in rows
+                if content and await storage.get_content_path(post_id, slug) is None
+            ]
+            await asyncio.gather(*(
+                storage.save_post_content(post_id, slug, content)
+                for post_id, slug, content in missing
+            ))
+            created += len(missing)
+            last_id = rows[-1][0]
+
+            print(f"  Scanned posts up to id {last_id}...")
+            await asyncio.sleep(sleep)
+
+    print(f"Storage entries created from posts.content: {created}")
+
+
+async def migrate(batch_size: int, sleep: float, from_db: bool):
+    """Run storage migration"""
+    print("Starting post storage migration...")
+    print("=" * 50)
+
+    await migrate_legacy_files(batch_size, sleep)
+    if from_db:
+        await backfill_from_db(batch_size, sleep)
+
+    print("=" * 50)
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrate post content to sharded content-addressed storage")
+    parser.add_argument('--batch-size', type=int, default=500, help='Files/rows processed between pauses')
+    parser.add_argument('--sleep', type=float, default=0.1, help='Pause in seconds between batches')
+    parser.add_argument('--from-db', action='store_true', help='Also backfill storage from posts.content')
+
+    args = parser.parse_args()
+
+    asyncio.run(migrate(args.batch_size, args.sleep, args.from_db))
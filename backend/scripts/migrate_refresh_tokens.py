@@ -0,0 +1,131 @@
+"""
+Migration script for the hashed refresh token store.
+
+Run this script to change:
+- Refresh tokens: replace the plaintext `token` column with `token_hash`
+  (sha256 of the token's jti claim), add `revoked_at`, and index
+  `expires_at` / `revoked_at` for batched purging
+- Add `rotated_at` so a token that was just rotated can be refreshed again
+  within REFRESH_TOKEN_REUSE_GRACE_SECONDS (concurrent tabs)
+
+Existing rows hold plaintext tokens that can no longer be looked up and are
+deleted; clients holding them have to log in again.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from app.core.database import get_db
+import asyncio
+
+async def migrate_tables(db):
+    """Migrate refresh_tokens table"""
+    result = await db.execute(text(
+        "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+        "WHERE TABLE_NAME = 'refresh_tokens' AND TABLE_SCHEMA = DATABASE()"
+    ))
+    existing_columns = {row[0] for row in result.fetchall()}
+
+    result = await db.execute(text(
+        "SELECT DISTINCT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS "
+        "WHERE TABLE_NAME = 'refresh_tokens' AND TABLE_SCHEMA = DATABASE()"
+    ))
+    existing_indexes = {row[0] for row in result.fetchall()}
+
+    migrations = []
+
+    # Replace plaintext token column
+    if 'token' in existing_columns:
+        migrations.append(text("DELETE FROM refresh_tokens"))
+        migrations.append(text("ALTER TABLE refresh_tokens DROP COLUMN token"))
+        print("Dropping plaintext token column from refresh_tokens...")
+
+    if 'token_hash' not in existing_columns:
+        migrations.append(text(
+            "ALTER TABLE refresh_tokens ADD COLUMN token_hash VARCHAR(64) NOT NULL "
+            "COMMENT 'sha256 of the jti claim'"
+        ))
+        migrations.append(text(
+            "CREATE UNIQUE INDEX ix_refresh_tokens_token_hash ON refresh_tokens (token_hash)"
+        ))
+        print("Adding token_hash column to refresh_tokens...")
+
+    if 'revoked_at' not in existing_columns:
+        migrations.append(text(
+            "ALTER TABLE refresh_tokens ADD COLUMN revoked_at DATETIME NULL "
+            "COMMENT 'When the token was rotated or logged out'"
+        ))
+        migrations.append(text(
+            "CREATE INDEX ix_refresh_tokens_revoked_at ON refresh_tokens (revoked_at)"
+        ))
+        print("Adding revoked_at column to refresh_tokens...")
+
+    if 'rotated_at' not in existing_columns:
+        migrations.append(text(
+            "ALTER TABLE refresh_tokens ADD COLUMN rotated_at DATETIME NULL "
+            "COMMENT 'When the token was rotated (reuse grace window)'"
+        ))
+        print("Adding rotated_at column to refresh_tokens...")
+
+    # Indexes for purge and per-user revocation
+    for column in ('expires_at', 'user_id'):
+        index_name = f"ix_refresh_tokens_{column}"
+        if index_name not in existing_indexes:
+            migrations.append(text(f"CREATE INDEX {index_name} ON refresh_tokens ({column})"))
+            print(f"Adding index on refresh_tokens.{column}...")
+
+    # Execute migrations
+    for migration in migrations:
+        await db.execute(migration)
+
+    await db.commit()
+    print(f"Refresh tokens table migrated with {len(migrations)} changes.")
+
+async def migrate():
+    """Run all migrations"""
+    print("Starting refresh token migration...")
+    print("=" * 50)
+
+    async for db in get_db():
+        await migrate_tables(db)
+
+    print("=" * 50)
+    print("Migration completed successfully!")
+
+async def rollback():
+    """Rollback all migrations"""
+    print("Rolling back migrations...")
+    print("=" * 50)
+
+    async for db in get_db():
+        await db.execute(text("DELETE FROM refresh_tokens"))
+        await db.execute(text("DROP INDEX ix_refresh_tokens_expires_at ON refresh_tokens"))
+        await db.execute(text("ALTER TABLE refresh_tokens DROP COLUMN rotated_at"))
+        await db.execute(text("ALTER TABLE refresh_tokens DROP COLUMN revoked_at"))
+        await db.execute(text("ALTER TABLE refresh_tokens DROP COLUMN token_hash"))
+        await db.execute(text(
+            "ALTER TABLE refresh_tokens ADD COLUMN token VARCHAR(500) NOT NULL"
+        ))
+        await db.execute(text(
+            "CREATE UNIQUE INDEX ix_refresh_tokens_token ON refresh_tokens (token)"
+        ))
+        await db.commit()
+        print("Restored plaintext token column on refresh_tokens.")
+
+    print("=" * 50)
+    print("Rollback completed successfully!")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Store refresh tokens as hashed identifiers")
+    parser.add_argument('--rollback', action='store_true', help='Rollback migrations')
+
+    args = parser.parse_args()
+
+    if args.rollback:
+        asyncio.run(rollback())
+    else:
+        asyncio.run(migrate())
@@ -0,0 +1,76 @@
+"""
+Migration script for per-user storage quota accounting.
+
+Run this script to add:
+- Table user_storage_usage (user_id, used_bytes, file_count, updated_at)
+- Index on used_bytes for the admin usage leaderboard
+
+The counters are then backfilled from attachments. Run it before deploying
+the new code or re-run scripts/reconcile_storage_usage.py afterwards to fix
+uploads that happened in between.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from app.core.database import get_db
+from scripts.reconcile_storage_usage import reconcile_all
+import asyncio
+
+async def migrate_tables(db):
+    """Create user_storage_usage table"""
+    await db.execute(text(
+        "CREATE TABLE IF NOT EXISTS user_storage_usage ("
+        " user_id INT NOT NULL PRIMARY KEY,"
+        " used_bytes BIGINT NOT NULL DEFAULT 0,"
+        " file_count INT NOT NULL DEFAULT 0,"
+        " updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,"
+        " KEY ix_user_storage_usage_used_bytes (used_bytes),"
+        " CONSTRAINT fk_user_storage_usage_user_id FOREIGN KEY (user_id)"
+        " REFERENCES users (id) ON DELETE CASCADE"
+        ")"
+    ))
+    await db.commit()
+    print("Ensured user_storage_usage table exists.")
+
+async def migrate(batch_size: int):
+    """Run all migrations"""
+    print("Starting storage usage migration...")
+    print("=" * 50)
+
+    async for db in get_db():
+        await migrate_tables(db)
+        corrected = await reconcile_all(db, batch_size, sleep=0)
+        print(f"Usage counters backfilled for {corrected} users")
+
+    print("=" * 50)
+    print("Migration completed successfully!")
+
+async def rollback():
+    """Rollback all migrations"""
+    print("Rolling back migrations...")
+    print("=" * 50)
+
+    async for db in get_db():
+        await db.execute(text("DROP TABLE IF EXISTS user_storage_usage"))
+        await db.commit()
+        print("Dropped user_storage_usage table.")
+
+    print("=" * 50)
+    print("Rollback completed successfully!")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add per-user storage usage counters")
+    parser.add_argument('--batch-size', type=int, default=500, help='Users backfilled per transaction')
+    parser.add_argument('--rollback', action='store_true', help='Rollback migrations')
+
+    args = parser.parse_args()
+
+    if args.rollback:
+        asyncio.run(rollback())
+    else:
+        asyncio.run(migrate(args.batch_size))
@@ -0,0 +1,80 @@
+"""
+Migration script for access token revocation.
+
+Run this script to add:
+- Users: token_version (bumped on rank change / deactivation; access tokens
+  carry it as the "ver" claim and are rejected once it no longer matches)
+
+Tokens issued before this migration have no "ver" claim and are treated as
+version 0, so existing sessions stay valid.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from app.core.database import get_db
+import asyncio
+
+async def migrate_tables(db):
+    """Migrate users table"""
+    result = await db.execute(text(
+        "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+        "WHERE TABLE_NAME = 'users' AND TABLE_SCHEMA = DATABASE()"
+    ))
+    existing_columns = {row[0] for row in result.fetchall()}
+
+    migrations = []
+
+    # Add token_version column
+    if 'token_version' not in existing_columns:
+        migrations.append(text(
+            "ALTER TABLE users ADD COLUMN token_version INT NOT NULL DEFAULT 0 "
+            "COMMENT 'Access token revocation counter'"
+        ))
+        print("Adding token_version column to users...")
+
+    # Execute migrations
+    for migration in migrations:
+        await db.execute(migration)
+
+    await db.commit()
+    print(f"Users table migrated with {len(migrations)} changes.")
+
+async def migrate():
+    """Run all migrations"""
+    print("Starting token version migration...")
+    print("=" * 50)
+
+    async for db in get_db():
+        await migrate_tables(db)
+
+    print("=" * 50)
+    print("Migration completed successfully!")
+
+async def rollback():
+    """Rollback all migrations"""
+    print("Rolling back migrations...")
+    print("=" * 50)
+
+    async for db in get_db():
+        await db.execute(text("ALTER TABLE users DROP COLUMN token_version"))
+        await db.commit()
+        print("Dropped token_version column from users.")
+
+    print("=" * 50)
+    print("Rollback completed successfully!")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add token_version to users for access token revocation")
+    parser.add_argument('--rollback', action='store_true', help='Rollback migrations')
+
+    args = parser.parse_args()
+
+    if args.rollback:
+        asyncio.run(rollback())
+    else:
+        asyncio.run(migrate())
@@ -0,0 +1,75 @@
+"""
+Purge expired and revoked refresh tokens.
+
+Deletes rows in small batches (one short transaction per batch, with a pause
+in between) so the job never holds long locks on refresh_tokens while users
+are logging in and refreshing. Revoked tokens are kept for
+REFRESH_TOKEN_REVOKED_RETENTION_HOURS so reuse of a rotated token is still
+detected for a while. Use --loop to run continuously.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from datetime import datetime, timedelta, timezone
+from app.core.config import get_settings
+from app.core.database import get_db
+from app.crud import crud_refresh_token
+import asyncio
+
+
+async def purge(args) -> int:
+    """Delete batches until nothing is left (or --max-batches is reached)"""
+    total = 0
+    batches = 0
+    revoked_before = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+        hours=args.retention_hours
+    )
+
+    async for db in get_db():
+        while args.max_batches is None or batches < args.max_batches:
+            deleted = await crud_refresh_token.purge_batch(db, revoked_before, args.batch_size)
+            await db.commit()
+            total += deleted
+            batches += 1
+            if deleted < args.batch_size:
+                break
+            await asyncio.sleep(args.sleep)
+
+    return total
+
+
+async def run(args):
+    """Run refresh token purge"""
+    print("Starting refresh token purge...")
+    print("=" * 50)
+
+    while True:
+        total = await purge(args)
+        print(f"Refresh tokens deleted: {total}")
+
+        if not args.loop:
+            break
+        await asyncio.sleep(args.interval)
+
+    print("=" * 50)
+    print("Refresh token purge finished!")
+
+if __name__ == "__main__":
+    import argparse
+
+    settings = get_settings()
+
+    parser = argparse.ArgumentParser(description="Delete expired and revoked refresh tokens in batches")
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per transaction')
+    parser.add_argument('--sleep', type=float, default=0.1, help='Pause in seconds between batches')
+    parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches')
+    parser.add_argument('--retention-hours', type=float, default=settings.REFRESH_TOKEN_REVOKED_RETENTION_HOURS,
+                        help='Keep revoked tokens this long for reuse detection')
+    parser.add_argument('--loop', action='store_true', help='Run continuously')
+    parser.add_argument('--interval', type=float, default=3600, help='Pause in seconds between runs with --loop')
+
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
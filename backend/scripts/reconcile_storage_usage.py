@@ -0,0 +1,64 @@
+"""
+Reconciliation job for per-user storage usage counters.
+
+user_storage_usage is updated in the same transaction as every attachment
+insert/delete, so it only drifts through writes that bypass crud_attachment
+(manual SQL, cascaded user deletes, restores). This job recomputes
+SUM(file_size) / COUNT(*) per user in batches of user ids and corrects
+counters that differ.
+
+Run periodically (e.g. nightly cron). Also used to backfill counters after
+scripts/migrate_storage_usage.py.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.core.database import get_db
+from app.crud import crud_storage_usage
+import asyncio
+
+
+async def reconcile_all(db, batch_size: int, sleep: float) -> int:
+    """Reconcile every user in batches, one transaction per batch"""
+    last_user_id = 0
+    corrected_total = 0
+
+    while True:
+        last, corrected = await crud_storage_usage.reconcile(db, last_user_id, batch_size)
+        if last is None:
+            break
+        await db.commit()
+
+        for user_id, old_bytes, new_bytes in corrected:
+            print(f"  User {user_id}: {old_bytes} -> {new_bytes} bytes")
+        corrected_total += len(corrected)
+        last_user_id = last
+        await asyncio.sleep(sleep)
+
+    return corrected_total
+
+
+async def run(batch_size: int, sleep: float):
+    """Run reconciliation"""
+    print("Starting storage usage reconciliation...")
+    print("=" * 50)
+
+    async for db in get_db():
+        corrected = await reconcile_all(db, batch_size, sleep)
+        print(f"Counters corrected: {corrected}")
+
+    print("=" * 50)
+    print("Reconciliation completed successfully!")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recompute per-user storage usage counters")
+    parser.add_argument('--batch-size', type=int, default=500, help='Users reconciled per transaction')
+    parser.add_argument('--sleep', type=float, default=0.05, help='Pause in seconds between batches')
+
+    args = parser.parse_args()
+
+    asyncio.run(run(args.batch_size, args.sleep))
@@ -0,0 +1,87 @@
+"""
+Garbage collector for unreferenced files in storage.
+
+Walks the storage tree shard by shard:
+- uploads/YYYY/MM/DD: files not referenced by attachments or file_blobs
+  (interrupted uploads, files left behind by failed requests)
+- variants/{attachment_id}: image variants of deleted attachments
+- posts/index: content pointers of deleted posts
+- posts/blobs, posts/cold: content blobs no index pointer refers to
+
+References are checked in batches per shard and progress is checkpointed
+after every shard, so the job can be stopped at any time and resumes where
+it left off. Only files older than --min-age-hours are considered.
+
+Orphans are moved to --quarantine-dir by default (purged after
+--quarantine-days); pass --delete to remove them directly. Use --loop to run
+continuously with a pause between passes.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from pathlib import Path
+from app.core.config import get_settings
+from app.core.database import get_db
+from app.services.post_storage import get_post_storage
+from app.services.storage_gc import StorageGC
+import asyncio
+
+
+async def run(args):
+    """Run garbage collection"""
+    settings = get_settings()
+    print("Starting storage GC...")
+    print("=" * 50)
+
+    while True:
+        async for db in get_db():
+            gc = StorageGC(
+                db,
+                upload_dir=Path(os.getcwd(), settings.UPLOAD_DIR),
+                upload_db_prefix=settings.UPLOAD_DIR,
+                variant_dir=Path(os.getcwd(), settings.UPLOAD_VARIANT_DIR),
+                post_storage=get_post_storage(),
+                checkpoint_path=Path(args.checkpoint),
+                quarantine_dir=None if args.delete else Path(args.quarantine_dir),
+                min_age_seconds=args.min_age_hours * 3600,
+                max_removals_per_second=args.rate,
+                batch_size=args.batch_size,
+                dry_run=args.dry_run,
+            )
+            completed = await gc.run(max_shards=args.max_shards, shard_sleep=args.shard_sleep)
+            purged = gc.purge_quarantine(args.quarantine_days)
+
+            print(f"Shards processed: {gc.stats['shards']}")
+            print(f"Orphans found: {gc.stats['orphans']}, removed: {gc.stats['removed']} ({gc.stats['bytes']} bytes)")
+            print(f"Quarantine days purged: {purged}")
+            print("Pass completed." if completed else "Stopped at checkpoint, run again to continue.")
+
+        if not args.loop:
+            break
+        await asyncio.sleep(args.interval)
+
+    print("=" * 50)
+    print("Storage GC finished!")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Remove unreferenced files from uploads and post storage")
+    parser.add_argument('--checkpoint', default='storage/gc_checkpoint.json', help='Checkpoint file for resuming')
+    parser.add_argument('--quarantine-dir', default='storage/quarantine', help='Where orphans are moved')
+    parser.add_argument('--quarantine-days', type=int, default=7, help='Days before quarantined files are purged')
+    parser.add_argument('--delete', action='store_true', help='Delete orphans instead of quarantining them')
+    parser.add_argument('--min-age-hours', type=float, default=24, help='Ignore files newer than this')
+    parser.add_argument('--rate', type=float, default=50, help='Max orphans removed per second (0 = unlimited)')
+    parser.add_argument('--batch-size', type=int, default=500, help='References checked per query')
+    parser.add_argument('--max-shards', type=int, default=None, help='Stop after this many shards')
+    parser.add_argument('--shard-sleep', type=float, default=0.05, help='Pause in seconds between shards')
+    parser.add_argument('--loop', action='store_true', help='Run continuously')
+    parser.add_argument('--interval', type=float, default=3600, help='Pause in seconds between runs with --loop')
+    parser.add_argument('--dry-run', action='store_true', help='Only report orphans')
+
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
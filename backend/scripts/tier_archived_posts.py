@@ -0,0 +1,45 @@
+"""
+Tiering job: move archived post content to the compressed cold tier.
+
+For every post with status 'archived' and content_tier 'hot':
+- Ensures the content exists in post storage
+- Compresses the blob into `posts/cold/ab/cd/{sha256}.md.gz` and removes the hot copy
+- Empties posts.content and sets content_tier = 'cold'
+
+The storage index pointer is kept, so reads through PostStorageService stay
+transparent. Content is moved back to the hot tier when a post leaves 'archived'.
+
+Run periodically (e.g. nightly cron). Safe to re-run after an interruption.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.core.database import get_db
+from app.services.content_tiering import demote_archived_posts
+import asyncio
+
+
+async def run(batch_size: int, limit: int | None):
+    """Run tiering job"""
+    print("Starting archived post tiering...")
+    print("=" * 50)
+
+    async for db in get_db():
+        demoted = await demote_archived_posts(db, batch_size=batch_size, limit=limit)
+        print(f"Posts moved to cold tier: {demoted}")
+
+    print("=" * 50)
+    print("Tiering completed successfully!")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Move archived post content to the compressed cold tier")
+    parser.add_argument('--batch-size', type=int, default=100, help='Posts processed per transaction')
+    parser.add_argument('--limit', type=int, default=None, help='Maximum posts to move in this run')
+
+    args = parser.parse_args()
+
+    asyncio.run(run(args.batch_size, args.limit))
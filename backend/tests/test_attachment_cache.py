@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import app.models  # noqa: F401 - đăng ký các bảng được tham chiếu bởi khóa ngoại
+from app.models.attachment import Attachment
+from app.services.attachment_cache import AttachmentMetaCache
+
+
+@pytest.fixture
+async def db():
+    """Create an in-memory database with one attachment"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Attachment.__table__.create)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add(Attachment(
+            id=1, filename="a.pdf", file_path="storage/uploads/a.pdf",
+            content_type="application/pdf", file_size=10, is_public=True, user_id=7,
+        ))
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+
+class TestAttachmentMetaCache:
+    """Test the per-worker attachment metadata cache"""
+
+    @pytest.mark.asyncio
+    async def test_repeated_lookups_skip_database(self, db):
+        """Test a cached entry is served after the row is gone"""
+        cache = AttachmentMetaCache(max_entries=10, ttl_seconds=60)
+        meta = await cache.get(db, 1)
+        await db.execute(delete(Attachment))
+
+        assert meta.file_path == "storage/uploads/a.pdf"
+        assert meta.user_id == 7
+        assert await cache.get(db, 1) == meta
+
+    @pytest.mark.asyncio
+    async def test_invalidate_reloads(self, db):
+        """Test an invalidated entry is read again from the database"""
+        cache = AttachmentMetaCache(max_entries=10, ttl_seconds=60)
+        await cache.get(db, 1)
+        await db.execute(delete(Attachment))
+        cache.invalidate(1)
+
+        assert await cache.get(db, 1) is None
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_reloads(self, db):
+        """Test entries older than the TTL are not served"""
+        cache = AttachmentMetaCache(max_entries=10, ttl_seconds=0)
+        assert await cache.get(db, 1) is not None
+        await db.execute(delete(Attachment))
+
+        assert await cache.get(db, 1) is None
+
+
+class TestDeleteAttachment:
+    """Test attachment deletion only touches files and caches after the commit"""
+
+    @pytest.mark.asyncio
+    async def test_cleanup_waits_for_commit(self, db, tmp_path, monkeypatch):
+        """Test a rolled back delete keeps the file and cache; a committed one removes them"""
+        import asyncio
+        from app.api.v1 import uploads
+        from app.models.storage_usage import UserStorageUsage
+        from app.services.principal_cache import Principal
+
+        monkeypatch.chdir(tmp_path)
+        file_path = tmp_path / "storage" / "uploads" / "a.pdf"
+        file_path.parent.mkdir(parents=True)
+        file_path.write_bytes(b"x")
+        cache = AttachmentMetaCache(max_entries=10, ttl_seconds=60)
+        monkeypatch.setattr(uploads, "get_attachment_cache", lambda: cache)
+        admin = Principal(id=7, email="a@example.com", rank=5, is_active=True)
+        await (await db.connection()).run_sync(UserStorageUsage.__table__.create)
+        await db.commit()
+
+        await cache.get(db, 1)
+        await uploads.delete_attachment(1, db=db, current_user=admin, csrf_token="x")
+        await db.rollback()
+        await asyncio.sleep(0.05)
+        assert file_path.exists()
+        assert len(cache._cache) == 1
+
+        await uploads.delete_attachment(1, db=db, current_user=admin, csrf_token="x")
+        await db.commit()
+        await asyncio.sleep(0.05)
+        assert not file_path.exists()
+        assert len(cache._cache) == 0
@@ -0,0 +1,118 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, insert, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.core.content_compression import ContentCodec, is_compressed, train_dictionary
+from app.models import types
+
+
+SAMPLE = "# Hướng dẫn\n\n## Cài đặt\n\nChạy lệnh `pip install aicmr` để cài đặt.\n"
+
+
+@pytest.fixture
+def codec(tmp_path):
+    """Create a codec with an empty dictionary directory"""
+    return ContentCodec(tmp_path / "dictionaries")
+
+
+class TestContentCodec:
+    """Test zlib + dictionary compression of post content"""
+
+    def test_round_trip_without_dictionary(self, codec):
+        """Test content round-trips before any dictionary is trained"""
+        data = codec.compress(SAMPLE)
+
+        assert is_compressed(data)
+        assert codec.decompress(data) == SAMPLE
+
+    def test_dictionary_improves_ratio(self, codec):
+        """Test a trained dictionary shrinks small posts"""
+        corpus = [SAMPLE.replace("aicmr", f"package-{i}") for i in range(50)]
+        plain = codec.compress(corpus[0])
+
+        dictionary_id = codec.save_dictionary(train_dictionary(corpus))
+        trained = codec.compress(corpus[0])
+
+        assert dictionary_id == 1
+        assert len(trained) < len(plain)
+        assert codec.decompress(trained) == corpus[0]
+        # Frames written before the dictionary existed still decode
+        assert codec.decompress(plain) == corpus[0]
+
+    def test_rotated_dictionary_keeps_old_frames(self, codec, tmp_path):
+        """Test frames are decoded with the dictionary they were written with"""
+        codec.save_dictionary(train_dictionary([SAMPLE, SAMPLE]))
+        old_frame = codec.compress(SAMPLE)
+        codec.save_dictionary(train_dictionary(["khác hoàn toàn " * 10] * 2))
+
+        reloaded = ContentCodec(tmp_path / "dictionaries")
+        assert reloaded.current_dictionary_id == 2
+        assert reloaded.decompress(old_frame) == SAMPLE
+
+    def test_dictionary_trained_elsewhere_is_reloaded(self, codec, tmp_path):
+        """Test a running codec picks up a dictionary saved by another process"""
+        assert codec.decompress(codec.compress(SAMPLE)) == SAMPLE
+
+        trainer = ContentCodec(tmp_path / "dictionaries")
+        trainer.save_dictionary(train_dictionary([SAMPLE, SAMPLE]))
+        frame = trainer.compress(SAMPLE)
+
+        assert codec.decompress(frame) == SAMPLE
+        # The next dictionary id is taken from disk, never overwriting the other process' file
+        assert codec.save_dictionary(train_dictionary([SAMPLE] * 3)) == 2
+        assert trainer.decompress(frame) == SAMPLE
+
+    def test_uncompressed_rows_pass_through(self, codec):
+        """Test rows not yet backfilled are returned as-is"""
+        assert codec.decompress(SAMPLE.encode("utf-8")) == SAMPLE
+
+
+class TestCompressedText:
+    """Test CompressedText column type"""
+
+    @pytest.mark.asyncio
+    async def test_column_round_trip(self, codec, monkeypatch):
+        """Test values are stored compressed and read back as str"""
+        monkeypatch.setattr(types, "get_content_codec", lambda: codec)
+        metadata = MetaData()
+        table = Table(
+            "docs", metadata,
+            Column("id", Integer, primary_key=True),
+            Column("content", types.CompressedText(), nullable=False),
+        )
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+
+        async with engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+            await conn.execute(insert(table).values(id=1, content=SAMPLE))
+            raw = (await conn.execute(text("SELECT content FROM docs"))).scalar_one()
+            value = (await conn.execute(select(table.c.content))).scalar_one()
+
+        await engine.dispose()
+        assert is_compressed(raw)
+        assert value == SAMPLE
+
+    @pytest.mark.asyncio
+    async def test_dual_read_before_compression_is_enabled(self, codec, monkeypatch):
+        """Test compress=False writes plain text but reads rows compressed by the migration"""
+        monkeypatch.setattr(types, "get_content_codec", lambda: codec)
+        metadata = MetaData()
+        table = Table(
+            "docs", metadata,
+            Column("id", Integer, primary_key=True),
+            Column("content", types.CompressedText(compress=False), nullable=False),
+        )
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+
+        async with engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+            await conn.execute(insert(table).values(id=1, content=SAMPLE))
+            await conn.execute(
+                text("INSERT INTO docs (id, content) VALUES (2, :content)"),
+                {"content": codec.compress(SAMPLE)},
+            )
+            raw = (await conn.execute(text("SELECT content FROM docs WHERE id = 1"))).scalar_one()
+            values = (await conn.execute(select(table.c.content).order_by(table.c.id))).scalars().all()
+
+        await engine.dispose()
+        assert raw == SAMPLE
+        assert values == [SAMPLE, SAMPLE]
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app.core.exceptions import FileBlobContention
+from app.crud import crud_file_blob
+from app.models.file_blob import FileBlob
+
+
+@pytest.fixture
+async def db():
+    """Create an in-memory database with the file_blobs table"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(FileBlob.__table__.create)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+class TestFileBlobRefCount:
+    """Test reference-counted deduplicated blobs"""
+
+    @pytest.mark.asyncio
+    async def test_duplicate_content_reuses_blob(self, db):
+        """Test the second acquire of a hash reuses the first file"""
+        first, created_first = await crud_file_blob.acquire(db, "a" * 64, "uploads/1.pdf", 10)
+        second, created_second = await crud_file_blob.acquire(db, "a" * 64, "uploads/2.pdf", 10)
+
+        assert created_first is True
+        assert created_second is False
+        assert second.id == first.id
+        assert second.file_path == "uploads/1.pdf"
+        assert second.ref_count == 2
+
+    @pytest.mark.asyncio
+    async def test_release_deletes_only_last_reference(self, db):
+        """Test the file path is returned only when the last reference goes"""
+        blob, _ = await crud_file_blob.acquire(db, "b" * 64, "uploads/1.pdf", 10)
+        await crud_file_blob.acquire(db, "b" * 64, "uploads/2.pdf", 10)
+
+        assert await crud_file_blob.release(db, blob.id) is None
+        assert await crud_file_blob.release(db, blob.id) == "uploads/1.pdf"
+        assert await crud_file_blob.get_by_sha256(db, "b" * 64) is None
+
+    @pytest.mark.asyncio
+    async def test_acquire_after_blob_deleted(self, db):
+        """Test content can be stored again once its blob is gone"""
+        blob, _ = await crud_file_blob.acquire(db, "c" * 64, "uploads/1.pdf", 10)
+        await crud_file_blob.release(db, blob.id)
+
+        again, created = await crud_file_blob.acquire(db, "c" * 64, "uploads/3.pdf", 10)
+
+        assert created is True
+        assert again.file_path == "uploads/3.pdf"
+
+    @pytest.mark.asyncio
+    async def test_concurrent_acquire_same_content(self, tmp_path):
+        """Test two concurrent uploads of the same content share one blob"""
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'blobs.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(FileBlob.__table__.create)
+
+        async def upload(path: str):
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                blob, created = await crud_file_blob.acquire(session, "d" * 64, path, 10)
+                await asyncio.sleep(0.01)
+                await session.commit()
+                return blob.id, created
+
+        results = await asyncio.wait_for(
+            asyncio.gather(upload("uploads/1.pdf"), upload("uploads/2.pdf")), timeout=10
+        )
+
+        assert results[0][0] == results[1][0]
+        assert sorted(created for _, created in results) == [False, True]
+        async with AsyncSession(engine) as session:
+            blob = await crud_file_blob.get_by_sha256(session, "d" * 64)
+            assert blob.ref_count == 2
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_acquire_gives_up_after_retries(self, db, monkeypatch):
+        """Test acquire raises 503 instead of looping when the row stays invisible"""
+        await crud_file_blob.acquire(db, "e" * 64, "uploads/1.pdf", 10)
+
+        async def invisible(db, sha256):
+            return None
+
+        monkeypatch.setattr(crud_file_blob, "_get_for_update", invisible)
+        with pytest.raises(FileBlobContention) as exc_info:
+            await crud_file_blob.acquire(db, "e" * 64, "uploads/2.pdf", 10)
+        assert exc_info.value.status_code == 503
@@ -0,0 +1,81 @@
+import pytest
+from PIL import Image
+from app.services.image_derivatives import ImageDerivativeService, VARIANTS, render_variants
+
+
+def make_jpeg(path, size=(2000, 1000), orientation=None):
+    """Write a JPEG with GPS-like EXIF data"""
+    image = Image.new("RGB", size, (200, 30, 30))
+    exif = Image.Exif()
+    exif[0x010F] = "Camera Maker"
+    if orientation:
+        exif[0x0112] = orientation
+    image.save(path, "JPEG", exif=exif.tobytes())
+    return path
+
+
+class TestRenderVariants:
+    """Test variant rendering in the worker function"""
+
+    def test_variants_are_resized_and_stripped(self, tmp_path):
+        """Test each variant fits its width and carries no EXIF"""
+        source = make_jpeg(tmp_path / "photo.jpg")
+
+        assert render_variants(str(source), str(tmp_path / "out"), "JPEG", ".jpg") == (2000, 1000)
+
+        for name, max_width in VARIANTS.items():
+            with Image.open(tmp_path / "out" / f"{name}.jpg") as variant:
+                assert variant.width == max_width
+                assert variant.height == max_width // 2
+                assert "exif" not in variant.info
+
+    def test_small_image_is_not_upscaled(self, tmp_path):
+        """Test variants never exceed the original size"""
+        source = tmp_path / "small.png"
+        Image.new("RGBA", (100, 50)).save(source, "PNG")
+
+        render_variants(str(source), str(tmp_path / "out"), "PNG", ".png")
+
+        with Image.open(tmp_path / "out" / "full.png") as variant:
+            assert variant.size == (100, 50)
+
+    def test_exif_orientation_is_applied(self, tmp_path):
+        """Test rotated photos are stored upright"""
+        source = make_jpeg(tmp_path / "rotated.jpg", size=(400, 200), orientation=6)
+
+        assert render_variants(str(source), str(tmp_path / "out"), "JPEG", ".jpg") == (200, 400)
+
+
+class TestImageDerivativeService:
+    """Test process-pool variant service"""
+
+    def test_variant_for_width(self):
+        """Test smallest sufficient variant is chosen"""
+        assert ImageDerivativeService.variant_for_width(100) == "thumb"
+        assert ImageDerivativeService.variant_for_width(321) == "card"
+        assert ImageDerivativeService.variant_for_width(5000) == "full"
+
+    @pytest.mark.asyncio
+    async def test_generate_in_process_pool(self, tmp_path):
+        """Test generation runs in the pool and writes cached variants"""
+        service = ImageDerivativeService(tmp_path / "variants", max_workers=1)
+        source = make_jpeg(tmp_path / "photo.jpg")
+        try:
+            info = await service.generate(7, str(source), "image/jpeg")
+        finally:
+            service.shutdown()
+
+        assert info == (2000, 1000)
+        assert service.get_variant_path(7, "thumb", "image/jpeg").exists()
+
+    @pytest.mark.asyncio
+    async def test_unsupported_or_broken_files(self, tmp_path):
+        """Test non-images are skipped and unreadable images return None"""
+        service = ImageDerivativeService(tmp_path / "variants", max_workers=1)
+        broken = tmp_path / "broken.jpg"
+        broken.write_bytes(b"not an image")
+        try:
+            assert await service.generate(1, str(broken), "application/pdf") is None
+            assert await service.generate(2, str(broken), "image/jpeg") is None
+        finally:
+            service.shutdown()
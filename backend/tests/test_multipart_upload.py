@@ -0,0 +1,70 @@
+import pytest
+from fastapi import HTTPException
+from app.services.multipart_upload import MultipartFileReader
+
+
+BOUNDARY = "testboundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def build_body(*parts):
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += (
+            f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n"
+            "Content-Type: application/pdf\r\n\r\n"
+        ).encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+async def stream(body, size):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+class TestMultipartFileReader:
+    """Test direct-to-disk multipart parsing"""
+
+    @pytest.mark.asyncio
+    async def test_file_part_is_streamed(self):
+        """Test file data is returned in pieces, skipping other fields"""
+        data = b"%PDF-1.4\n" + bytes(range(256)) * 200
+        body = build_body(("note", None, b"hello"), ("file", "a.pdf", data))
+        reader = MultipartFileReader(CONTENT_TYPE, stream(body, 1000))
+
+        await reader.open()
+        chunks = [chunk async for chunk in reader.chunks()]
+
+        assert reader.filename == "a.pdf"
+        assert reader.content_type == "application/pdf"
+        assert len(chunks) > 1
+        assert b"".join(chunks) == data
+
+    @pytest.mark.asyncio
+    async def test_missing_file_field(self):
+        """Test a body without the file field is rejected"""
+        reader = MultipartFileReader(CONTENT_TYPE, stream(build_body(("other", "a.pdf", b"x")), 64))
+
+        with pytest.raises(HTTPException) as exc:
+            await reader.open()
+
+        assert exc.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_truncated_body(self):
+        """Test a body cut off mid-file is rejected"""
+        body = build_body(("file", "a.pdf", b"x" * 5000))[:3000]
+        reader = MultipartFileReader(CONTENT_TYPE, stream(body, 512))
+        await reader.open()
+
+        with pytest.raises(HTTPException):
+            async for _ in reader.chunks():
+                pass
+
+    def test_rejects_non_multipart(self):
+        """Test other content types are rejected"""
+        with pytest.raises(HTTPException):
+            MultipartFileReader("application/json", stream(b"{}", 2))
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import pytest
+from passlib.hash import bcrypt
+from app.core.config import get_settings
+from app.core.exceptions import PasswordHashOverloaded
+from app.core.password_hasher import PasswordHasher
+
+
+@pytest.fixture
+def hasher():
+    pool = PasswordHasher(max_workers=1, max_queue=1)
+    yield pool
+    pool.shutdown()
+
+
+class TestPasswordHasher:
+    """Test bcrypt offloading and admission control"""
+
+    @pytest.mark.asyncio
+    async def test_hash_and_verify(self, hasher):
+        """Test hashing runs on the pool and verifies"""
+        hashed = await hasher.hash("s3cret-password")
+        assert await hasher.verify("s3cret-password", hashed)
+        assert not await hasher.verify("wrong-password", hashed)
+
+    @pytest.mark.asyncio
+    async def test_verify_and_update_rehashes_outdated_cost(self, hasher):
+        """Test hashes with other bcrypt rounds are rehashed at BCRYPT_ROUNDS"""
+        old_hash = bcrypt.using(rounds=4).hash("s3cret-password")
+        assert await hasher.verify_and_update("wrong-password", old_hash) == (False, None)
+
+        verified, new_hash = await hasher.verify_and_update("s3cret-password", old_hash)
+        assert verified
+        assert bcrypt.from_string(new_hash).rounds == get_settings().BCRYPT_ROUNDS
+        assert await hasher.verify_and_update("s3cret-password", new_hash) == (True, None)
+
+    @pytest.mark.asyncio
+    async def test_sheds_load_when_queue_is_full(self, hasher):
+        """Test requests beyond workers + queue are rejected with 503"""
+        release = threading.Event()
+        running = [asyncio.ensure_future(hasher._run("verify", release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(PasswordHashOverloaded) as exc_info:
+            await hasher._run("verify", release.wait)
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.headers == {"Retry-After": "1"}
+
+        release.set()
+        await asyncio.gather(*running)
+        assert await hasher._run("verify", lambda: True)
@@ -0,0 +1,399 @@
+import asyncio
+import os
+from pathlib import Path
+import pytest
+from app.services.durable_writer import DurableWriter
+from app.services.post_storage import PostStorageService
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Create a post storage rooted in a temporary directory"""
+    return PostStorageService(
+        storage_dir=tmp_path / "posts",
+        writer=DurableWriter(mode="group", group_window_ms=1),
+    )
+
+
+class TestPostStorage:
+    """Test sharded, content-addressed post storage"""
+
+    @pytest.mark.asyncio
+    async def test_save_and_read(self, storage):
+        """Test content round-trips through blob + index"""
+        blob_path = await storage.save_post_content(1, "hello", "# Hello")
+
+        assert blob_path.name == f"{storage.content_hash('# Hello')}.md"
+        assert blob_path.parent.parent.parent == storage.blob_dir
+        assert await storage.read_post_content(1, "hello") == "# Hello"
+
+    @pytest.mark.asyncio
+    async def test_identical_content_stored_once(self, storage):
+        """Test identical content shares one blob"""
+        first = await storage.save_post_content(1, "a", "same body")
+        second = await storage.save_post_content(2, "b", "same body")
+
+        assert first == second
+        assert len(list(storage.blob_dir.rglob("*.md"))) == 1
+
+    @pytest.mark.asyncio
+    async def test_slug_rename_keeps_content(self, storage):
+        """Test content is keyed by post id, not slug"""
+        await storage.save_post_content(1, "old-slug", "body")
+
+        assert await storage.read_post_content(1, "new-slug") == "body"
+
+    @pytest.mark.asyncio
+    async def test_file_calls_use_storage_io_pool(self, storage, monkeypatch):
+        """Test save/read/delete never touch the filesystem on the event loop"""
+        import threading
+
+        loop_thread = threading.get_ident()
+        on_loop: list = []
+        for name in ("exists", "stat", "unlink", "read_text", "touch"):
+            original = getattr(type(storage.storage_dir), name)
+
+            def guarded(self, *args, _original=original, _name=name, **kwargs):
+                if threading.get_ident() == loop_thread:
+                    on_loop.append(_name)
+                return _original(self, *args, **kwargs)
+
+            monkeypatch.setattr(type(storage.storage_dir), name, guarded)
+
+        await storage.save_post_content(1, "a", "body")
+        await storage.save_post_content(2, "b", "body")
+        assert await storage.read_post_content(1, "a") == "body"
+        assert await storage.get_content_file(1, "a") is not None
+        await storage.delete_post_content(1, "a")
+        assert on_loop == []
+
+    @pytest.mark.asyncio
+    async def test_delete_removes_index(self, storage):
+        """Test delete removes the pointer"""
+        await storage.save_post_content(1, "a", "body")
+
+        assert await storage.delete_post_content(1, "a") is True
+        assert await storage.read_post_content(1, "a") is None
+        assert await storage.delete_post_content(1, "a") is False
+
+    @pytest.mark.asyncio
+    async def test_legacy_fallback_and_migration(self, storage):
+        """Test legacy flat files are readable and migrate online"""
+        legacy = storage.storage_dir / "7_legacy-post.md"
+        legacy.write_text("legacy body", encoding="utf-8")
+
+        assert await storage.read_post_content(7, "legacy-post") == "legacy body"
+
+        files = list(storage.iter_legacy_files())
+        assert files == [(7, legacy)]
+
+        assert await storage.migrate_legacy_file(7, "legacy-post") is True
+        assert not legacy.exists()
+        assert await storage.read_post_content(7, "legacy-post") == "legacy body"
+
+    @pytest.mark.asyncio
+    async def test_migration_keeps_newer_index(self, storage):
+        """Test migration does not overwrite content saved after it started"""
+        legacy = storage.storage_dir / "3_post.md"
+        legacy.write_text("stale", encoding="utf-8")
+        await storage._write_index(3, storage.content_hash("fresh"))
+        await storage._write_blob(storage.content_hash("fresh"), "fresh")
+
+        assert await storage.migrate_legacy_file(3, "post") is False
+        assert await storage.read_post_content(3, "post") == "fresh"
+        assert not legacy.exists()
+
+    @pytest.mark.asyncio
+    async def test_migration_prefers_current_slug(self, storage):
+        """Test an orphaned file from an old slug is not indexed over the current one"""
+        current = storage.storage_dir / "5_new-slug.md"
+        current.write_text("current", encoding="utf-8")
+        orphan = storage.storage_dir / "5_old-slug.md"
+        orphan.write_text("stale", encoding="utf-8")
+        os.utime(orphan, ns=(current.stat().st_mtime_ns + 10**9,) * 2)
+
+        assert await storage.migrate_legacy_file(5, "new-slug") is True
+        assert await storage.read_post_content(5, "new-slug") == "current"
+        assert not orphan.exists() and not current.exists()
+
+    @pytest.mark.asyncio
+    async def test_reused_blob_deleted_by_gc_is_rewritten(self, storage):
+        """Test a blob removed between saves is written again, never recreated empty"""
+        blob_path = await storage.save_post_content(1, "a", "body")
+        blob_path.unlink()
+
+        await storage.save_post_content(2, "b", "body")
+        assert blob_path.read_text(encoding="utf-8") == "body"
+
+
+class TestPostContentCache:
+    """Test LRU content cache in front of storage reads"""
+
+    @pytest.mark.asyncio
+    async def test_repeated_reads_hit_cache(self, storage):
+        """Test second read is served from the cache"""
+        await storage.save_post_content(1, "a", "body")
+        storage._cache.clear()
+
+        assert await storage.read_post_content(1, "a") == "body"
+        assert await storage.read_post_content(1, "a") == "body"
+        assert storage._cache.hits == 1
+        assert storage._cache.misses == 1
+
+    @pytest.mark.asyncio
+    async def test_external_change_invalidates_entry(self, storage):
+        """Test entries are revalidated against the pointer file"""
+        await storage.save_post_content(1, "a", "old")
+        assert await storage.read_post_content(1, "a") == "old"
+
+        # Another worker rewrites the pointer behind this process' back
+        other = PostStorageService(storage_dir=storage.storage_dir, cache_max_bytes=0)
+        await other.save_post_content(1, "a", "new body")
+
+        assert await storage.read_post_content(1, "a") == "new body"
+
+    @pytest.mark.asyncio
+    async def test_byte_size_eviction(self, tmp_path):
+        """Test cache stays within its byte budget"""
+        storage = PostStorageService(storage_dir=tmp_path / "posts", cache_max_bytes=4096)
+        for post_id in range(20):
+            await storage.save_post_content(post_id, "p", "x" * 500 + str(post_id))
+
+        assert storage._cache.current_bytes <= 4096
+        assert len(storage._cache) < 20
+        assert await storage.read_post_content(0, "p") == "x" * 500 + "0"
+
+
+class TestColdTier:
+    """Test hot/cold tiering of post content"""
+
+    @pytest.mark.asyncio
+    async def test_demote_keeps_reads_transparent(self, storage):
+        """Test demoted content is compressed and still readable"""
+        blob_path = await storage.save_post_content(1, "a", "archived body")
+
+        assert await storage.demote_post_content(1, "a") is True
+        assert not blob_path.exists()
+
+        content_file = await storage.get_content_file(1, "a")
+        assert content_file.gzipped is True
+        assert content_file.path.parent.parent.parent == storage.cold_dir
+
+        storage._cache.clear()
+        assert await storage.read_post_content(1, "a") == "archived body"
+
+    @pytest.mark.asyncio
+    async def test_promote_restores_hot_blob(self, storage):
+        """Test promoted content moves back to the hot tier"""
+        blob_path = await storage.save_post_content(1, "a", "archived body")
+        await storage.demote_post_content(1, "a")
+
+        assert await storage.promote_post_content(1, "a") == "archived body"
+        assert blob_path.exists()
+        assert not list(storage.cold_dir.rglob("*.gz"))
+
+    @pytest.mark.asyncio
+    async def test_demote_without_content(self, storage):
+        """Test demoting a post without stored content is a no-op"""
+        assert await storage.demote_post_content(99, "missing") is False
+
+
+class TestDurableWriter:
+    """Test crash-safe atomic writes"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode", ["none", "fsync", "group"])
+    async def test_write_replaces_atomically(self, tmp_path, mode):
+        """Test writes land on the final path and leave no temp files"""
+        writer = DurableWriter(mode=mode, group_window_ms=1)
+        target = tmp_path / "post.md"
+        target.write_text("old", encoding="utf-8")
+
+        await writer.write_text(target, "new")
+
+        assert target.read_text(encoding="utf-8") == "new"
+        assert [p.name for p in tmp_path.iterdir()] == ["post.md"]
+
+    @pytest.mark.asyncio
+    async def test_group_commit_batches_concurrent_writes(self, tmp_path, monkeypatch):
+        """Test concurrent writes share one commit batch"""
+        batches = []
+        original = DurableWriter._commit_batch
+
+        async def record_batch(batch):
+            batches.append(len(batch))
+            return await original(batch)
+
+        monkeypatch.setattr(DurableWriter, "_commit_batch", staticmethod(record_batch))
+        writer = DurableWriter(mode="group", group_window_ms=50)
+
+        await asyncio.gather(*(
+            writer.write_text(tmp_path / f"{i}.md", str(i)) for i in range(20)
+        ))
+
+        assert batches == [20]
+        assert (tmp_path / "7.md").read_text(encoding="utf-8") == "7"
+
+    @pytest.mark.asyncio
+    async def test_group_commit_syncs_only_batch_directories(self, tmp_path, monkeypatch):
+        """Test a batch fsyncs its own files in one pass and each parent directory once"""
+        from app.services import durable_writer
+
+        synced_dirs = []
+        monkeypatch.setattr(durable_writer, "_fsync_dir", synced_dirs.append)
+        monkeypatch.setattr(os, "sync", lambda: pytest.fail("group commit must not flush the filesystem"))
+        fsynced = []
+        original_fsync_file = durable_writer._fsync_file
+        monkeypatch.setattr(
+            durable_writer, "_fsync_file", lambda path: fsynced.append(path) or original_fsync_file(path)
+        )
+        writer = DurableWriter(mode="group", group_window_ms=50)
+        (tmp_path / "a").mkdir()
+        (tmp_path / "b").mkdir()
+
+        await asyncio.gather(*(
+            writer.write_text(tmp_path / ("a" if i % 2 else "b") / f"{i}.md", str(i)) for i in range(6)
+        ))
+
+        assert len(fsynced) == 6 and all(path.name.endswith(".tmp") for path in fsynced)
+        assert sorted(synced_dirs) == [tmp_path / "a", tmp_path / "b"]
+
+    @pytest.mark.asyncio
+    async def test_batch_reports_each_file(self, tmp_path, monkeypatch):
+        """Test one failing rename only fails its own write"""
+        original_replace = os.replace
+
+        def replace(src, dst):
+            if Path(dst).name == "bad.md":
+                raise OSError("read-only")
+            original_replace(src, dst)
+
+        monkeypatch.setattr(os, "replace", replace)
+        writer = DurableWriter(mode="group", group_window_ms=50)
+
+        results = await asyncio.gather(
+            writer.write_text(tmp_path / "good.md", "good"),
+            writer.write_text(tmp_path / "bad.md", "bad"),
+            return_exceptions=True,
+        )
+
+        assert results[0] is None and isinstance(results[1], OSError)
+        assert [p.name for p in tmp_path.iterdir()] == ["good.md"]
+
+    def test_invalid_durability_setting_rejected(self):
+        """Test a mistyped POST_STORAGE_DURABILITY fails at startup instead of falling back"""
+        from pydantic import ValidationError
+        from app.core.config import Settings
+
+        with pytest.raises(ValidationError):
+            Settings(POST_STORAGE_DURABILITY="gruop")
+        assert Settings(POST_STORAGE_DURABILITY=" FSYNC ").POST_STORAGE_DURABILITY == "fsync"
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_keeps_old_content(self, tmp_path, monkeypatch):
+        """Test a failing commit surfaces the error and leaves the old file intact"""
+        async def fail_batch(batch):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(DurableWriter, "_commit_batch", staticmethod(fail_batch))
+        writer = DurableWriter(mode="group", group_window_ms=1)
+        target = tmp_path / "post.md"
+        target.write_text("old", encoding="utf-8")
+
+        with pytest.raises(OSError):
+            await writer.write_text(target, "new")
+
+        assert target.read_text(encoding="utf-8") == "old"
+        assert [p.name for p in tmp_path.iterdir()] == ["post.md"]
+
+
+class TestPostStorageSync:
+    """Test the API keeps the storage copy in step with committed posts.content"""
+
+    @staticmethod
+    def make_post(post_id: int, slug: str, content: str):
+        from types import SimpleNamespace
+
+        async def load():
+            return content
+
+        return SimpleNamespace(id=post_id, slug=slug, awaitable_attrs=SimpleNamespace(content=load()))
+
+    @pytest.fixture
+    async def db(self):
+        from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with AsyncSession(engine) as session:
+            yield session
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_write_waits_for_commit(self, storage, db, monkeypatch):
+        """Test a rolled back update never reaches storage and a committed one does"""
+        from sqlalchemy import text
+        from app.api.v1 import posts
+
+        monkeypatch.setattr(posts, "get_post_storage", lambda: storage)
+        await storage.save_post_content(1, "a", "old")
+
+        await db.execute(text("SELECT 1"))
+        await posts._sync_post_storage(db, self.make_post(1, "a", "rolled back"))
+        await db.rollback()
+        await asyncio.sleep(0.05)
+        assert await storage.read_post_content(1, "a") == "old"
+
+        await db.execute(text("SELECT 1"))
+        await posts._sync_post_storage(db, self.make_post(1, "a", "new"))
+        assert await storage.read_post_content(1, "a") == "old"
+        await db.commit()
+        await asyncio.sleep(0.05)
+        assert await storage.read_post_content(1, "a") == "new"
+
+    @pytest.mark.asyncio
+    async def test_failed_write_drops_stale_copy(self, storage, db, monkeypatch):
+        """Test a failed storage write removes the index so reads fall back to posts.content"""
+        from sqlalchemy import text
+        from app.api.v1 import posts
+
+        monkeypatch.setattr(posts, "get_post_storage", lambda: storage)
+        await storage.save_post_content(1, "a", "old")
+
+        async def fail(*args):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(storage, "save_post_content", fail)
+        await db.execute(text("SELECT 1"))
+        await posts._sync_post_storage(db, self.make_post(1, "a", "new"))
+        await db.commit()
+        await asyncio.sleep(0.05)
+        assert await storage.read_post_content(1, "a") is None
+
+
+class TestUnarchiveRestore:
+    """Test post updates bring cold-tier content back when the post leaves archived"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("update, current, restored", [
+        ({"status": "published"}, "archived", True),
+        ({"title": "t"}, "published", True),
+        ({"title": "t"}, "archived", False),
+        ({"status": "archived"}, "published", False),
+        ({"status": "published", "content": "new"}, "archived", False),
+    ])
+    async def test_restore_on_update(self, monkeypatch, update, current, restored):
+        """Test restore runs whenever the updated post is no longer archived"""
+        from types import SimpleNamespace
+        from app.api.v1 import posts
+        from app.schemas.post import PostUpdate
+
+        calls = []
+
+        async def restore(db, post):
+            calls.append(post)
+
+        monkeypatch.setattr(posts, "restore_post_content", restore)
+        post = SimpleNamespace(status=current)
+        await posts._restore_unarchived_content(None, post, PostUpdate(**update))
+
+        assert calls == ([post] if restored else [])
@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app.models.user import User
+from app.services.principal_cache import Principal, PrincipalCache
+
+
+@pytest.fixture
+async def engine():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(User.__table__.create)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def db(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add(User(id=1, email="a@example.com", username="a", hashed_password="x", rank=3))
+        await session.commit()
+        yield session
+
+
+def record_statements(engine) -> list:
+    statements: list = []
+    event.listen(
+        engine.sync_engine, "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    return statements
+
+
+class TestPrincipalCache:
+    """Test the principal cache used by authentication dependencies"""
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_skips_database(self, engine, db):
+        """Test repeated lookups are served from the in-process LRU"""
+        cache = PrincipalCache(redis=None, max_entries=10, local_ttl_seconds=60, ttl_seconds=60)
+        statements = record_statements(engine)
+
+        assert await cache.get(db, 1) == Principal(1, "a@example.com", 3, True)
+        assert await cache.get(db, 1) == Principal(1, "a@example.com", 3, True)
+        assert len(statements) == 1
+        assert await cache.get(db, 2) is None
+
+    @pytest.mark.asyncio
+    async def test_invalidate_reloads_changes(self, db):
+        """Test rank and deactivation changes are visible after invalidate"""
+        cache = PrincipalCache(redis=None, max_entries=10, local_ttl_seconds=60, ttl_seconds=60)
+        await cache.get(db, 1)
+
+        await db.execute(update(User).where(User.id == 1).values(rank=1, is_active=False))
+        await db.commit()
+        assert (await cache.get(db, 1)).rank == 3
+
+        await cache.invalidate(1)
+        principal = await cache.get(db, 1)
+        assert (principal.rank, principal.is_active) == (1, False)
+
+
+    @pytest.mark.asyncio
+    async def test_invalidate_runs_after_commit(self, tmp_path, monkeypatch):
+        """Test a stale principal cached by a concurrent request before commit is evicted"""
+        from fastapi_cache import FastAPICache
+        from fastapi_cache.backends.inmemory import InMemoryBackend
+        from app.crud import crud_user
+
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(User.__table__.create)
+        FastAPICache.init(InMemoryBackend())
+        principals = PrincipalCache(redis=None, max_entries=10, local_ttl_seconds=60, ttl_seconds=0)
+        monkeypatch.setattr(crud_user, "get_principal_cache", lambda: principals)
+
+        async with AsyncSession(engine, expire_on_commit=False) as writer, AsyncSession(engine) as reader:
+            writer.add(User(id=1, email="a@example.com", username="a", hashed_password="x", rank=3))
+            await writer.commit()
+
+            user = await writer.get(User, 1)
+            await crud_user.update(writer, user, {"rank": 1})
+            # Concurrent request before the commit still sees and caches the old row
+            assert (await principals.get(reader, 1)).rank == 3
+            await reader.rollback()
+
+            await writer.commit()
+            await asyncio.sleep(0)
+            assert (await principals.get(reader, 1)).rank == 1
+        await engine.dispose()
+
+
+class TestClaimsOnlyPrincipal:
+    """Test claims-only authorization with token version revocation"""
+
+    @pytest.mark.asyncio
+    async def test_token_claims_and_revocation(self, engine, db, monkeypatch):
+        """Test matching "ver" claims authorize without reading users, bumps revoke"""
+        from fastapi import HTTPException
+        from fastapi_cache import FastAPICache
+        from fastapi_cache.backends.inmemory import InMemoryBackend
+        from app.api import deps
+        from app.crud import crud_user
+        from app.schemas.token import TokenPayload
+        from app.services.token_versions import TokenVersionCache
+
+        FastAPICache.init(InMemoryBackend())
+        versions = TokenVersionCache(redis=None, max_entries=10, local_ttl_seconds=60, ttl_seconds=0)
+        principals = PrincipalCache(redis=None, max_entries=10, local_ttl_seconds=60, ttl_seconds=0)
+        monkeypatch.setattr(deps, "get_token_versions", lambda: versions)
+        monkeypatch.setattr(crud_user, "get_token_versions", lambda: versions)
+        monkeypatch.setattr(crud_user, "get_principal_cache", lambda: principals)
+
+        claims = TokenPayload(sub=1, email="a@example.com", rank=3, ver=0)
+        assert await deps.get_token_principal(db, claims) == Principal(1, "a@example.com", 3, True)
+
+        statements = record_statements(engine)
+        assert await deps.get_token_principal(db, claims) == Principal(1, "a@example.com", 3, True)
+        assert statements == []
+
+        user = await db.get(User, 1)
+        await crud_user.update(db, user, {"is_active": False})
+        assert user.token_version == 1
+        await db.commit()
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as exc_info:
+            await deps.get_token_principal(db, claims)
+        assert exc_info.value.detail == "Token has been revoked"
+
+    @pytest.mark.asyncio
+    async def test_version_invalidated_after_commit(self, tmp_path, monkeypatch):
+        """Test a stale token_version cached by a concurrent request before commit is evicted"""
+        from fastapi import HTTPException
+        from fastapi_cache import FastAPICache
+        from fastapi_cache.backends.inmemory import InMemoryBackend
+        from app.api import deps
+        from app.crud import crud_user
+        from app.schemas.token import TokenPayload
+        from app.services.token_versions import TokenVersionCache
+
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(User.__table__.create)
+        FastAPICache.init(InMemoryBackend())
+        versions = TokenVersionCache(redis=None, max_entries=10, local_ttl_seconds=60, ttl_seconds=0)
+        monkeypatch.setattr(deps, "get_token_versions", lambda: versions)
+        monkeypatch.setattr(crud_user, "get_token_versions", lambda: versions)
+        claims = TokenPayload(sub=1, email="a@example.com", rank=3, ver=0)
+
+        async with AsyncSession(engine, expire_on_commit=False) as writer, AsyncSession(engine) as reader:
+            writer.add(User(id=1, email="a@example.com", username="a", hashed_password="x", rank=3))
+            await writer.commit()
+
+            user = await writer.get(User, 1)
+            await crud_user.update(writer, user, {"is_active": False})
+            # Concurrent request before the commit still passes and caches version 0
+            await deps.get_token_principal(reader, claims)
+            await reader.rollback()
+
+            await writer.commit()
+            await asyncio.sleep(0)
+            with pytest.raises(HTTPException) as exc_info:
+                await deps.get_token_principal(reader, claims)
+            assert exc_info.value.detail == "Token has been revoked"
+        await engine.dispose()
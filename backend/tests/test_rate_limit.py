@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+from redis.exceptions import RedisError
+
+from app.core.exceptions import RateLimited
+from app.core.rate_limit import HybridRateLimiter, parse_limit
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands: list = []
+
+    def incrby(self, key, amount):
+        self.commands.append(("incrby", key, amount))
+
+    def expire(self, key, seconds):
+        self.commands.append(("expire", key, seconds))
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        if self.redis.fail:
+            raise RedisError("down")
+        results = []
+        for op, key, value in self.commands:
+            if op == "incrby":
+                self.redis.counts[key] = self.redis.counts.get(key, 0) + value
+                results.append(self.redis.counts[key])
+            else:
+                results.append(True)
+        return results
+
+
+class FakeRedis:
+    def __init__(self, fail=False):
+        self.counts: dict = {}
+        self.fail = fail
+        self.round_trips = 0
+        self.reads = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def mget(self, keys):
+        self.reads += 1
+        if self.fail:
+            raise RedisError("down")
+        return [self.counts.get(key) for key in keys]
+
+
+def make_limiter(redis=None):
+    return HybridRateLimiter(redis=redis, max_keys=100, sync_interval=3600, sync_timeout=1)
+
+
+class TestHybridRateLimiter:
+    """Test local token buckets and batched reconciliation with Redis"""
+
+    def test_parse_limit(self):
+        assert parse_limit("20/minute") == (20, 60)
+        assert parse_limit("5/hours") == (5, 3600)
+
+    def test_local_bucket(self):
+        """Test a worker enforces the limit per key without Redis"""
+        limiter = make_limiter()
+        for _ in range(3):
+            limiter.hit("login", "ip:1.2.3.4", "3/minute")
+        with pytest.raises(RateLimited) as exc:
+            limiter.hit("login", "ip:1.2.3.4", "3/minute")
+        assert exc.value.status_code == 429
+        assert int(exc.value.headers["Retry-After"]) >= 1
+
+        limiter.hit("login", "ip:5.6.7.8", "3/minute")
+        limiter.hit("login", "user:1", "3/minute")
+
+    @pytest.mark.asyncio
+    async def test_sync_shares_usage_between_workers(self):
+        """Test usage is flushed in one pipeline and counted against other workers"""
+        redis = FakeRedis()
+        worker_a, worker_b = make_limiter(redis), make_limiter(redis)
+
+        worker_a.hit("login", "ip:1.2.3.4", "3/minute")
+        worker_a.hit("login", "ip:1.2.3.4", "3/minute")
+        worker_a.hit("register", "ip:1.2.3.4", "3/minute")
+        await worker_a.sync()
+        assert redis.round_trips == 1
+
+        worker_b.hit("login", "ip:1.2.3.4", "3/minute")
+        await worker_b.sync()
+        with pytest.raises(RateLimited):
+            worker_b.hit("login", "ip:1.2.3.4", "3/minute")
+
+    @pytest.mark.asyncio
+    async def test_fails_open_to_local_buckets(self):
+        """Test Redis errors keep the local limit and retry pending usage later"""
+        redis = FakeRedis(fail=True)
+        limiter = make_limiter(redis)
+
+        limiter.hit("login", "ip:1.2.3.4", "2/minute")
+        await limiter.sync()
+        limiter.hit("login", "ip:1.2.3.4", "2/minute")
+        with pytest.raises(RateLimited):
+            limiter.hit("login", "ip:1.2.3.4", "2/minute")
+
+        redis.fail = False
+        await limiter.sync()
+        assert list(redis.counts.values()) == [2]
+
+    @pytest.mark.asyncio
+    async def test_new_key_reads_cluster_usage(self):
+        """Test a worker seeing a key for the first time starts from the Redis count"""
+        redis = FakeRedis()
+        worker_a, worker_b = make_limiter(redis), make_limiter(redis)
+
+        for _ in range(3):
+            worker_a.hit("login", "ip:1.2.3.4", "4/minute")
+        await worker_a.sync()
+
+        worker_b.hit("login", "ip:1.2.3.4", "4/minute")
+        await worker_b._seed_task
+        with pytest.raises(RateLimited):
+            worker_b.hit("login", "ip:1.2.3.4", "4/minute")
+
+    @pytest.mark.asyncio
+    async def test_background_sync_flushes_idle_worker(self):
+        """Test the background task pushes pending usage without further hits"""
+        redis = FakeRedis()
+        limiter = HybridRateLimiter(redis=redis, max_keys=100, sync_interval=0.01, sync_timeout=1)
+        limiter.start()
+        try:
+            limiter.hit("login", "ip:1.2.3.4", "5/minute")
+            await asyncio.sleep(0.05)
+            assert list(redis.counts.values()) == [1]
+        finally:
+            await limiter.stop()
+        assert limiter._sync_task is None
+
+
+class TestClientIp:
+    """Test client IP resolution behind the nginx proxy"""
+
+    @staticmethod
+    def request(peer: str, headers: dict):
+        from starlette.requests import Request
+
+        return Request({
+            "type": "http",
+            "client": (peer, 1234),
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        })
+
+    def test_forwarded_headers_only_from_trusted_proxy(self, monkeypatch):
+        """Test X-Forwarded-For/X-Real-IP are honoured only when the peer is a trusted proxy"""
+        import ipaddress
+        from app.core import rate_limit
+
+        monkeypatch.setattr(rate_limit, "_trusted_proxies", [ipaddress.ip_network("172.16.0.0/12")])
+        headers = {"X-Forwarded-For": "6.6.6.6, 1.2.3.4", "X-Real-IP": "1.2.3.4"}
+
+        assert rate_limit.get_client_ip(self.request("172.18.0.5", headers)) == "1.2.3.4"
+        assert rate_limit.get_client_ip(self.request("172.18.0.5", {"X-Real-IP": "1.2.3.4"})) == "1.2.3.4"
+        # Direct clients cannot spoof their address with headers
+        assert rate_limit.get_client_ip(self.request("8.8.8.8", headers)) == "8.8.8.8"
@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import app.models  # noqa: F401
+from app.core.bloom import BloomFilter
+from app.core.security import verify_refresh_token
+from app.crud import crud_refresh_token
+from app.models.refresh_token import RefreshToken
+from app.models.user import User
+from app.services.refresh_tokens import RefreshTokenService, hash_token_id
+
+
+@pytest.fixture
+async def engine():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(User.__table__.create)
+        await conn.run_sync(RefreshToken.__table__.create)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def db(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add(User(id=1, email="a@example.com", username="alice", hashed_password="x"))
+        await session.commit()
+        yield session
+
+
+@pytest.fixture
+def service():
+    return RefreshTokenService(
+        expire_days=7, filter_capacity=1000, filter_error_rate=0.01, filter_rebuild_seconds=300
+    )
+
+
+async def active_tokens(db) -> int:
+    result = await db.execute(select(RefreshToken).where(RefreshToken.revoked.is_(False)))
+    return len(result.scalars().all())
+
+
+class TestBloomFilter:
+    """Test the in-process Bloom filter"""
+
+    def test_membership(self):
+        """Test added keys are always found and most others are not"""
+        bloom = BloomFilter.from_keys((f"key-{i}" for i in range(1000)), capacity=1000)
+        assert all(f"key-{i}" in bloom for i in range(1000))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        assert false_positives < 300
+
+
+class TestRefreshTokenService:
+    """Test refresh token rotation, reuse detection and purging"""
+
+    @pytest.mark.asyncio
+    async def test_rotate_revokes_old_token(self, db, service):
+        """Test rotation issues a new token and stores only hashes"""
+        token = await service.issue(db, 1)
+        user_id, new_token = await service.rotate(db, token)
+
+        assert user_id == 1 and new_token != token
+        stored = (await db.execute(select(RefreshToken.token_hash))).scalars().all()
+        assert len(stored) == 2 and token not in stored and new_token not in stored
+        assert await active_tokens(db) == 1
+
+        user_id, _ = await service.rotate(db, new_token)
+        assert user_id == 1
+
+    @pytest.mark.asyncio
+    async def test_valid_token_skips_lookup(self, engine, db, service):
+        """Test a token missing from the filter is rotated without a SELECT"""
+        token = await service.issue(db, 1)
+        await service.rotate(db, await service.issue(db, 1))
+
+        statements: list = []
+        event.listen(
+            engine.sync_engine, "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+        await service.rotate(db, token)
+        assert not any(s.lstrip().upper().startswith("SELECT") for s in statements)
+
+    @pytest.mark.asyncio
+    async def test_filter_false_positive_keeps_valid_token(self, db, service):
+        """Test a live token that hits the filter is checked in the DB and still rotated"""
+        token = await service.issue(db, 1)
+        await service._refresh_filter(db)
+        service._revoked.add(hash_token_id(verify_refresh_token(token).jti))
+
+        user_id, new_token = await service.rotate(db, token)
+        assert user_id == 1 and new_token != token
+        assert await active_tokens(db) == 1
+
+    @pytest.mark.asyncio
+    async def test_reuse_revokes_all_tokens(self, db, service):
+        """Test presenting a rotated token revokes every session of the user"""
+        token = await service.issue(db, 1)
+        await service.issue(db, 1)
+        _, new_token = await service.rotate(db, token)
+
+        with pytest.raises(HTTPException) as exc:
+            await service.rotate(db, token)
+        assert exc.value.status_code == 401
+        assert await active_tokens(db) == 0
+
+        # Reuse detected by another worker (filter built before the rotation)
+        other = RefreshTokenService(
+            expire_days=7, filter_capacity=1000, filter_error_rate=0.01, filter_rebuild_seconds=300
+        )
+        with pytest.raises(HTTPException):
+            await other.rotate(db, new_token)
+
+    @pytest.mark.asyncio
+    async def test_purge_batch(self, db, service):
+        """Test purge removes expired and old revoked rows in batches"""
+        now = datetime.utcnow()
+        for i in range(5):
+            await crud_refresh_token.create(db, 1, f"expired-{i}", now - timedelta(days=1))
+        old = await crud_refresh_token.create(db, 1, "revoked", now + timedelta(days=1))
+        old.revoked, old.revoked_at = True, now - timedelta(days=2)
+        await crud_refresh_token.create(db, 1, "recent", now + timedelta(days=1))
+        await crud_refresh_token.revoke(db, "recent")
+        await service.issue(db, 1)
+        await db.commit()
+
+        revoked_before = now - timedelta(days=1)
+        assert await crud_refresh_token.purge_batch(db, revoked_before, batch_size=4) == 4
+        assert await crud_refresh_token.purge_batch(db, revoked_before, batch_size=4) == 2
+        assert await crud_refresh_token.purge_batch(db, revoked_before, batch_size=4) == 0
+        assert len((await db.execute(select(RefreshToken))).scalars().all()) == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_refresh_within_grace_window(self, db):
+        """Test a just-rotated token can be refreshed again without revoking the family"""
+        service = RefreshTokenService(
+            expire_days=7, filter_capacity=1000, filter_error_rate=0.01,
+            filter_rebuild_seconds=300, reuse_grace_seconds=10,
+        )
+        token = await service.issue(db, 1)
+        _, first = await service.rotate(db, token)
+        user_id, second = await service.rotate(db, token)
+
+        assert user_id == 1 and second != first
+        assert await active_tokens(db) == 2
+
+        # A token revoked by logout gets no grace
+        await service.revoke(db, second)
+        with pytest.raises(HTTPException):
+            await service.rotate(db, second)
+        assert await active_tokens(db) == 0
+
+
+class TestRefreshTokenAsAccessToken:
+    """Test refresh tokens are not accepted as Bearer access tokens"""
+
+    @pytest.mark.asyncio
+    async def test_protected_endpoint_rejects_refresh_token(self):
+        """Test a refresh JWT (which carries sub) is rejected with 401"""
+        from httpx import AsyncClient
+        from app.core.database import get_db
+        from app.core.security import create_refresh_token
+        from app.main import app
+
+        async def no_db():
+            yield None
+
+        app.dependency_overrides[get_db] = no_db
+        try:
+            token = create_refresh_token({"sub": "1", "jti": "abc"})
+            async with AsyncClient(app=app, base_url="http://test") as ac:
+                response = await ac.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token}"})
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+        assert response.status_code == 401
@@ -0,0 +1,76 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.session import LazySession, LazySessionMiddleware
+
+
+def create_app():
+    app = FastAPI()
+    app.add_middleware(LazySessionMiddleware, secret_key="test-secret", session_cookie="aicmr_session")
+
+    @app.get("/public")
+    async def public():
+        return {"ok": True}
+
+    @app.get("/token")
+    async def token(request: Request):
+        if "csrf_token" not in request.session:
+            request.session["csrf_token"] = "abc"
+        return {"csrf_token": request.session["csrf_token"]}
+
+    @app.get("/clear")
+    async def clear(request: Request):
+        request.session.clear()
+        return {}
+
+    return app
+
+
+class TestLazySessionMiddleware:
+    """Test the session cookie is only decoded by routes that use it"""
+
+    def test_public_route_skips_cookie(self, monkeypatch):
+        """Test routes that never touch request.session do not unsign or re-sign the cookie"""
+        client = TestClient(create_app())
+        response = client.get("/token")
+        assert "aicmr_session" in response.cookies
+
+        unsigned: list = []
+        original = LazySessionMiddleware._unsign
+        monkeypatch.setattr(
+            LazySessionMiddleware, "_unsign", lambda self, cookie: unsigned.append(cookie) or original(self, cookie)
+        )
+
+        response = client.get("/public")
+        assert response.status_code == 200
+        assert "set-cookie" not in response.headers
+        assert "vary" not in response.headers
+        assert unsigned == []
+
+        response = client.get("/token")
+        assert response.json() == {"csrf_token": "abc"}
+        assert len(unsigned) == 1
+        # Session read but not modified: cookie is not re-signed
+        assert "set-cookie" not in response.headers
+
+    def test_invalid_and_cleared_session(self):
+        """Test a tampered cookie starts a new session and clear() expires the cookie"""
+        client = TestClient(create_app())
+        client.cookies.set("aicmr_session", "tampered")
+        response = client.get("/token")
+        assert response.json() == {"csrf_token": "abc"}
+        assert response.cookies["aicmr_session"] != "tampered"
+
+        response = client.get("/clear")
+        assert "aicmr_session=null" in response.headers["set-cookie"]
+
+    def test_tracks_access_and_modification(self):
+        """Test reads only mark the session accessed and writes also mark it modified"""
+        session = LazySession(lambda: {"csrf_token": "abc"})
+        assert not session.accessed and not session.loaded
+
+        assert session.get("csrf_token") == "abc"
+        assert session.accessed and not session.modified
+
+        session["csrf_token"] = "def"
+        assert session.modified
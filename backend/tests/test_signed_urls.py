@@ -0,0 +1,42 @@
+import pytest
+from app.core.signed_urls import EXPIRY_STEP_SECONDS, UrlSigner, parse_keys
+
+
+NOW = 1_700_000_000
+
+
+class TestUrlSigner:
+    """Test HMAC-signed expiring file URLs"""
+
+    def test_sign_and_verify(self):
+        """Test a fresh signature verifies only for its attachment"""
+        signer = UrlSigner({"k1": b"secret"}, ttl_seconds=3600)
+        params = signer.sign(42, now=NOW)
+
+        assert int(params["exp"]) % EXPIRY_STEP_SECONDS == 0
+        assert signer.verify(42, int(params["exp"]), params["kid"], params["sig"], now=NOW)
+        assert not signer.verify(43, int(params["exp"]), params["kid"], params["sig"], now=NOW)
+        assert not signer.verify(42, int(params["exp"]) + 1, params["kid"], params["sig"], now=NOW)
+
+    def test_expired_signature(self):
+        """Test signatures are rejected after their expiry"""
+        signer = UrlSigner({"k1": b"secret"}, ttl_seconds=60)
+        params = signer.sign(1, now=NOW)
+
+        assert not signer.verify(1, int(params["exp"]), params["kid"], params["sig"], now=NOW + 3600)
+
+    def test_key_rotation(self):
+        """Test URLs signed with a retired-but-listed key still verify"""
+        old = UrlSigner({"k1": b"old"}, ttl_seconds=3600)
+        params = old.sign(1, now=NOW)
+        rotated = UrlSigner(parse_keys("k2:new,k1:old"), ttl_seconds=3600)
+        removed = UrlSigner(parse_keys("k2:new"), ttl_seconds=3600)
+
+        assert rotated.sign(1, now=NOW)["kid"] == "k2"
+        assert rotated.verify(1, int(params["exp"]), "k1", params["sig"], now=NOW)
+        assert not removed.verify(1, int(params["exp"]), "k1", params["sig"], now=NOW)
+
+    def test_parse_keys_rejects_malformed(self):
+        """Test key entries must be kid:secret"""
+        with pytest.raises(ValueError):
+            parse_keys("no-secret")
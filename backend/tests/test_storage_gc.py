@@ -0,0 +1,116 @@
+import json
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import app.models  # noqa: F401 - đăng ký các bảng được tham chiếu bởi khóa ngoại
+from app.models.attachment import Attachment
+from app.models.file_blob import FileBlob
+from app.models.post import Post
+from app.services.durable_writer import DurableWriter
+from app.services.post_storage import PostStorageService
+from app.services.storage_gc import StorageGC
+
+
+@pytest.fixture
+async def db():
+    """Create an in-memory database with the tables the GC checks"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        for model in (FileBlob, Attachment, Post):
+            await conn.run_sync(model.__table__.create)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return PostStorageService(
+        storage_dir=tmp_path / "uploads" / "posts",
+        writer=DurableWriter(mode="none"),
+        cache_max_bytes=0,
+    )
+
+
+def make_gc(db, tmp_path, storage, **kwargs):
+    return StorageGC(
+        db,
+        upload_dir=tmp_path / "uploads",
+        upload_db_prefix="storage/uploads",
+        variant_dir=tmp_path / "variants",
+        post_storage=storage,
+        checkpoint_path=tmp_path / "gc.json",
+        min_age_seconds=0,
+        max_removals_per_second=0,
+        **kwargs,
+    )
+
+
+class TestStorageGC:
+    """Test the incremental orphan file collector"""
+
+    @pytest.mark.asyncio
+    async def test_removes_only_unreferenced_uploads(self, db, tmp_path, storage):
+        """Test referenced uploads stay and orphans are quarantined"""
+        shard = tmp_path / "uploads" / "2024" / "01" / "02"
+        shard.mkdir(parents=True)
+        (shard / "kept.pdf").write_bytes(b"a")
+        (shard / "orphan.pdf").write_bytes(b"b")
+        (tmp_path / "uploads" / ".sessions").mkdir()
+        (tmp_path / "uploads" / ".sessions" / "x.part").write_bytes(b"c")
+        db.add(Attachment(
+            filename="kept.pdf", file_path="storage/uploads/2024/01/02/kept.pdf",
+            content_type="application/pdf", file_size=1, is_public=True, user_id=1,
+        ))
+        await db.commit()
+
+        gc = make_gc(db, tmp_path, storage, quarantine_dir=tmp_path / "quarantine")
+        assert await gc.run() is True
+
+        assert (shard / "kept.pdf").exists()
+        assert not (shard / "orphan.pdf").exists()
+        assert list((tmp_path / "quarantine").rglob("orphan.pdf"))
+        assert (tmp_path / "uploads" / ".sessions" / "x.part").exists()
+
+    @pytest.mark.asyncio
+    async def test_post_index_and_blobs(self, db, tmp_path, storage):
+        """Test pointers of deleted posts and their blobs are removed"""
+        db.add(Post(id=1, title="t", slug="kept", content="kept body", author_id=1))
+        await db.commit()
+        kept_blob = await storage.save_post_content(1, "kept", "kept body")
+        orphan_blob = await storage.save_post_content(2, "gone", "gone body")
+
+        await make_gc(db, tmp_path, storage).run()
+
+        assert await storage.read_post_content(1, "kept") == "kept body"
+        assert kept_blob.exists()
+        assert not orphan_blob.exists()
+        assert not storage._get_index_path(2).exists()
+
+    @pytest.mark.asyncio
+    async def test_resumes_from_checkpoint(self, db, tmp_path, storage):
+        """Test a limited run stops at a checkpoint and continues later"""
+        for day in ("01", "02", "03"):
+            shard = tmp_path / "uploads" / "2024" / "01" / day
+            shard.mkdir(parents=True)
+            (shard / "orphan.pdf").write_bytes(b"x")
+
+        gc = make_gc(db, tmp_path, storage)
+        assert await gc.run(max_shards=2) is False
+        assert json.loads((tmp_path / "gc.json").read_text())["after"] == "2024/01/02"
+        assert (tmp_path / "uploads" / "2024" / "01" / "03" / "orphan.pdf").exists()
+
+        assert await make_gc(db, tmp_path, storage).run() is True
+        assert not (tmp_path / "uploads" / "2024" / "01" / "03" / "orphan.pdf").exists()
+
+    @pytest.mark.asyncio
+    async def test_recent_files_are_kept(self, db, tmp_path, storage):
+        """Test files newer than the minimum age are ignored"""
+        shard = tmp_path / "uploads" / "2024" / "01" / "02"
+        shard.mkdir(parents=True)
+        (shard / "in-flight.pdf").write_bytes(b"x")
+
+        gc = make_gc(db, tmp_path, storage)
+        gc.min_age_seconds = 3600
+        await gc.run()
+
+        assert (shard / "in-flight.pdf").exists()
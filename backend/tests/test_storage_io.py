@@ -0,0 +1,69 @@
+import threading
+import pytest
+from prometheus_client import REGISTRY
+from app.core.storage_io import StorageIOExecutor
+
+
+@pytest.fixture
+def storage_io():
+    executor = StorageIOExecutor(max_workers=2)
+    yield executor
+    executor.shutdown()
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestStorageIOExecutor:
+    """Test the dedicated storage I/O thread pool"""
+
+    @pytest.mark.asyncio
+    async def test_runs_on_dedicated_pool_and_records_metrics(self, storage_io):
+        """Test calls run on storage-io threads and latency is recorded per op"""
+        before = sample("storage_io_duration_seconds_count", op="probe")
+
+        thread_name = await storage_io.run("probe", lambda: threading.current_thread().name)
+
+        assert thread_name.startswith("storage-io")
+        assert sample("storage_io_duration_seconds_count", op="probe") == before + 1
+        assert sample("storage_io_queue_depth") == 0
+        assert sample("storage_io_in_flight") == 0
+
+    @pytest.mark.asyncio
+    async def test_file_helpers(self, storage_io, tmp_path):
+        """Test makedirs/exists/remove helpers"""
+        directory = tmp_path / "a" / "b"
+        await storage_io.makedirs(directory)
+        assert await storage_io.exists(directory)
+
+        path = directory / "f.txt"
+        path.write_bytes(b"x")
+        assert await storage_io.remove(path) is True
+        assert await storage_io.remove(path, missing_ok=True) is False
+        with pytest.raises(FileNotFoundError):
+            await storage_io.remove(path)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_queued_call_leaves_queue_depth(self):
+        """Test cancelling a caller whose call never started does not leak queue depth"""
+        import asyncio
+
+        executor = StorageIOExecutor(max_workers=1)
+        release = threading.Event()
+        try:
+            blocker = asyncio.ensure_future(executor.run("probe", release.wait))
+            await asyncio.sleep(0.01)
+            queued = asyncio.ensure_future(executor.run("probe", lambda: None))
+            await asyncio.sleep(0.01)
+            assert sample("storage_io_queue_depth") == 1
+
+            queued.cancel()
+            await asyncio.sleep(0.01)
+            release.set()
+            await blocker
+            await asyncio.sleep(0.01)
+            assert sample("storage_io_queue_depth") == 0
+        finally:
+            release.set()
+            executor.shutdown()
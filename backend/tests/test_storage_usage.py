@@ -0,0 +1,114 @@
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import app.models  # noqa: F401 - đăng ký các bảng được tham chiếu bởi khóa ngoại
+from app.crud import crud_attachment, crud_storage_usage
+from app.models.attachment import Attachment
+from app.models.file_blob import FileBlob
+from app.models.storage_usage import UserStorageUsage
+from app.models.user import User
+from app.schemas.attachment import AttachmentCreate
+
+
+@pytest.fixture
+async def db():
+    """Create an in-memory database with users, attachments and usage counters"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        for model in (User, FileBlob, Attachment, UserStorageUsage):
+            await conn.run_sync(model.__table__.create)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        for user_id in (1, 2):
+            session.add(User(
+                id=user_id, email=f"u{user_id}@example.com", username=f"user{user_id}",
+                hashed_password="x",
+            ))
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+
+def attachment_in(user_id: int, size: int) -> AttachmentCreate:
+    return AttachmentCreate(
+        filename="a.pdf", file_path="storage/uploads/a.pdf", content_type="application/pdf",
+        file_size=size, user_id=user_id,
+    )
+
+
+class TestStorageUsage:
+    """Test incremental per-user storage usage counters"""
+
+    @pytest.mark.asyncio
+    async def test_create_and_remove_update_counters(self, db):
+        """Test counters follow attachment inserts and deletes"""
+        first = await crud_attachment.create(db, attachment_in(1, 100))
+        await crud_attachment.create(db, attachment_in(1, 50))
+        await db.commit()
+
+        usage = await crud_storage_usage.get_usage(db, 1)
+        assert usage is not None
+        await db.refresh(usage)
+        assert (usage.used_bytes, usage.file_count) == (150, 2)
+
+        await crud_attachment.remove(db, first.id)
+        await db.commit()
+        assert await crud_storage_usage.get_used_bytes(db, 1) == 50
+        assert await crud_storage_usage.get_used_bytes(db, 2) == 0
+
+    @pytest.mark.asyncio
+    async def test_reconcile_fixes_drift(self, db):
+        """Test reconcile recomputes counters from attachments in batches"""
+        await crud_attachment.create(db, attachment_in(1, 100))
+        db.add(Attachment(
+            filename="b.pdf", file_path="storage/uploads/b.pdf", content_type="application/pdf",
+            file_size=30, user_id=2,
+        ))
+        await db.commit()
+        await db.execute(update(UserStorageUsage).values(used_bytes=999))
+        await db.commit()
+
+        last, corrected = await crud_storage_usage.reconcile(db, 0, batch_size=1)
+        assert last == 1
+        assert corrected == [(1, 999, 100)]
+        last, corrected = await crud_storage_usage.reconcile(db, last, batch_size=1)
+        assert last == 2
+        assert corrected == [(2, 0, 30)]
+        assert await crud_storage_usage.reconcile(db, last, batch_size=1) == (None, [])
+        await db.commit()
+
+        top = await crud_storage_usage.get_top_users(db, limit=10)
+        assert [(user.id, usage.used_bytes) for usage, user in top] == [(1, 100), (2, 30)]
+
+    @pytest.mark.asyncio
+    async def test_create_multi_inserts_batch(self, db):
+        """Test bulk insert loads server defaults and updates counters once per user"""
+        db_objs = await crud_attachment.create_multi(
+            db, [attachment_in(1, 10), attachment_in(1, 20), attachment_in(2, 5)]
+        )
+        await db.commit()
+
+        assert [obj.file_size for obj in db_objs] == [10, 20, 5]
+        assert all(obj.id is not None and obj.created_at is not None for obj in db_objs)
+        assert await crud_storage_usage.get_used_bytes(db, 1) == 30
+        assert await crud_storage_usage.get_used_bytes(db, 2) == 5
+
+    @pytest.mark.asyncio
+    async def test_add_usage_gives_up_under_contention(self, db, monkeypatch):
+        """Test add_usage stops retrying after ADD_USAGE_MAX_ATTEMPTS conflicting inserts"""
+        from contextlib import asynccontextmanager
+        from sqlalchemy.exc import IntegrityError
+        from app.core.exceptions import StorageUsageContention
+
+        attempts: list = []
+
+        @asynccontextmanager
+        async def conflicting_savepoint():
+            attempts.append(1)
+            raise IntegrityError("INSERT", {}, Exception("duplicate key"))
+            yield
+
+        monkeypatch.setattr(db, "begin_nested", conflicting_savepoint)
+        with pytest.raises(StorageUsageContention) as exc:
+            await crud_storage_usage.add_usage(db, 1, 100, 1)
+        assert exc.value.status_code == 503
+        assert len(attempts) == crud_storage_usage.ADD_USAGE_MAX_ATTEMPTS
@@ -0,0 +1,98 @@
+import pytest
+from fastapi import HTTPException
+from app.services.upload_sessions import UploadSessionStore
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    """Create a session store in a temporary directory"""
+    return UploadSessionStore(tmp_path / ".sessions", ttl_seconds=3600)
+
+
+class TestUploadSessionStore:
+    """Test resumable upload sessions"""
+
+    @pytest.mark.asyncio
+    async def test_append_and_resume(self, sessions):
+        """Test chunks append at the acknowledged offset"""
+        session = await sessions.create(user_id=1, filename="a.pdf", size=10, is_public=True)
+
+        assert await sessions.append(session, 0, stream(b"hello")) == 5
+        assert await sessions.offset(session) == 5
+        assert await sessions.append(session, 5, stream(b"wor", b"ld")) == 10
+        assert sessions.part_path(session).read_bytes() == b"helloworld"
+
+    @pytest.mark.asyncio
+    async def test_offset_mismatch_returns_current_offset(self, sessions):
+        """Test a stale offset is rejected with the server offset"""
+        session = await sessions.create(user_id=1, filename="a.pdf", size=10, is_public=True)
+        await sessions.append(session, 0, stream(b"hello"))
+
+        with pytest.raises(HTTPException) as exc:
+            await sessions.append(session, 0, stream(b"hello"))
+
+        assert exc.value.status_code == 409
+        assert exc.value.headers["Upload-Offset"] == "5"
+
+    @pytest.mark.asyncio
+    async def test_declared_size_is_enforced(self, sessions):
+        """Test writing past the declared size fails"""
+        session = await sessions.create(user_id=1, filename="a.pdf", size=4, is_public=True)
+
+        with pytest.raises(HTTPException) as exc:
+            await sessions.append(session, 0, stream(b"hello"))
+
+        assert exc.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_other_users_and_expired_sessions_are_hidden(self, tmp_path):
+        """Test sessions are private to their owner and expire"""
+        sessions = UploadSessionStore(tmp_path / ".sessions", ttl_seconds=-1)
+        session = await sessions.create(user_id=1, filename="a.pdf", size=4, is_public=True)
+
+        with pytest.raises(HTTPException):
+            await sessions.get(session.id, user_id=1)
+        assert await sessions.purge_expired() == 1
+        assert not sessions.part_path(session).exists()
+
+    @pytest.mark.asyncio
+    async def test_get_rejects_foreign_owner(self, sessions):
+        """Test another user cannot read a session"""
+        session = await sessions.create(user_id=1, filename="a.pdf", size=4, is_public=True)
+
+        assert (await sessions.get(session.id, user_id=1)).id == session.id
+        with pytest.raises(HTTPException):
+            await sessions.get(session.id, user_id=2)
+
+
+class TestSniffedStream:
+    """Test MIME sniffing on the first chunk of a resumable upload"""
+
+    @pytest.mark.asyncio
+    async def test_first_chunk_is_checked_before_yielding(self, sessions):
+        """Test a disallowed file is rejected before anything is written"""
+        from app.api.v1.uploads import sniffed_stream
+
+        session = await sessions.create(user_id=1, filename="a.pdf", size=100, is_public=True)
+
+        with pytest.raises(HTTPException) as exc:
+            await sessions.append(session, 0, sniffed_stream(stream(b"MZ", b"\0" * 50), "pdf"))
+
+        assert exc.value.status_code == 400
+        assert await sessions.offset(session) == 0
+
+    @pytest.mark.asyncio
+    async def test_allowed_file_passes_through(self, sessions):
+        """Test every chunk of an allowed file is written unchanged"""
+        from app.api.v1.uploads import sniffed_stream
+
+        session = await sessions.create(user_id=1, filename="a.pdf", size=100, is_public=True)
+        chunks = stream(b"%PDF-1.4\n", b"a" * 20, b"b" * 20)
+
+        assert await sessions.append(session, 0, sniffed_stream(chunks, "pdf")) == 49
+        assert sessions.part_path(session).read_bytes() == b"%PDF-1.4\n" + b"a" * 20 + b"b" * 20
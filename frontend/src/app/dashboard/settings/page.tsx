@@ -70,6 +70,7 @@ const settingsSchema = z.object({
   custom_meta: z.string().optional().nullable(),
   upload_allowed_extensions: z.string().optional().nullable(),
   upload_max_size_mb: z.string().optional().nullable(),
+  upload_quota_mb: z.string().optional().nullable(),
 });
 
 type AppSettingsData = z.infer<typeof settingsSchema>;
@@ -568,6 +569,14 @@ export default function DashboardSettingsPage() {
                   {...register("upload_max_size_mb")}
                   helperText="Giới hạn kích thước file upload (tính bằng Megabytes)"
                 />
+                <Input
+                  label="Hạn mức lưu trữ mỗi người dùng (MB)"
+                  type="number"
+                  placeholder="0"
+                  error={errors.upload_quota_mb?.message}
+                  {...register("upload_quota_mb")}
+                  helperText="Tổng dung lượng file mỗi người dùng được upload, 0 = không giới hạn"
+                />
               </div>
             </div>
           </div>
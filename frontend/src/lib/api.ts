@@ -176,6 +176,7 @@ api.interceptors.response.use(
 
 import type {
   Attachment,
+  BulkUploadResponse,
   Settings,
   StatsOverview,
   UpdateSettingsRequest,
@@ -204,8 +205,12 @@ export const getFileUrl = (idOrUrl: number | string | null | undefined, isPublic
       return idOrUrl;
     }
     
-    // URL private từ backend có dạng /backend/api/v1/uploads/file/{id}
+    // URL private từ backend có dạng /backend/api/v1/uploads/file/{id}?exp=..&kid=..&sig=..
     if (idOrUrl.startsWith("/backend/api/v1/uploads/file/")) {
+      // URL đã ký (có thời hạn): dùng trực tiếp, không cần token
+      if (idOrUrl.includes("sig=")) {
+        return idOrUrl;
+      }
       if (typeof window !== "undefined") {
         const token = localStorage.getItem("access_token");
         if (token && !idOrUrl.includes("?token=")) {
@@ -268,6 +273,16 @@ export const uploadsApi = {
       onUploadProgress,
     });
   },
+  uploadFiles: (files: File[], onUploadProgress?: (progressEvent: AxiosProgressEvent) => void, isPublic: boolean = false) => {
+    const formData = new FormData();
+    files.forEach((file) => formData.append("files", file));
+    return api.post<BulkUploadResponse>(`/uploads/bulk?is_public=${isPublic}`, formData, {
+      headers: {
+        "Content-Type": "multipart/form-data",
+      },
+      onUploadProgress,
+    });
+  },
   getAttachment: (id: number) => api.get<Attachment>(`/uploads/${id}/`),
   deleteAttachment: (id: number) => api.delete(`/uploads/${id}/`),
   getFileUrl,
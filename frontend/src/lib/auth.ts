@@ -10,6 +10,7 @@ interface LoginRequest {
 
 interface LoginResponse {
   access_token: string;
+  refresh_token: string;
   token_type: string;
 }
 
@@ -53,6 +54,7 @@ export const authService = {
     // Store token
     if (typeof window !== "undefined") {
       localStorage.setItem("access_token", data.access_token);
+      localStorage.setItem("refresh_token", data.refresh_token);
     }
 
     return data;
@@ -76,13 +78,17 @@ export const authService = {
 
   // Logout function
   async logout(): Promise<void> {
-    // Call backend logout (optional)
+    // Call backend logout (revokes the refresh token)
     try {
+      const refreshToken =
+        typeof window !== "undefined" ? localStorage.getItem("refresh_token") : null;
       await fetch(`${API_BASE}/auth/logout`, {
         method: "POST",
         headers: {
           "Authorization": `Bearer ${this.getToken()}`,
+          "Content-Type": "application/json",
         },
+        body: refreshToken ? JSON.stringify({ refresh_token: refreshToken }) : undefined,
       });
     } catch (error) {
       console.warn("Backend logout failed:", error);
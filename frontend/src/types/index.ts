@@ -71,6 +71,7 @@ export interface Settings {
   custom_meta: string | null;
   upload_allowed_extensions: string | null;
   upload_max_size_mb: string | null;
+  upload_quota_mb: string | null;
 }
 
 export interface StatsOverview {
@@ -103,6 +104,7 @@ export interface UpdateSettingsRequest {
   custom_meta?: string;
   upload_allowed_extensions?: string;
   upload_max_size_mb?: string;
+  upload_quota_mb?: string;
 }
 
 export interface PublicSettingsResponse {
@@ -137,3 +139,16 @@ export interface Attachment {
   created_at: string;
   url: string;
 }
+
+export interface BulkUploadItem {
+  filename: string;
+  status_code: number;
+  attachment: Attachment | null;
+  error: string | null;
+}
+
+export interface BulkUploadResponse {
+  uploaded: number;
+  failed: number;
+  results: BulkUploadItem[];
+}